@@ -0,0 +1,96 @@
+import datetime
+import logging
+from array import array
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Sequence
+
+from chronofile.config import RecordCategory
+
+if TYPE_CHECKING:
+    from chronofile.event import ChronofileEvent
+
+log = logging.getLogger(__name__)
+
+_categories: Sequence[RecordCategory | None] = [None, *RecordCategory]
+_category_codes = {category: code for code, category in enumerate(_categories)}
+
+
+@dataclass(frozen=True)
+class TimelineColumns:
+    """A timeline as parallel arrays, so aggregation does not touch the event models."""
+
+    starts: "array[float]"
+    # Seconds since the epoch
+    ends: "array[float]"
+    categories: "array[int]"
+    # Index into _categories, 0 for uncategorised
+
+    @staticmethod
+    def from_events(events: Sequence["ChronofileEvent"]) -> "TimelineColumns":
+        return TimelineColumns(
+            starts=array("d", (e.start.timestamp() for e in events)),
+            ends=array("d", (e.end.timestamp() for e in events)),
+            categories=array("B", (_category_codes[e.category] for e in events)),
+        )
+
+
+@dataclass(frozen=True)
+class CategoryTotal:
+    bucket_start: "datetime.datetime"
+    category: RecordCategory | None
+    duration: "datetime.timedelta"
+
+    def __str__(self) -> str:
+        category = self.category.value if self.category is not None else "Uncategorised"
+        minutes = round(self.duration.total_seconds() / 60)
+        return f"{self.bucket_start.isoformat(timespec='minutes')}  {category:<14} {minutes // 60}h {minutes % 60:02d}m"
+
+
+def aggregate(timeline: TimelineColumns, bucket: "datetime.timedelta") -> Sequence[CategoryTotal]:
+    """Sum time per (bucket, category), clipping each interval to the bucket boundaries.
+
+    Buckets are aligned to the epoch, so daily buckets start at midnight UTC.
+    """
+    width = bucket.total_seconds()
+    totals: dict[tuple[int, int], float] = {}
+
+    for start, end, category in zip(timeline.starts, timeline.ends, timeline.categories):
+        first_bucket = int(start // width)
+        last_bucket = int(end // width)
+        if first_bucket == last_bucket:
+            # Most events fall within a single bucket
+            key = (first_bucket, category)
+            totals[key] = totals.get(key, 0.0) + (end - start)
+            continue
+
+        for b in range(first_bucket, last_bucket + 1):
+            clipped = min(end, (b + 1) * width) - max(start, b * width)
+            if clipped > 0:
+                key = (b, category)
+                totals[key] = totals.get(key, 0.0) + clipped
+
+    return [
+        CategoryTotal(
+            bucket_start=datetime.datetime.fromtimestamp(b * width, tz=datetime.timezone.utc),
+            category=_categories[category],
+            duration=datetime.timedelta(seconds=seconds),
+        )
+        for (b, category), seconds in sorted(totals.items())
+        if seconds > 0
+    ]
+
+
+def format_report(totals: Sequence[CategoryTotal]) -> str:
+    return "\n".join(str(t) for t in totals)
+
+
+@dataclass
+class CategoryReport:
+    """Pipeline output which aggregates the merged timeline into time per category."""
+
+    bucket: "datetime.timedelta" = datetime.timedelta(hours=1)
+    totals: Sequence[CategoryTotal] = field(default_factory=list, init=False)
+
+    def __call__(self, timeline: Sequence["ChronofileEvent"]):
+        self.totals = aggregate(TimelineColumns.from_events(timeline), bucket=self.bucket)
+        log.info(f"Time per category:\n{format_report(self.totals)}")
@@ -0,0 +1,214 @@
+import datetime
+import gc
+import random
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Mapping, Sequence, TypeVar
+
+from chronofile import diff, planner
+from chronofile.commands.sync_logic import build_timeline
+from chronofile.config import CompiledRules, RecordCategory, RecordMetadata
+from chronofile.destinations.gcal.fetch import fetch_window
+from chronofile.event import ChronofileEvent, deterministic_id
+from chronofile.sources.columns import EventColumns, EventKind
+
+if TYPE_CHECKING:
+    from chronofile.destinations.gcal.client import DestinationClient
+    from chronofile.hydration_cache import HydrationCache
+
+T = TypeVar("T")
+
+_DAY_START = datetime.datetime(2023, 1, 2, 8, tzinfo=datetime.timezone.utc)
+_APPS = ["Slack", "Code", "Terminal", "Finder", "Mail", "Google Chrome"]
+_HOSTS = ["github.com", "docs.python.org", "news.ycombinator.com", "mail.google.com"]
+
+
+@dataclass(frozen=True)
+class StageMemory:
+    stage: str
+    peak: int
+    # Bytes allocated at the stage's peak, above what was allocated before it started
+    retained: int
+    # Bytes still allocated after the stage, i.e. held by its output
+
+    def __str__(self) -> str:
+        return f"{self.stage:<12} peak {self.peak / 2**20:8.2f} MiB  retained {self.retained / 2**20:8.2f} MiB"
+
+
+def _measure(stage: str, fn: Callable[[], T]) -> tuple[T, StageMemory]:
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    result = fn()
+    current, peak = tracemalloc.get_traced_memory()
+    return result, StageMemory(stage=stage, peak=peak - before, retained=current - before)
+
+
+def synthetic_records(
+    n_events: int, distinct_titles: int, seed: int = 0, title_offset: int = 0
+) -> Sequence[tuple[EventKind, Sequence[Mapping[str, Any]]]]:
+    """A day of ActivityWatch records: contiguous window events, with a tab tracked in parallel.
+
+    Titles are drawn from a fixed vocabulary, so most of them repeat, like real window titles.
+    """
+    rng = random.Random(seed)
+    windows: list[Mapping[str, Any]] = []
+    urls: list[Mapping[str, Any]] = []
+    cursor = _DAY_START
+    for _ in range(n_events):
+        duration = rng.uniform(0.5, 90)
+        title = f"Title {title_offset + rng.randrange(distinct_titles)}"
+        record = {"timestamp": cursor.isoformat(), "duration": duration}
+        if rng.random() < 0.2:
+            url = f"https://{rng.choice(_HOSTS)}/{title.replace(' ', '-')}"
+            urls.append({**record, "data": {"url": url, "title": title}})
+        windows.append({**record, "data": {"app": rng.choice(_APPS), "title": title}})
+        cursor += datetime.timedelta(seconds=duration)
+    return [(EventKind.WINDOW, windows), (EventKind.URL, urls)]
+
+
+def _destination_items(timeline: Sequence["ChronofileEvent"]) -> Sequence[Mapping[str, Any]]:
+    # Last cycle's timeline, with every other event shorter, so the diff has updates to plan
+    return [
+        {
+            "id": deterministic_id(e),
+            "summary": e.title,
+            "start": {"dateTime": e.start.isoformat()},
+            "end": {"dateTime": (e.end if i % 2 else e.start + (e.end - e.start) / 2).isoformat()},
+        }
+        for i, e in enumerate(timeline)
+    ]
+
+
+def benchmark_rules(browser_apps: Sequence[str] = ("chrome",)) -> CompiledRules:
+    return CompiledRules.compile(
+        min_duration=datetime.timedelta(seconds=5),
+        merge_gap=datetime.timedelta(minutes=5),
+        exclude_titles=["private browsing"],
+        exclude_apps=["finder"],
+        metadata_enrichment=[
+            RecordMetadata(
+                title_matcher=["github", "python"],
+                category=RecordCategory.PROGRAMMING,
+                override_title="Programming",
+            ),
+            RecordMetadata(title_matcher=["mail"], category=RecordCategory.COMMUNICATING),
+        ],
+        category2emoji={RecordCategory.PROGRAMMING: "🤖", RecordCategory.COMMUNICATING: "💬"},
+        browser_apps=list(browser_apps),
+    )
+
+
+def measure_cycle(
+    records: Sequence[tuple[EventKind, Sequence[Mapping[str, Any]]]],
+    rules: CompiledRules,
+    cache: "HydrationCache | None" = None,
+) -> Sequence[StageMemory]:
+    """Peak and retained memory of each stage of a single sync cycle, without network I/O.
+
+    Stages run in pipeline order, and each stage's output is kept alive until the cycle ends,
+    like in a real cycle. Starts tracemalloc if it is not already tracing.
+    """
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start()
+    try:
+        stages: list[StageMemory] = []
+        columns, m = _measure("ingest", lambda: EventColumns.from_records(records))
+        stages.append(m)
+        timeline, m = _measure("timeline", lambda: build_timeline(columns, rules, cache=cache))
+        stages.append(m)
+
+        items = _destination_items(timeline)
+        destination, m = _measure(
+            "destination",
+            lambda: fetch_window(
+                lambda _start, _end, _page: {"items": items},
+                start=_DAY_START,
+                end=_DAY_START + datetime.timedelta(days=1),
+            ),
+        )
+        stages.append(m)
+        changeset, m = _measure("diff", lambda: diff.diff(timeline, destination))
+        stages.append(m)
+        _, m = _measure("plan", lambda: planner.optimize(changeset, destination))
+        stages.append(m)
+        return stages
+    finally:
+        if started_here:
+            tracemalloc.stop()
+
+
+def soak(
+    cycles: int, n_events: int, distinct_titles: int, cache: "HydrationCache"
+) -> Sequence[int]:
+    """Bytes still allocated after each of several sync cycles, with one cache kept across them.
+
+    Every cycle sees new titles, like new days do, so memory only plateaus if caches are capped.
+    """
+    rules = benchmark_rules()
+    retained: list[int] = []
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        for cycle in range(cycles):
+            records = synthetic_records(
+                n_events, distinct_titles, seed=cycle, title_offset=cycle * distinct_titles
+            )
+            measure_cycle(records, rules, cache)
+            del records
+            gc.collect()
+            current, _ = tracemalloc.get_traced_memory()
+            retained.append(current - baseline)
+    finally:
+        tracemalloc.stop()
+    return retained
+
+
+@dataclass(frozen=True)
+class DestinationThroughput:
+    destination: str
+    inserts_per_second: float
+    fetch: "datetime.timedelta"
+    deletes_per_second: float
+
+    def __str__(self) -> str:
+        return (
+            f"{self.destination:<14} {self.inserts_per_second:8.1f} inserts/s  "
+            f"fetch {self.fetch.total_seconds() * 1000:8.1f} ms  "
+            f"{self.deletes_per_second:8.1f} deletes/s"
+        )
+
+
+_THROUGHPUT_DAY = datetime.datetime(2001, 1, 1, tzinfo=datetime.timezone.utc)
+# Far from any real events, and every event is deleted again
+
+
+def destination_throughput(
+    destination: "DestinationClient", n_events: int
+) -> DestinationThroughput:
+    """Time inserting, fetching and deleting n_events. Writes, so use a scratch calendar."""
+    events = [
+        ChronofileEvent(
+            title=f"chronofile benchmark {i}",
+            start=_THROUGHPUT_DAY + datetime.timedelta(minutes=i),
+            end=_THROUGHPUT_DAY + datetime.timedelta(minutes=i + 1),
+        )
+        for i in range(n_events)
+    ]
+
+    started = time.perf_counter()
+    added = [destination.add_event(e) for e in events]
+    inserted = time.perf_counter()
+    destination.get_events(start=_THROUGHPUT_DAY, end=_THROUGHPUT_DAY + datetime.timedelta(days=1))
+    fetched = time.perf_counter()
+    for e in added:
+        destination.delete_event(e)
+    deleted = time.perf_counter()
+
+    return DestinationThroughput(
+        destination=type(destination).__name__,
+        inserts_per_second=n_events / (inserted - started),
+        fetch=datetime.timedelta(seconds=fetched - inserted),
+        deletes_per_second=n_events / (deleted - fetched),
+    )
@@ -0,0 +1,208 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Sequence
+
+from chronofile import diff
+from chronofile.destinations.routing import RoutingDestination
+from chronofile.journal import JournalEntry
+
+if TYPE_CHECKING:
+    import datetime
+
+    from chronofile.destinations.gcal.client import DestinationClient
+    from chronofile.journal import Journal
+
+log = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+# Operations still failing after this many attempts are given up on, so the journal can compact
+
+
+@dataclass(frozen=True)
+class Deadline:
+    """A point in time, on the monotonic clock, after which no more operations are started."""
+
+    at: float
+    clock: Callable[[], float] = time.monotonic
+
+    @staticmethod
+    def after(budget: "datetime.timedelta") -> "Deadline":
+        return Deadline(at=time.monotonic() + budget.total_seconds())
+
+    def passed(self) -> bool:
+        return self.clock() >= self.at
+
+
+def prioritize(changes: Sequence[diff.EventChange]) -> Sequence[diff.EventChange]:
+    """Order changes so the most useful land first if the cycle runs out of time.
+
+    Inserts and updates come first, the most recent first, since those are the events the
+    user is looking at. Deletes of duplicates and stale fragments come last.
+    """
+    return sorted(
+        changes, key=lambda c: (isinstance(c, diff.DeleteEvent), -c.event.start.timestamp())
+    )
+
+
+def _apply_change(change: diff.EventChange, destination: "DestinationClient"):
+    match change:
+        case diff.NewEvent():
+            destination.add_event(change.event)
+        case diff.UpdateEvent():
+            destination.update_event(change.event)
+        case diff.DeleteEvent():
+            destination.delete_event(change.event)
+
+
+def _already_applied(change: diff.EventChange, destination: "DestinationClient") -> bool:
+    """Whether an operation which was in flight when the process died reached the destination."""
+    match change:
+        case diff.NewEvent():
+            existing = destination.get_events(start=change.event.start, end=change.event.end)
+            return any(e.identity == change.event.identity for e in existing)
+        case diff.UpdateEvent():
+            # Updates are idempotent, so re-applying is always safe
+            return False
+        case diff.DeleteEvent():
+            existing = destination.get_events(start=change.event.start, end=change.event.end)
+            return all(e.id != change.event.id for e in existing)
+
+
+def _gone(error: Exception) -> bool:
+    """Whether the destination answered that the event does not exist.
+
+    Google Calendar errors carry the status on resp, and CalDAV (requests) errors on response.
+    """
+    status = getattr(getattr(error, "resp", None), "status", None) or getattr(
+        getattr(error, "response", None), "status_code", None
+    )
+    return status in (404, 410)
+
+
+def _apply_batch(
+    entries: Sequence["JournalEntry"],
+    destination: "DestinationClient",
+    journal: "Journal | None",
+    deadline: "Deadline | None",
+) -> int:
+    """Returns the number of operations deferred because the deadline passed.
+
+    With a journal, an operation which raises is logged and left unfinished, so the next
+    cycle's resume retries it, and the rest of the batch carries on.
+    """
+    deferred = 0
+    for entry in entries:
+        if entry.status == "pending" and deadline is not None and deadline.passed():
+            # Operations which may have started are always finished, so only pending ones wait
+            deferred += 1
+            if journal is not None:
+                journal.mark(entry.op, "deferred")
+            continue
+        if journal is not None and entry.attempts >= MAX_ATTEMPTS:
+            log.error(f"Giving up on {entry.change} after {entry.attempts} failed attempts")
+            journal.mark(entry.op, "failed")
+            continue
+        if journal is not None:
+            # Every attempt is journalled, so an operation which keeps failing is given up on
+            journal.mark(entry.op, "started")
+        try:
+            if entry.status == "started" and _already_applied(entry.change, destination):
+                log.info(f"Operation {entry.op} reached the destination before the crash")
+            else:
+                _apply_change(entry.change, destination)
+        except Exception as e:
+            if isinstance(entry.change, (diff.UpdateEvent, diff.DeleteEvent)) and _gone(e):
+                # Removed from the destination since it was planned, so there is nothing to do
+                log.info(f"{entry.change.event} no longer exists, skipping {entry.change}")
+            elif journal is None:
+                raise
+            else:
+                log.exception(f"Operation {entry.op} failed, retrying it next cycle")
+                continue
+        if journal is not None:
+            journal.mark(entry.op, "done")
+    return deferred
+
+
+def _apply_entries(
+    entries: Sequence["JournalEntry"],
+    destination: "DestinationClient",
+    journal: "Journal | None",
+    deadline: "Deadline | None",
+) -> int:
+    if not isinstance(destination, RoutingDestination):
+        return _apply_batch(entries, destination, journal, deadline)
+
+    # Calendars are independent, so the cycle takes as long as the slowest calendar
+    per_calendar, moves = destination.partition([e.change for e in entries])
+    with ThreadPoolExecutor(max_workers=max(1, len(per_calendar))) as pool:
+        batches = [[entries[i] for i in indices] for indices in per_calendar]
+        deferred = sum(
+            pool.map(lambda batch: _apply_batch(batch, destination, journal, deadline), batches)
+        )
+    return deferred + _apply_batch([entries[i] for i in moves], destination, journal, deadline)
+
+
+def apply_changes(
+    changes: Sequence[diff.EventChange],
+    destination: "DestinationClient",
+    journal: "Journal | None" = None,
+    deadline: "Deadline | None" = None,
+) -> int:
+    """Apply the changeset, journalling each operation if a journal is given.
+
+    With a deadline, changes are applied in priority order, and those not started in time are
+    left for the next cycle to plan again. Returns the number of deferred changes, so the caller
+    can make sure that cycle runs.
+    """
+    if deadline is not None:
+        changes = prioritize(changes)
+
+    if journal is None:
+        entries = [JournalEntry(op=i, change=c, status="pending") for i, c in enumerate(changes)]
+        deferred = _apply_entries(entries, destination, journal=None, deadline=deadline)
+    else:
+        deferred = _apply_entries(journal.begin(changes), destination, journal, deadline)
+        _compact_unless_failed(journal)
+
+    if deferred > 0:
+        log.info(
+            f"Deadline passed, deferred {deferred} of {len(changes)} changes to the next cycle"
+        )
+    return deferred
+
+
+def _compact_unless_failed(journal: "Journal"):
+    failed = len(journal.load())
+    if failed > 0:
+        log.warning(f"{failed} operations failed, keeping them in {journal.path} to retry")
+    else:
+        journal.compact()
+
+
+def resume(
+    destination: "DestinationClient", journal: "Journal", deadline: "Deadline | None" = None
+) -> bool:
+    """Finish the changeset of an interrupted or partly failed sync. Returns whether there was
+    anything to resume.
+
+    Operations which fail again stay in the journal, until they have failed MAX_ATTEMPTS times.
+    """
+    entries = journal.load()
+    if len(entries) == 0:
+        # Compacts journals where every operation finished, but compaction did not
+        journal.compact()
+        return False
+
+    log.info(f"Resuming {len(entries)} unfinished operations from {journal.path}")
+    if isinstance(destination, RoutingDestination):
+        # Locate the journalled events, so updates and deletes go to the calendar holding them
+        destination.get_events(
+            start=min(e.change.event.start for e in entries),
+            end=max(e.change.event.end for e in entries),
+        )
+    _apply_entries(entries, destination, journal, deadline)
+    _compact_unless_failed(journal)
+    return True
@@ -0,0 +1,124 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterable, Iterator, Sequence
+
+from chronofile.event import Provenance, WindowTitleEvent, hydrate_event
+from chronofile.hydration_cache import HydrationCache
+
+if TYPE_CHECKING:
+    from chronofile.config import CompiledRules
+    from chronofile.event import ChronofileEvent, SourceEvent
+
+
+IndexedEvent = tuple[int, "SourceEvent"]
+# A source event, with its index in the pipeline's input
+
+
+def iter_hydrated(
+    source_events: Iterable[IndexedEvent],
+    rules: "CompiledRules",
+    cache: "HydrationCache | None" = None,
+) -> Iterator["ChronofileEvent"]:
+    """Filter source events and hydrate them into ChronofileEvents, lazily and in order.
+
+    Each event's provenance is the index it is paired with, so events which earlier stages
+    dropped, clipped or split still point at the input they came from.
+    """
+    hydrate = cache.hydrate if cache is not None else hydrate_event
+    for index, event in source_events:
+        if event.duration <= rules.min_duration:
+            continue
+        if isinstance(event, WindowTitleEvent) and rules.excludes_app(event.app):
+            continue
+        hydrated = hydrate(event=event, rules=rules, provenance=Provenance(first=index, last=index))
+        if not rules.excludes_title(hydrated.title):
+            yield hydrated
+
+
+def hydrate_events(
+    source_events: Sequence["SourceEvent"],
+    rules: "CompiledRules",
+    offset: int = 0,
+    cache: "HydrationCache | None" = None,
+) -> Sequence["ChronofileEvent"]:
+    """Each event's provenance is its index in the source events, plus offset."""
+    return list(iter_hydrated(enumerate(source_events, start=offset), rules, cache=cache))
+
+
+_worker_rules: "CompiledRules | None" = None
+_worker_cache: "HydrationCache | None" = None
+
+
+def _init_worker(rules: "CompiledRules", cache_size: int | None):
+    # Runs once per worker process, so the compiled rules are only sent once per worker
+    global _worker_rules, _worker_cache  # noqa: PLW0603
+    _worker_rules = rules
+    _worker_cache = HydrationCache(maxsize=cache_size) if cache_size is not None else None
+
+
+def _hydrate_chunk(chunk: Sequence[IndexedEvent]) -> Sequence["ChronofileEvent"]:
+    if _worker_rules is None:
+        raise RuntimeError("Worker was not initialised with compiled rules")
+    return list(iter_hydrated(chunk, _worker_rules, cache=_worker_cache))
+
+
+@dataclass(frozen=True)
+class ChunkedExecutor:
+    """Hydrates source events in time-ordered chunks on a process pool.
+
+    Chunks are contiguous slices of the (time-ordered) source events, and results are
+    concatenated in chunk order, so the output is identical to a serial run.
+
+    A serial run uses the given hydration cache. Worker processes each keep a private,
+    in-memory cache of the same size instead.
+    """
+
+    workers: int = 1
+    chunk_size: int = 2000
+
+    def hydrate(
+        self,
+        source_events: Sequence["SourceEvent"],
+        rules: "CompiledRules",
+        cache: "HydrationCache | None" = None,
+    ) -> Sequence["ChronofileEvent"]:
+        if self.workers <= 1 or len(source_events) <= self.chunk_size:
+            return hydrate_events(source_events, rules, cache=cache)
+        return self._hydrate_parallel(list(enumerate(source_events)), rules, cache)
+
+    def _hydrate_parallel(
+        self,
+        source_events: Sequence[IndexedEvent],
+        rules: "CompiledRules",
+        cache: "HydrationCache | None",
+    ) -> Sequence["ChronofileEvent"]:
+        chunks = [
+            source_events[i : i + self.chunk_size]
+            for i in range(0, len(source_events), self.chunk_size)
+        ]
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(rules, cache.maxsize if cache is not None else None),
+        ) as pool:
+            return [event for chunk in pool.map(_hydrate_chunk, chunks) for event in chunk]
+
+    def stream(
+        self,
+        source_events: Iterable[IndexedEvent],
+        rules: "CompiledRules",
+        cache: "HydrationCache | None" = None,
+    ) -> Iterator["ChronofileEvent"]:
+        """Like hydrate, but for indexed events, and a serial run hydrates lazily as the output
+        is consumed.
+
+        Chunking needs the source events up front, so a parallel run materialises them first.
+        """
+        if self.workers <= 1:
+            yield from iter_hydrated(source_events, rules, cache=cache)
+            return
+        events = list(source_events)
+        if len(events) <= self.chunk_size:
+            yield from iter_hydrated(events, rules, cache=cache)
+            return
+        yield from self._hydrate_parallel(events, rules, cache)
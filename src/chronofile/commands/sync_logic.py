@@ -1,19 +1,28 @@
-import datetime
 import logging
 from dataclasses import dataclass
-from functools import partial
-from typing import TYPE_CHECKING, Callable, Mapping, Optional, Sequence
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional, Sequence
 
 import coloredlogs
 from iterpy.arr import Arr
 
 import chronofile.diff as diff
-from chronofile.event import DestinationEvent, SourceEvent, WindowTitleEvent, hydrate_event
+from chronofile import planner
+from chronofile.commands.hydration import ChunkedExecutor, IndexedEvent
+from chronofile.event import has_deterministic_id
+from chronofile.overlap import resolve_browser_overlap
 from chronofile.sources import activitywatch
-from chronofile.timeline import merge_within_window
+from chronofile.sources.columns import EventColumns
+from chronofile.timeline import merge_sorted
 
 if TYPE_CHECKING:
-    from chronofile.config import RecordCategory, RecordMetadata
+    import datetime
+
+    import requests
+
+    from chronofile.config import CompiledRules
+    from chronofile.event import ChronofileEvent, DestinationEvent, SourceEvent
+    from chronofile.hydration_cache import HydrationCache
+    from chronofile.timeline import TimelineOutput
 
 coloredlogs.install(  # type: ignore
     level="INFO",
@@ -25,19 +34,35 @@ log = logging.getLogger(__name__)
 
 
 def try_activitywatch(
-    activitywatch_base_url: str | None,
-) -> Optional[Callable[[], Sequence[SourceEvent]]]:
+    activitywatch_base_url: str | None, session: "requests.Session | None" = None
+) -> Optional[activitywatch.BucketWatcher]:
     if activitywatch_base_url:
         if not activitywatch_base_url.endswith("/"):
             activitywatch_base_url += "/"
-        return partial(
-            activitywatch.load_all_events,
-            date=datetime.datetime.now(),
-            base_url=activitywatch_base_url,
-        )
+        return activitywatch.BucketWatcher(base_url=activitywatch_base_url, session=session)
     return None
 
 
+def source_window(
+    source_events: Sequence["SourceEvent"],
+) -> tuple["datetime.datetime", "datetime.datetime"] | None:
+    """The span covered by the source events, from the earliest start to the latest end.
+
+    None if there are no source events.
+    """
+    if isinstance(source_events, EventColumns):
+        return source_events.span()
+    events = iter(source_events)
+    first = next(events, None)
+    if first is None:
+        return None
+    start, end = first.start, first.start + first.duration
+    for event in events:
+        start = min(start, event.start)
+        end = max(end, event.start + event.duration)
+    return start, end
+
+
 @dataclass(frozen=True)
 class DeduplicatedGroup:
     keeper: "DestinationEvent"
@@ -50,64 +75,95 @@ class DeduplicatedGroup:
         return DeduplicatedGroup(keeper=event_group[0], duplicates=[])
 
 
-def pipeline(  # noqa: D417
+def stream_timeline(
+    source_events: Sequence["SourceEvent"],
+    rules: "CompiledRules",
+    executor: "ChunkedExecutor | None" = None,
+    cache: "HydrationCache | None" = None,
+) -> Iterator["ChronofileEvent"]:
+    """Filter, hydrate and merge source events into the timeline to mirror, lazily.
+
+    Source events are sorted by start when they are ingested, and every stage keeps that order,
+    so no stage sorts again.
+    """
+    events: Iterable[IndexedEvent] = enumerate(source_events)
+    if isinstance(source_events, EventColumns):
+        # Drop filtered rows before building any event objects. The surviving rows keep their
+        # numbers, so provenance still indexes the columns.
+        events = source_events.iter_indexed(source_events.prefilter(rules))
+    without_browser_overlap = resolve_browser_overlap(events, rules)
+    hydrated = (executor or ChunkedExecutor()).stream(without_browser_overlap, rules, cache=cache)
+    return merge_sorted(hydrated, merge_gap=rules.merge_gap)
+
+
+def build_timeline(
+    source_events: Sequence["SourceEvent"],
+    rules: "CompiledRules",
+    executor: "ChunkedExecutor | None" = None,
+    cache: "HydrationCache | None" = None,
+) -> Sequence["ChronofileEvent"]:
+    """Filter, hydrate and merge source events into the timeline to mirror."""
+    return list(stream_timeline(source_events, rules, executor, cache))
+
+
+def pipeline(
     source_events: Sequence["SourceEvent"],
     destination_events: Sequence["DestinationEvent"],
-    min_duration: "datetime.timedelta",
-    category2emoji: Mapping["RecordCategory", str],
-    exclude_titles: Sequence[str],
-    merge_gap: "datetime.timedelta",
-    metadata_enrichment: Sequence["RecordMetadata"],
-    exclude_apps: Sequence[str],
+    rules: "CompiledRules",
+    executor: "ChunkedExecutor | None" = None,
+    outputs: Sequence["TimelineOutput"] = (),
+    cache: "HydrationCache | None" = None,
+    misrouted: "diff.Misrouted | None" = None,
 ) -> Sequence[diff.EventChange]:
     """Event processing without I/O. Separating this from I/O makes debugging and testing easier.
 
     Args:
         source_events: Source events to process
         destination_events: Destination events to process
-        ... [See the Config object for the rest of the arguments]
+        rules: Compiled from the Config object
+        executor: How to run filtering and hydration. Defaults to a serial run.
+        outputs: Extra consumers of the merged timeline, e.g. reports
+        cache: Memoizes hydration of repeated titles across runs
+        misrouted: Whether a stored event belongs in another calendar, when routing by category
     """
-
-    # Preprocess the source events
-    sufficient_length_events = Arr(source_events).filter(lambda e: e.duration > min_duration)
-
-    without_excluded_apps = sufficient_length_events.filter(
-        lambda e: not any(excluded_app.lower() in e.app.lower() for excluded_app in exclude_apps)
-        if isinstance(e, WindowTitleEvent)
-        else True
-    )
-
-    parsed_events = without_excluded_apps.map(
-        lambda e: hydrate_event(
-            event=e, metadata=metadata_enrichment, category2emoji=category2emoji
-        )
-    )
-
-    filtered_by_title = parsed_events.filter(
-        lambda e: not any(
-            excluded_title.lower() in e.title.lower() for excluded_title in exclude_titles
-        )
-    )
-
-    merged_within_gap = (
-        filtered_by_title.groupby(lambda e: e.title)
-        .map(lambda g: merge_within_window(g[1], merge_gap=merge_gap))
-        .flatten()
-        .to_list()
+    merged_within_gap: Iterable[ChronofileEvent] = stream_timeline(
+        source_events, rules, executor, cache
     )
-
-    # Deduplicate destination events
+    if len(outputs) != 0:
+        merged_within_gap = list(merged_within_gap)
+        for output in outputs:
+            output(merged_within_gap)
+
+    # Events inserted with deterministic ids cannot be duplicated, but events inserted before
+    # chronofile assigned ids can
+    own_events = [e for e in destination_events if has_deterministic_id(e)]
+    legacy_events = [e for e in destination_events if not has_deterministic_id(e)]
     deduplicated_destination_events = (
-        Arr(destination_events)
+        Arr(legacy_events)
         .groupby(lambda e: e.identity)
         .map(lambda g: DeduplicatedGroup._from_event_group(g[1]))
     )
-    destination_keepers = deduplicated_destination_events.map(lambda g: g.keeper).to_list()
+    destination_keepers = [
+        *own_events,
+        *deduplicated_destination_events.map(lambda g: g.keeper).to_list(),
+    ]
     destination_duplicates = (
         deduplicated_destination_events.map(lambda g: list(g.duplicates)).flatten().to_list()
     )
 
     # Calculate the delta
-    changeset = diff.diff(merged_within_gap, destination_keepers)
+    changeset = diff.diff(
+        merged_within_gap,
+        destination_keepers,
+        start_tolerance=rules.start_tolerance,
+        end_tolerance=rules.end_tolerance,
+        misrouted=misrouted,
+    )
 
-    return [*changeset, *[diff.DeleteEvent(event=e) for e in destination_duplicates]]
+    # Plan the fewest remote operations
+    plan = planner.optimize(
+        [*changeset, *[diff.DeleteEvent(event=e) for e in destination_duplicates]],
+        destination_events=destination_events,
+        misrouted=misrouted,
+    )
+    return plan.changes
@@ -0,0 +1,185 @@
+import datetime
+import itertools
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Sequence
+
+import pytest
+import requests
+
+from chronofile import diff
+from chronofile.event import ChronofileEvent, DestinationEvent
+from chronofile.journal import Journal
+
+from .apply import MAX_ATTEMPTS, Deadline, apply_changes, prioritize, resume  # type: ignore
+
+if TYPE_CHECKING:
+    import pathlib
+
+START = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class Crash(BaseException):
+    """Stands in for the process dying, so it is not handled like a failed operation."""
+
+
+@dataclass
+class InMemoryDestination:
+    events: dict[str, DestinationEvent] = field(default_factory=dict)
+    crash_after_calls: int | None = None
+    # Simulates the process dying right after the request reached the destination
+    calls: int = 0
+
+    def _maybe_crash(self):
+        self.calls += 1
+        if self.crash_after_calls is not None and self.calls >= self.crash_after_calls:
+            self.crash_after_calls = None
+            raise Crash
+
+    def add_event(self, event: ChronofileEvent) -> DestinationEvent:
+        added = DestinationEvent(
+            title=event.title, start=event.start, end=event.end, id=f"id{self.calls}"
+        )
+        self.events[added.id] = added
+        self._maybe_crash()
+        return added
+
+    def get_events(
+        self, start: datetime.datetime, end: datetime.datetime
+    ) -> Sequence[DestinationEvent]:
+        return [e for e in self.events.values() if e.start < end and e.end > start]
+
+    def update_event(self, event: DestinationEvent) -> DestinationEvent:
+        self.events[event.id] = event
+        self._maybe_crash()
+        return event
+
+    def delete_event(self, event: DestinationEvent) -> None:
+        del self.events[event.id]
+        self._maybe_crash()
+
+
+def _event(title: str, minute: int) -> ChronofileEvent:
+    return ChronofileEvent(
+        title=title,
+        start=START + datetime.timedelta(minutes=minute),
+        end=START + datetime.timedelta(minutes=minute + 1),
+    )
+
+
+def _changes() -> Sequence[diff.EventChange]:
+    stale = DestinationEvent(**_event("stale", 0).model_dump(), id="stale")
+    return [
+        diff.NewEvent(event=_event("a", 1)),
+        diff.NewEvent(event=_event("b", 2)),
+        diff.DeleteEvent(event=stale),
+        diff.NewEvent(event=_event("c", 3)),
+    ]
+
+
+def _destination() -> InMemoryDestination:
+    stale = DestinationEvent(**_event("stale", 0).model_dump(), id="stale")
+    return InMemoryDestination(events={"stale": stale})
+
+
+@pytest.mark.parametrize("crash_after_calls", [1, 2, 3, 4])
+def test_interrupted_apply_resumes_without_duplicates(
+    tmp_path: "pathlib.Path", crash_after_calls: int
+):
+    journal = Journal(path=str(tmp_path / "journal.jsonl"))
+    destination = _destination()
+    destination.crash_after_calls = crash_after_calls
+
+    with pytest.raises(Crash):
+        apply_changes(_changes(), destination, journal)  # type: ignore
+
+    assert resume(destination, journal)  # type: ignore
+    assert sorted(e.title for e in destination.events.values()) == ["a", "b", "c"]
+    assert not (tmp_path / "journal.jsonl").exists()
+
+
+def test_completed_apply_is_compacted(tmp_path: "pathlib.Path"):
+    journal = Journal(path=str(tmp_path / "journal.jsonl"))
+    destination = _destination()
+
+    apply_changes(_changes(), destination, journal)  # type: ignore
+
+    assert not (tmp_path / "journal.jsonl").exists()
+    assert not resume(destination, journal)  # type: ignore
+
+
+def test_journal_tolerates_torn_last_line(tmp_path: "pathlib.Path"):
+    journal = Journal(path=str(tmp_path / "journal.jsonl"))
+    journal.begin(_changes())
+    journal.mark(0, "done")
+    with (tmp_path / "journal.jsonl").open("a") as f:
+        f.write('{"op": 1, "sta')
+
+    assert [e.op for e in journal.load()] == [1, 2, 3]
+
+
+def test_recent_changes_are_prioritized_and_deletes_come_last():
+    ordered = prioritize(_changes())
+
+    assert [c.event.title for c in ordered] == ["c", "b", "a", "stale"]
+
+
+def test_changes_past_the_deadline_wait_for_the_next_cycle(tmp_path: "pathlib.Path"):
+    journal = Journal(path=str(tmp_path / "journal.jsonl"))
+    destination = _destination()
+    # Each check advances the clock by one, so two operations fit
+    ticks = itertools.count()
+    deadline = Deadline(at=2, clock=lambda: next(ticks))
+
+    deferred = apply_changes(_changes(), destination, journal, deadline)  # type: ignore
+
+    assert deferred == 2
+    assert sorted(e.title for e in destination.events.values()) == ["b", "c", "stale"]
+    # Deferred changes are planned again next cycle, so the journal does not hold them
+    assert not (tmp_path / "journal.jsonl").exists()
+
+
+def _http_error(status: int) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(response=response)
+
+
+@dataclass
+class FailingDestination(InMemoryDestination):
+    failing_titles: set[str] = field(default_factory=set)
+
+    def add_event(self, event: ChronofileEvent) -> DestinationEvent:
+        if event.title in self.failing_titles:
+            raise _http_error(500)
+        return super().add_event(event)
+
+    def delete_event(self, event: DestinationEvent) -> None:
+        if event.id not in self.events:
+            raise _http_error(404)
+        super().delete_event(event)
+
+
+def test_deleting_a_deleted_event_counts_as_done(tmp_path: "pathlib.Path"):
+    journal = Journal(path=str(tmp_path / "journal.jsonl"))
+    destination = FailingDestination()
+
+    apply_changes(_changes(), destination, journal)  # type: ignore
+
+    assert sorted(e.title for e in destination.events.values()) == ["a", "b", "c"]
+    assert not (tmp_path / "journal.jsonl").exists()
+
+
+def test_failing_operation_is_retried_then_given_up(tmp_path: "pathlib.Path"):
+    journal = Journal(path=str(tmp_path / "journal.jsonl"))
+    destination = FailingDestination(failing_titles={"b"})
+    destination.events.update(_destination().events)
+
+    apply_changes(_changes(), destination, journal)  # type: ignore
+
+    # The other operations are not held up by the failing one
+    assert sorted(e.title for e in destination.events.values()) == ["a", "c"]
+    assert [e.change.event.title for e in journal.load()] == ["b"]
+
+    for _ in range(MAX_ATTEMPTS):
+        assert resume(destination, journal)  # type: ignore
+    assert not (tmp_path / "journal.jsonl").exists()
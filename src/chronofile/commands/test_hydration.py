@@ -0,0 +1,71 @@
+import datetime
+
+from chronofile.config import CompiledRules, RecordCategory, RecordMetadata
+from chronofile.event import URLEvent, WindowTitleEvent
+
+from .hydration import ChunkedExecutor  # type: ignore
+
+START = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _source_events() -> list[WindowTitleEvent | URLEvent]:
+    events: list[WindowTitleEvent | URLEvent] = []
+    for i in range(60):
+        start = START + datetime.timedelta(minutes=i)
+        duration = datetime.timedelta(seconds=i % 7)
+        if i % 3 == 0:
+            events.append(
+                URLEvent(
+                    url=f"https://github.com/owner/repo{i % 4}",
+                    url_title="",
+                    start=start,
+                    duration=duration,
+                )
+            )
+        else:
+            events.append(
+                WindowTitleEvent(
+                    app="Slack" if i % 2 else "Finder",
+                    window_title=f"Window {i % 5}",
+                    start=start,
+                    duration=duration,
+                )
+            )
+    return events
+
+
+def test_should_hydrate_identically_in_parallel():
+    rules = CompiledRules.compile(
+        min_duration=datetime.timedelta(seconds=1),
+        merge_gap=datetime.timedelta(0),
+        exclude_apps=["finder"],
+        exclude_titles=["window 4"],
+        metadata_enrichment=[
+            RecordMetadata(title_matcher=["github"], category=RecordCategory.PROGRAMMING)
+        ],
+        category2emoji={RecordCategory.PROGRAMMING: "🤖"},
+    )
+
+    serial = ChunkedExecutor(workers=1).hydrate(_source_events(), rules)
+    parallel = ChunkedExecutor(workers=2, chunk_size=7).hydrate(_source_events(), rules)
+
+    assert len(serial) > 0
+    assert parallel == serial
+
+
+def test_should_reference_source_events_by_index():
+    source_events = _source_events()
+    rules = CompiledRules.compile(
+        min_duration=datetime.timedelta(seconds=0),
+        merge_gap=datetime.timedelta(0),
+        exclude_apps=[],
+        exclude_titles=[],
+        metadata_enrichment=[],
+        category2emoji={},
+    )
+
+    hydrated = ChunkedExecutor(workers=2, chunk_size=7).hydrate(source_events, rules)
+
+    for event in hydrated:
+        assert event.provenance is not None
+        assert event.start == source_events[event.provenance.first].start
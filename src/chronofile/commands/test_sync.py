@@ -1,8 +1,10 @@
 import datetime
 from typing import TYPE_CHECKING, Sequence
 
+from chronofile.config import CompiledRules
 from chronofile.diff import DeleteEvent
 from chronofile.event import BareEvent
+from chronofile.sources.columns import EventColumns
 from chronofile.test_event import FakeDestinationEvent
 
 if TYPE_CHECKING:
@@ -11,7 +13,7 @@ if TYPE_CHECKING:
 
 from chronofile.event import SourceEvent
 
-from .sync_logic import pipeline  # type: ignore
+from .sync_logic import pipeline, source_window  # type: ignore
 
 
 class FakeBareEvent(BareEvent):
@@ -33,11 +35,29 @@ def test_should_remove_duplicates():
     changes = pipeline(
         source_events=[],
         destination_events=destination_client(),
-        exclude_titles=[],
-        metadata_enrichment=[],
-        category2emoji={},
-        min_duration=datetime.timedelta(days=1),
-        merge_gap=datetime.timedelta(days=1),
-        exclude_apps=[],
+        rules=CompiledRules.compile(
+            exclude_titles=[],
+            metadata_enrichment=[],
+            category2emoji={},
+            min_duration=datetime.timedelta(days=1),
+            merge_gap=datetime.timedelta(days=1),
+            exclude_apps=[],
+        ),
     )
     assert changes == [DeleteEvent(event=FakeDestinationEvent(id="1"))]
+
+
+def test_should_span_source_window_to_latest_end():
+    long_first = FakeBareEvent(duration=datetime.timedelta(hours=2))
+    short_last = FakeBareEvent(
+        start=long_first.start + datetime.timedelta(hours=1), duration=datetime.timedelta(seconds=1)
+    )
+    assert source_window([long_first, short_last]) == (
+        long_first.start,
+        long_first.start + datetime.timedelta(hours=2),
+    )
+
+
+def test_empty_sources_have_no_window():
+    assert source_window([]) is None
+    assert source_window(EventColumns.from_records([])) is None
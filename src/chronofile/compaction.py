@@ -0,0 +1,140 @@
+import datetime
+import heapq
+import itertools
+import logging
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Iterable, Iterator, Sequence, TypeVar
+
+from chronofile import diff
+from chronofile.commands.apply import apply_changes, resume
+from chronofile.event import has_deterministic_id
+
+if TYPE_CHECKING:
+    from chronofile.destinations.gcal.client import DestinationClient
+    from chronofile.event import DestinationEvent
+    from chronofile.journal import Journal
+
+log = logging.getLogger(__name__)
+
+
+T = TypeVar("T")
+
+
+def stream_destination(
+    destination: "DestinationClient",
+    start: datetime.datetime,
+    end: datetime.datetime,
+    page: datetime.timedelta = datetime.timedelta(days=7),
+) -> Iterator["DestinationEvent"]:
+    """Every destination event starting between start and end, in start order, a page at a time.
+
+    Events spanning pages are returned by both fetches, so each page only yields the events
+    which start within it.
+    """
+    page_start = start
+    while page_start < end:
+        page_end = min(page_start + page, end)
+        events = [
+            e
+            for e in destination.get_events(start=page_start, end=page_end)
+            if page_start <= e.start < page_end
+        ]
+        yield from sorted(events, key=lambda e: (e.start, e.id))
+        page_start = page_end
+
+
+@dataclass
+class _Span:
+    keeper: "DestinationEvent"
+    end: datetime.datetime
+
+
+@dataclass
+class CompactionStats:
+    merged: int = 0
+    # Events deleted because they duplicate, or continue, an earlier event with the same title
+    extended: int = 0
+    # Events updated to cover the events merged into them
+    by_title: dict[str, int] = field(default_factory=dict)
+
+
+def compact(
+    events: Iterable["DestinationEvent"],
+    merge_gap: datetime.timedelta,
+    stats: CompactionStats | None = None,
+) -> Iterator[diff.EventChange]:
+    """Changes which merge same-title events within merge_gap of each other, including duplicates.
+
+    Runs in one pass over events sorted by start, keeping one open span per title, the way
+    the pipeline merges source events. The earliest event of each span is kept and extended,
+    and the others are deleted as soon as they are merged. Memory scales with the titles
+    active within merge_gap, not with the length of the history.
+
+    Only events chronofile inserted, recognised by their deterministic id, are merged, so the
+    user's own events are left alone, even if they share a title.
+    """
+    stats = stats if stats is not None else CompactionStats()
+    events = (e for e in events if has_deterministic_id(e))
+    open_spans: dict[str, _Span] = {}
+    closing: list[tuple[datetime.datetime, int, str]] = []
+    # Heap of (end + merge_gap, tiebreak, title). Entries go stale when a span is extended.
+    tiebreak = itertools.count()
+
+    def close(span: _Span) -> Iterator[diff.EventChange]:
+        if span.end != span.keeper.end:
+            stats.extended += 1
+            yield diff.UpdateEvent(event=span.keeper.model_copy(update={"end": span.end}))
+
+    for event in events:
+        while closing and closing[0][0] < event.start:
+            _, _, title = heapq.heappop(closing)
+            span = open_spans.get(title)
+            if span is not None and span.end + merge_gap < event.start:
+                del open_spans[title]
+                yield from close(span)
+
+        span = open_spans.get(event.title)
+        if span is not None and span.end + merge_gap >= event.start:
+            span.end = max(span.end, event.end)
+            stats.merged += 1
+            stats.by_title[event.title] = stats.by_title.get(event.title, 0) + 1
+            yield diff.DeleteEvent(event=event)
+        else:
+            if span is not None:
+                yield from close(span)
+            span = _Span(keeper=event, end=event.end)
+            open_spans[event.title] = span
+        heapq.heappush(closing, (span.end + merge_gap, next(tiebreak), event.title))
+
+    for span in open_spans.values():
+        yield from close(span)
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[Sequence[T]]:
+    iterator = iter(items)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def apply_batches(
+    changes: Iterable[diff.EventChange],
+    destination: "DestinationClient",
+    journal: "Journal",
+    batch_size: int,
+) -> int:
+    """Apply changes in journalled batches as they arrive. Returns the number given up on.
+
+    Operations which fail are retried once after their batch, then given up on, so the next
+    batch can start its journal. The history is compacted again by the next run anyway.
+    """
+    given_up = 0
+    for batch in batched(changes, batch_size):
+        apply_changes(batch, destination, journal)
+        resume(destination, journal)
+        failed = journal.load()
+        for entry in failed:
+            log.error(f"Giving up on {entry.change} for this run")
+            journal.mark(entry.op, "failed")
+        journal.compact()
+        given_up += len(failed)
+    return given_up
@@ -1,12 +1,17 @@
 import datetime
+import hashlib
+import json
+import logging
 import pathlib
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 from typing import Mapping, Sequence
 
 import pydantic
 import toml
 
+log = logging.getLogger(__name__)
+
 
 class RecordCategory(Enum):
     BROWSING = "Browsing"
@@ -39,7 +44,7 @@ class Config(pydantic.BaseModel):
     model_config = pydantic.ConfigDict(arbitrary_types_allowed=True)
 
     sync_window: datetime.timedelta
-    # How far back from the current date to look for events
+    # How far back from now to sync, both for sources and the destination
 
     exclude_titles: Sequence[str]
     # Exclude events who contain these titles. Case insensitive.
@@ -47,6 +52,9 @@ class Config(pydantic.BaseModel):
     exclude_apps: Sequence[str]
     # Exclude events from these apps
 
+    browser_apps: Sequence[str] = ()
+    # Apps whose window time is replaced by the concurrent URL events. Case insensitive.
+
     merge_gap: datetime.timedelta
     # If events have the same title and the first event's end time is within this gap, combine the events
 
@@ -59,9 +67,65 @@ class Config(pydantic.BaseModel):
     category2emoji: Mapping[RecordCategory, str]
     # Map categories to emoji
 
+    workers: int = 1
+    # Number of processes used to hydrate source events. 1 runs serially.
+
+    chunk_size: int = 2000
+    # Number of source events hydrated per task when running on multiple processes
+
+    hydration_cache_size: int = 4096
+    # Maximum number of distinct titles whose hydration is memoized
+
+    hydration_cache_path: str | None = None
+    # If set, the hydration cache is persisted here between runs
+
+    journal_path: str = ".chronofile/journal.jsonl"
+    # Write-ahead log of the changeset being applied, used to resume interrupted syncs
+
+    calendar_routes: Mapping[RecordCategory, str] = {}
+    # Calendar ID per category. Other events go to the default calendar.
+
+    calendar_requests_per_second: float = 5.0
+    # Rate limit per calendar
+
+    calendar_max_cached_homes: int = 10_000
+    # Events whose calendar is remembered when routing, for moves between calendars
+
+    calendar_daily_quota: int = 1_000_000
+    # Calendar API calls per day. Watch intervals stretch so the quota is not exhausted.
+
+    apply_budget: datetime.timedelta = datetime.timedelta(minutes=4)
+    # Time a cycle may spend on the destination. Changes which do not fit wait for the next cycle.
+
+    watch_interval: datetime.timedelta = datetime.timedelta(minutes=5)
+    # Interval between watch cycles at a moderate event rate
+
+    watch_min_interval: datetime.timedelta = datetime.timedelta(minutes=1)
+    # Shortest interval, used during heavy activity
+
+    watch_max_interval: datetime.timedelta = datetime.timedelta(hours=1)
+    # Longest interval idle cycles back off to
+
+    busy_events_per_minute: float = 1.0
+    # Source event rate at which watch intervals shorten
+
+    metrics_path: str | None = None
+    # If set, the watch interval and remaining quota are written here, in the Prometheus format
+
+    event_store_path: str | None = None
+    # If set, each cycle's merged timeline is kept in a local SQLite store, for the query command
+
+    start_tolerance: datetime.timedelta = datetime.timedelta(seconds=2)
+    end_tolerance: datetime.timedelta = datetime.timedelta(seconds=2)
+    # Destination events whose start and end drifted by at most this much are left as they are
+
     @staticmethod
     def from_toml(path: str) -> "Config":
-        values = toml.load(pathlib.Path(path))
+        return Config.from_toml_str(pathlib.Path(path).read_text())
+
+    @staticmethod
+    def from_toml_str(text: str) -> "Config":
+        values = toml.loads(text)
 
         return Config(
             sync_window=datetime.timedelta(seconds=values.get("sync_window", 60 * 60 * 5)),
@@ -72,5 +136,184 @@ class Config(pydantic.BaseModel):
                 RecordCategory(k): v for k, v in values.get("category2emoji", "").items()
             },
             exclude_apps=values.get("exclude_apps", []),
+            browser_apps=values.get("browser_apps", []),
             metadata_enrichment=values.get("metadata_enrichment", ""),
+            workers=values.get("workers", 1),
+            chunk_size=values.get("chunk_size", 2000),
+            hydration_cache_size=values.get("hydration_cache_size", 4096),
+            hydration_cache_path=values.get("hydration_cache_path"),
+            journal_path=values.get("journal_path", ".chronofile/journal.jsonl"),
+            calendar_routes={
+                RecordCategory(k): v for k, v in values.get("calendar_routes", {}).items()
+            },
+            calendar_requests_per_second=values.get("calendar_requests_per_second", 5.0),
+            calendar_max_cached_homes=values.get("calendar_max_cached_homes", 10_000),
+            calendar_daily_quota=values.get("calendar_daily_quota", 1_000_000),
+            apply_budget=datetime.timedelta(seconds=values.get("apply_budget", 60 * 4)),
+            watch_interval=datetime.timedelta(seconds=values.get("watch_interval", 60 * 5)),
+            watch_min_interval=datetime.timedelta(seconds=values.get("watch_min_interval", 60)),
+            watch_max_interval=datetime.timedelta(
+                seconds=values.get("watch_max_interval", 60 * 60)
+            ),
+            busy_events_per_minute=values.get("busy_events_per_minute", 1.0),
+            metrics_path=values.get("metrics_path"),
+            event_store_path=values.get("event_store_path"),
+            start_tolerance=datetime.timedelta(seconds=values.get("start_tolerance", 2)),
+            end_tolerance=datetime.timedelta(seconds=values.get("end_tolerance", 2)),
+        )
+
+
+@dataclass(frozen=True)
+class CompiledMatcher:
+    patterns: tuple[str, ...]
+    # Lowercased title matchers
+    category: RecordCategory
+    override_title: str | None
+    emoji: str | None
+
+
+@dataclass(frozen=True)
+class CompiledRules:
+    """Everything derived from the config that is needed per event, computed once.
+
+    content_hash is stable across processes and runs, so it can key caches of hydrated events.
+    """
+
+    min_duration: datetime.timedelta
+    merge_gap: datetime.timedelta
+    exclude_titles: tuple[str, ...]
+    # Lowercased
+    exclude_apps: tuple[str, ...]
+    # Lowercased
+    browser_apps: tuple[str, ...]
+    # Lowercased
+    matchers: tuple[CompiledMatcher, ...]
+    content_hash: str
+    start_tolerance: datetime.timedelta = datetime.timedelta(0)
+    end_tolerance: datetime.timedelta = datetime.timedelta(0)
+    # Only used when diffing, so not part of content_hash
+
+    def excludes_app(self, app: str) -> bool:
+        app = app.lower()
+        return any(excluded_app in app for excluded_app in self.exclude_apps)
+
+    def is_browser(self, app: str) -> bool:
+        app = app.lower()
+        return any(browser_app in app for browser_app in self.browser_apps)
+
+    def excludes_title(self, title: str) -> bool:
+        title = title.lower()
+        return any(excluded_title in title for excluded_title in self.exclude_titles)
+
+    @staticmethod
+    def compile(
+        *,
+        min_duration: datetime.timedelta,
+        merge_gap: datetime.timedelta,
+        exclude_titles: Sequence[str],
+        exclude_apps: Sequence[str],
+        metadata_enrichment: Sequence[RecordMetadata],
+        category2emoji: Mapping[RecordCategory, str],
+        browser_apps: Sequence[str] = (),
+        start_tolerance: datetime.timedelta = datetime.timedelta(0),
+        end_tolerance: datetime.timedelta = datetime.timedelta(0),
+    ) -> "CompiledRules":
+        matchers = tuple(
+            CompiledMatcher(
+                patterns=tuple(m.lower() for m in meta.title_matcher),
+                category=meta.category,
+                override_title=meta.override_title,
+                emoji=category2emoji.get(meta.category),
+            )
+            for meta in metadata_enrichment
         )
+        lowered_titles = tuple(t.lower() for t in exclude_titles)
+        lowered_apps = tuple(a.lower() for a in exclude_apps)
+        lowered_browsers = tuple(a.lower() for a in browser_apps)
+        content = {
+            "min_duration": min_duration.total_seconds(),
+            "merge_gap": merge_gap.total_seconds(),
+            "exclude_titles": lowered_titles,
+            "exclude_apps": lowered_apps,
+            "browser_apps": lowered_browsers,
+            "matchers": [
+                [m.patterns, m.category.value, m.override_title, m.emoji] for m in matchers
+            ],
+        }
+        return CompiledRules(
+            min_duration=min_duration,
+            merge_gap=merge_gap,
+            exclude_titles=lowered_titles,
+            exclude_apps=lowered_apps,
+            browser_apps=lowered_browsers,
+            matchers=matchers,
+            content_hash=hashlib.sha256(
+                json.dumps(content, sort_keys=True, ensure_ascii=False).encode()
+            ).hexdigest(),
+            start_tolerance=start_tolerance,
+            end_tolerance=end_tolerance,
+        )
+
+    @staticmethod
+    def from_config(cfg: Config) -> "CompiledRules":
+        return CompiledRules.compile(
+            min_duration=cfg.min_duration,
+            merge_gap=cfg.merge_gap,
+            exclude_titles=cfg.exclude_titles,
+            exclude_apps=cfg.exclude_apps,
+            metadata_enrichment=cfg.metadata_enrichment,
+            category2emoji=cfg.category2emoji,
+            browser_apps=cfg.browser_apps,
+            start_tolerance=cfg.start_tolerance,
+            end_tolerance=cfg.end_tolerance,
+        )
+
+
+@dataclass
+class ReloadingConfig:
+    """Config which is only re-read and recompiled when the file's mtime changes."""
+
+    path: str
+    _mtime: int | None = field(default=None, init=False)
+    _config: Config | None = field(default=None, init=False)
+    _rules: CompiledRules | None = field(default=None, init=False)
+
+    def refresh(self) -> bool:
+        """Reload if the file has changed since the last load. Returns whether it reloaded.
+
+        A broken file is logged and the previous config kept, so a half-saved edit does not
+        stop a running watch. Only the first load raises.
+        """
+        mtime = pathlib.Path(self.path).stat().st_mtime_ns
+        if mtime == self._mtime:
+            return False
+
+        try:
+            config = Config.from_toml(self.path)
+            rules = CompiledRules.from_config(config)
+        except (toml.TomlDecodeError, pydantic.ValidationError, ValueError):
+            # Unknown categories raise a plain ValueError
+            if self._config is None:
+                raise
+            log.exception(f"Could not reload config from {self.path}, keeping the previous one")
+            # Not retried until the file changes again
+            self._mtime = mtime
+            return False
+
+        self._config, self._rules = config, rules
+        if self._mtime is not None:
+            log.info(f"Reloaded config from {self.path}, rules hash {self._rules.content_hash[:8]}")
+        self._mtime = mtime
+        return True
+
+    @property
+    def config(self) -> Config:
+        if self._config is None:
+            self.refresh()
+        return self._config  # type: ignore
+
+    @property
+    def rules(self) -> CompiledRules:
+        if self._rules is None:
+            self.refresh()
+        return self._rules  # type: ignore
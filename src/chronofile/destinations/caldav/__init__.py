@@ -0,0 +1,3 @@
+from .client import (
+    CalDavClient,  # noqa: F401
+)
@@ -0,0 +1,356 @@
+import datetime
+import logging
+import threading
+import urllib.parse
+import xml.etree.ElementTree as ET
+import zoneinfo
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterator, Mapping, Sequence
+from xml.sax.saxutils import escape
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from chronofile.event import DestinationEvent, deterministic_id, has_deterministic_id
+
+if TYPE_CHECKING:
+    from chronofile.event import ChronofileEvent
+
+log = logging.getLogger(__name__)
+
+_DAV = "DAV:"
+_CALDAV = "urn:ietf:params:xml:ns:caldav"
+_NAMESPACES = {"d": _DAV, "c": _CALDAV}
+
+_CALENDAR_QUERY = """<?xml version="1.0" encoding="utf-8"?>
+<c:calendar-query xmlns:d="DAV:" xmlns:c="urn:ietf:params:xml:ns:caldav">
+  <d:prop><d:getetag/></d:prop>
+  <c:filter>
+    <c:comp-filter name="VCALENDAR">
+      <c:comp-filter name="VEVENT">
+        <c:time-range start="{start}" end="{end}"/>
+      </c:comp-filter>
+    </c:comp-filter>
+  </c:filter>
+</c:calendar-query>"""
+
+_MULTIGET = """<?xml version="1.0" encoding="utf-8"?>
+<c:calendar-multiget xmlns:d="DAV:" xmlns:c="urn:ietf:params:xml:ns:caldav">
+  <d:prop>
+    <d:getetag/>
+    <c:calendar-data><c:expand start="{start}" end="{end}"/></c:calendar-data>
+  </d:prop>
+  {hrefs}
+</c:calendar-multiget>"""
+# Expanded, recurring events come back as their instances in the window, with times in UTC
+
+
+def _ical_timestamp(value: datetime.datetime) -> str:
+    return value.astimezone(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _unescape(text: str) -> str:
+    return (
+        text.replace("\\n", "\n").replace("\\N", "\n").replace("\\,", ",").replace("\\;", ";")
+    ).replace("\\\\", "\\")
+
+
+def to_ical(uid: str, event: "ChronofileEvent") -> str:
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//chronofile//EN",
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTAMP:{_ical_timestamp(datetime.datetime.now(datetime.timezone.utc))}",
+        f"DTSTART:{_ical_timestamp(event.start)}",
+        f"DTEND:{_ical_timestamp(event.end)}",
+        f"SUMMARY:{_escape(event.title)}",
+        "END:VEVENT",
+        "END:VCALENDAR",
+    ]
+    return "\r\n".join(lines) + "\r\n"
+
+
+def _unfolded(text: str) -> Iterator[str]:
+    """Content lines, with continuation lines joined back onto the line they continue."""
+    line = ""
+    for raw in text.replace("\r\n", "\n").split("\n"):
+        if raw.startswith((" ", "\t")):
+            line += raw[1:]
+            continue
+        if line:
+            yield line
+        line = raw
+    if line:
+        yield line
+
+
+def _parse_time(value: str, params: Mapping[str, str]) -> datetime.datetime | None:
+    if "T" not in value:
+        # All-day events only have a date
+        return None
+    if value.endswith("Z"):
+        return datetime.datetime.strptime(value, "%Y%m%dT%H%M%SZ").replace(
+            tzinfo=datetime.timezone.utc
+        )
+    local = datetime.datetime.strptime(value, "%Y%m%dT%H%M%S")
+    return local.replace(tzinfo=_timezone(params)).astimezone(datetime.timezone.utc)
+
+
+def _timezone(params: Mapping[str, str]) -> datetime.tzinfo:
+    if "TZID" not in params:
+        return datetime.timezone.utc
+    try:
+        return zoneinfo.ZoneInfo(params["TZID"])
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+        # Outlook and others use Windows names, defined in the calendar's VTIMEZONE
+        log.warning(f"Unknown time zone {params['TZID']}, reading the time as UTC")
+        return datetime.timezone.utc
+
+
+def patch_ical(text: str, event: DestinationEvent) -> str:
+    """Set the times and title of the first VEVENT of a calendar object, keeping the rest."""
+    lines: list[str] = []
+    depth = 0
+    # Of components nested in the VEVENT being patched, such as alarms
+    in_event, patched = False, False
+    for line in _unfolded(text):
+        name = line.split(":", 1)[0].split(";", 1)[0].upper()
+        if line == "BEGIN:VEVENT" and not patched:
+            in_event, patched = True, True
+            lines.extend(
+                [
+                    line,
+                    f"DTSTART:{_ical_timestamp(event.start)}",
+                    f"DTEND:{_ical_timestamp(event.end)}",
+                    f"SUMMARY:{_escape(event.title)}",
+                ]
+            )
+            continue
+        if in_event and name == "BEGIN":
+            depth += 1
+        elif in_event and name == "END" and depth > 0:
+            depth -= 1
+        elif in_event and name == "END":
+            in_event = False
+        elif in_event and depth == 0 and name in ("DTSTART", "DTEND", "DURATION", "SUMMARY"):
+            continue
+        lines.append(line)
+    return "\r\n".join(lines) + "\r\n"
+
+
+def parse_ical(text: str) -> DestinationEvent | None:
+    """Parse the first VEVENT of a calendar object. Returns None for all-day events."""
+    properties: dict[str, tuple[str, Mapping[str, str]]] = {}
+    in_event = False
+    depth = 0
+    # Of components nested in the VEVENT, whose properties are not the event's
+    for line in _unfolded(text):
+        if line == "BEGIN:VEVENT":
+            in_event = True
+        elif line == "END:VEVENT":
+            break
+        elif in_event and line.startswith("BEGIN:"):
+            depth += 1
+        elif in_event and line.startswith("END:"):
+            depth -= 1
+        elif in_event and depth == 0 and ":" in line:
+            name_and_params, value = line.split(":", 1)
+            name, *params = name_and_params.split(";")
+            properties.setdefault(
+                name.upper(), (value, dict(p.split("=", 1) for p in params if "=" in p))
+            )
+
+    start = _parse_time(*properties["DTSTART"])
+    end = _parse_time(*properties["DTEND"]) if "DTEND" in properties else start
+    if start is None or end is None:
+        return None
+    return DestinationEvent(
+        title=_unescape(properties.get("SUMMARY", ("", {}))[0]),
+        start=start,
+        end=end,
+        id=properties["UID"][0],
+    )
+
+
+@dataclass(frozen=True)
+class _Resource:
+    href: str
+    etag: str
+    event: DestinationEvent | None
+
+
+@dataclass
+class CalDavClient:
+    """Destination client for a CalDAV calendar collection.
+
+    get_events lists the hrefs and etags in the window with a calendar-query REPORT, then
+    fetches only the resources whose etag changed with batched calendar-multiget REPORTs.
+    All requests share one session, so they reuse a pool of persistent connections.
+    Inserted events are named after their deterministic id, so a retried insert overwrites
+    the resource instead of duplicating it. Other events are updated by patching the stored
+    calendar object, so their other properties and components are kept.
+
+    At most max_cached_resources etags and hrefs are kept, least recently used first out, so
+    streaming a long history through get_events does not grow memory with the history.
+    """
+
+    url: str
+    # The calendar collection, e.g. https://dav.example.com/calendars/me/chronofile/
+    username: str | None = None
+    password: str | None = None
+    multiget_batch_size: int = 100
+    pool_size: int = 8
+    max_cached_resources: int = 10_000
+
+    def __post_init__(self):
+        if not self.url.endswith("/"):
+            self.url += "/"
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        if self.username is not None and self.password is not None:
+            self._session.auth = (self.username, self.password)
+        self._lock = threading.Lock()
+        self._resources: OrderedDict[str, _Resource] = OrderedDict()
+        # By event id, from the latest fetches and writes, least recently used first
+
+    def _request(
+        self, method: str, url: str, body: str | None = None, **headers: str
+    ) -> requests.Response:
+        response = self._session.request(method, url, data=body, headers=headers)
+        response.raise_for_status()
+        return response
+
+    def _report(self, body: str) -> Iterator[tuple[str, str, str | None]]:
+        """Yields (href, etag, calendar data) per resource in a multistatus response."""
+        response = self._request(
+            "REPORT",
+            self.url,
+            body,
+            **{"Depth": "1", "Content-Type": "application/xml; charset=utf-8"},
+        )
+        for item in ET.fromstring(response.content).iterfind("d:response", _NAMESPACES):
+            href = item.findtext("d:href", default="", namespaces=_NAMESPACES)
+            etag = item.findtext(".//d:getetag", default="", namespaces=_NAMESPACES)
+            data = item.findtext(".//c:calendar-data", default=None, namespaces=_NAMESPACES)
+            yield href, etag, data
+
+    def _new_href(self, uid: str) -> str:
+        # Servers report hrefs as absolute paths, so new resources are named the same way
+        return f"{urllib.parse.urlsplit(self.url).path}{uid}.ics"
+
+    def _remember(self, event_id: str, resource: _Resource):
+        # Callers hold the lock
+        self._resources[event_id] = resource
+        self._resources.move_to_end(event_id)
+        while len(self._resources) > self.max_cached_resources:
+            self._resources.popitem(last=False)
+
+    def _href(self, event: DestinationEvent) -> str:
+        with self._lock:
+            resource = self._resources.get(event.id)
+        return resource.href if resource is not None else self._new_href(event.id)
+
+    def _absolute(self, href: str) -> str:
+        return urllib.parse.urljoin(self.url, href)
+
+    def get_events(
+        self, start: datetime.datetime, end: datetime.datetime
+    ) -> Sequence[DestinationEvent]:
+        listed = list(
+            self._report(
+                _CALENDAR_QUERY.format(start=_ical_timestamp(start), end=_ical_timestamp(end))
+            )
+        )
+        with self._lock:
+            known = {r.href: r for r in self._resources.values()}
+        changed = [
+            href for href, etag, _ in listed if href not in known or known[href].etag != etag
+        ]
+
+        fetched: dict[str, _Resource] = {}
+        for i in range(0, len(changed), self.multiget_batch_size):
+            hrefs = "".join(
+                f"<d:href>{escape(href)}</d:href>"
+                for href in changed[i : i + self.multiget_batch_size]
+            )
+            multiget = _MULTIGET.format(
+                start=_ical_timestamp(start), end=_ical_timestamp(end), hrefs=hrefs
+            )
+            for href, etag, data in self._report(multiget):
+                fetched[href] = _Resource(
+                    href=href, etag=etag, event=parse_ical(data) if data else None
+                )
+        log.info(
+            f"Fetched {len(changed)} of {len(listed)} CalDAV resources, the rest were unchanged"
+        )
+
+        resources: list[_Resource] = []
+        for href, _, _ in listed:
+            resource = fetched.get(href) or known.get(href)
+            # Resources deleted between the two requests are missing from the multiget
+            if resource is not None:
+                resources.append(resource)
+        with self._lock:
+            for r in resources:
+                if r.event is not None:
+                    self._remember(r.event.id, r)
+        return [r.event for r in resources if r.event is not None]
+
+    def _put(
+        self, uid: str, event: "ChronofileEvent", href: str, data: str | None = None, **headers: str
+    ) -> DestinationEvent:
+        response = self._request(
+            "PUT",
+            self._absolute(href),
+            data if data is not None else to_ical(uid, event),
+            **{"Content-Type": "text/calendar; charset=utf-8", **headers},
+        )
+        stored = DestinationEvent(title=event.title, start=event.start, end=event.end, id=uid)
+        with self._lock:
+            self._remember(
+                uid, _Resource(href=href, etag=response.headers.get("ETag", ""), event=stored)
+            )
+        return stored
+
+    def add_event(self, event: "ChronofileEvent") -> DestinationEvent:
+        uid = deterministic_id(event)
+        href = self._new_href(uid)
+        try:
+            return self._put(uid, event, href, **{"If-None-Match": "*"})
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code != 412:
+                raise
+            # An earlier attempt inserted the event, so overwrite it
+            log.info(f"{event} already exists, updating it instead")
+            return self._put(uid, event, href)
+
+    def update_event(self, event: DestinationEvent) -> DestinationEvent:
+        href = self._href(event)
+        if has_deterministic_id(event):
+            # Written whole by chronofile, so there is nothing else to keep
+            return self._put(event.id, event, href)
+
+        # Patched as stored, so properties chronofile does not know about, like alarms, survive
+        stored = self._request("GET", self._absolute(href))
+        return self._put(
+            event.id,
+            event,
+            href,
+            patch_ical(stored.text, event),
+            **{"If-Match": stored.headers.get("ETag", "*")},
+        )
+
+    def delete_event(self, event: DestinationEvent) -> None:
+        href = self._href(event)
+        self._request("DELETE", self._absolute(href))
+        with self._lock:
+            self._resources.pop(event.id, None)
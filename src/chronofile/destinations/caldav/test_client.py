@@ -0,0 +1,299 @@
+import datetime
+import logging
+import threading
+import xml.etree.ElementTree as ET
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Iterator
+from xml.sax.saxutils import escape
+
+import pytest
+
+from chronofile.benchmark import destination_throughput
+from chronofile.event import ChronofileEvent, DestinationEvent
+
+from .client import CalDavClient, parse_ical, to_ical
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+START = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+COLLECTION = "/calendars/me/chronofile/"
+_NS = {"d": "DAV:", "c": "urn:ietf:params:xml:ns:caldav"}
+
+
+class CalDavStandIn(ThreadingHTTPServer):
+    """A single calendar collection, held in memory, speaking just enough CalDAV."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.resources: dict[str, tuple[str, str]] = {}
+        # href -> (etag, calendar data)
+        self.requests: Counter[str] = Counter()
+        self.expanded: list[tuple[str, str]] = []
+        # The (start, end) each multiget asked for its calendar data to be expanded to
+        self.connections = 0
+        self._version = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}{COLLECTION}"
+
+    def next_etag(self) -> str:
+        self._version += 1
+        return f'"{self._version}"'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: CalDavStandIn
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format: str, *args: object):  # noqa: A002
+        pass
+
+    def _body(self) -> str:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+
+    def _reply(self, status: int, body: str = "", **headers: str):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body.encode())))
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests["GET"] += 1
+            resource = self.server.resources.get(self.path)
+        if resource is None:
+            self._reply(404)
+            return
+        etag, data = resource
+        self._reply(200, data, ETag=etag, **{"Content-Type": "text/calendar"})
+
+    def do_PUT(self):
+        body = self._body()
+        with self.server.lock:
+            self.server.requests["PUT"] += 1
+            stored = self.server.resources.get(self.path)
+            if self.headers.get("If-None-Match") == "*" and stored is not None:
+                self._reply(412)
+                return
+            if_match = self.headers.get("If-Match")
+            if if_match not in (None, "*") and (stored is None or stored[0] != if_match):
+                self._reply(412)
+                return
+            etag = self.server.next_etag()
+            self.server.resources[self.path] = (etag, body)
+        self._reply(201, ETag=etag)
+
+    def do_DELETE(self):
+        with self.server.lock:
+            self.server.requests["DELETE"] += 1
+            found = self.server.resources.pop(self.path, None) is not None
+        self._reply(204 if found else 404)
+
+    def do_REPORT(self):
+        query = ET.fromstring(self._body())
+        with self.server.lock:
+            if query.tag.endswith("calendar-query"):
+                self.server.requests["calendar-query"] += 1
+                time_range = query.find(".//c:time-range", _NS)
+                assert time_range is not None
+                start, end = (
+                    datetime.datetime.strptime(time_range.get(k, ""), "%Y%m%dT%H%M%SZ").replace(
+                        tzinfo=datetime.timezone.utc
+                    )
+                    for k in ("start", "end")
+                )
+                items = [
+                    (href, etag, None)
+                    for href, (etag, data) in self.server.resources.items()
+                    if _overlaps(data, start, end)
+                ]
+            else:
+                self.server.requests["calendar-multiget"] += 1
+                expand = query.find(".//c:expand", _NS)
+                if expand is not None:
+                    self.server.expanded.append((expand.get("start", ""), expand.get("end", "")))
+                hrefs = [h.text or "" for h in query.iterfind("d:href", _NS)]
+                items = [
+                    (href, *self.server.resources[href])
+                    for href in hrefs
+                    if href in self.server.resources
+                ]
+        self._reply(207, _multistatus(items), **{"Content-Type": "application/xml"})
+
+
+def _overlaps(data: str, start: datetime.datetime, end: datetime.datetime) -> bool:
+    event = parse_ical(data)
+    return event is not None and event.start < end and event.end > start
+
+
+def _multistatus(items: "Sequence[tuple[str, str, str | None]]") -> str:
+    responses = "".join(
+        f"<d:response><d:href>{escape(href)}</d:href><d:propstat><d:prop>"
+        f"<d:getetag>{etag}</d:getetag>"
+        + (f"<c:calendar-data>{escape(data)}</c:calendar-data>" if data is not None else "")
+        + "</d:prop><d:status>HTTP/1.1 200 OK</d:status></d:propstat></d:response>"
+        for href, etag, data in items
+    )
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>'
+        f'<d:multistatus xmlns:d="DAV:" xmlns:c="urn:ietf:params:xml:ns:caldav">{responses}'
+        "</d:multistatus>"
+    )
+
+
+@pytest.fixture()
+def server() -> Iterator[CalDavStandIn]:
+    server = CalDavStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _event(title: str, minute: int) -> ChronofileEvent:
+    return ChronofileEvent(
+        title=title,
+        start=START + datetime.timedelta(minutes=minute),
+        end=START + datetime.timedelta(minutes=minute + 1),
+    )
+
+
+def _titles(events: "Sequence[DestinationEvent]") -> list[str]:
+    return sorted(e.title for e in events)
+
+
+def test_ical_round_trip_escapes_text():
+    event = _event("Re: lunch; today, 12:00 <b> & \\ maybe", 0)
+
+    parsed = parse_ical(to_ical("uid", event))
+
+    assert parsed == DestinationEvent(**event.model_dump(), id="uid")
+
+
+def test_writes_and_time_range_queries(server: CalDavStandIn):
+    client = CalDavClient(url=server.url)
+    added = [client.add_event(_event(title, minute)) for title, minute in [("a", 0), ("b", 60)]]
+
+    assert _titles(client.get_events(START, START + datetime.timedelta(minutes=30))) == ["a"]
+
+    client.update_event(added[0].model_copy(update={"title": "renamed"}))
+    client.delete_event(added[1])
+
+    assert _titles(client.get_events(START, START + datetime.timedelta(days=1))) == ["renamed"]
+
+
+def test_retried_inserts_overwrite_instead_of_duplicating(server: CalDavStandIn):
+    client = CalDavClient(url=server.url)
+
+    client.add_event(_event("a", 0))
+    client.add_event(_event("a", 0))
+
+    assert len(server.resources) == 1
+
+
+def test_only_changed_resources_are_multigot_in_batches(server: CalDavStandIn):
+    writer = CalDavClient(url=server.url)
+    for minute in range(5):
+        writer.add_event(_event(f"event {minute}", minute))
+    reader = CalDavClient(url=server.url, multiget_batch_size=2)
+    window = (START, START + datetime.timedelta(days=1))
+
+    assert len(reader.get_events(*window)) == 5
+    assert server.requests["calendar-multiget"] == 3
+
+    writer.add_event(_event("event 5", 5))
+    assert len(reader.get_events(*window)) == 6
+    # Only the new resource is fetched
+    assert server.requests["calendar-multiget"] == 4
+
+
+def test_requests_reuse_pooled_connections(server: CalDavStandIn):
+    client = CalDavClient(url=server.url)
+
+    destination_throughput(client, n_events=20)  # type: ignore
+
+    assert server.connections == 1
+
+
+def test_cached_resources_are_bounded(server: CalDavStandIn):
+    writer = CalDavClient(url=server.url)
+    for day in range(5):
+        writer.add_event(_event(f"day {day}", day * 24 * 60))
+    reader = CalDavClient(url=server.url, max_cached_resources=2)
+
+    # Streaming the history a day at a time keeps only the latest resources
+    for day in range(5):
+        start = START + datetime.timedelta(days=day)
+        assert len(reader.get_events(start, start + datetime.timedelta(days=1))) == 1
+    assert len(reader._resources) == 2
+
+    reader.get_events(START, START + datetime.timedelta(days=1))
+    # The first day was evicted, so it is fetched again
+    assert server.requests["calendar-multiget"] == 6
+
+
+MEETING = """BEGIN:VCALENDAR\r
+VERSION:2.0\r
+PRODID:-//Other client//EN\r
+BEGIN:VEVENT\r
+UID:meeting\r
+DTSTART;TZID=Europe/Copenhagen:20230101T010000\r
+DTEND;TZID=Europe/Copenhagen:20230101T013000\r
+SUMMARY:Standup\r
+LOCATION:Room 1\r
+BEGIN:VALARM\r
+ACTION:DISPLAY\r
+SUMMARY:Reminder\r
+TRIGGER:-PT5M\r
+END:VALARM\r
+END:VEVENT\r
+END:VCALENDAR\r
+"""
+
+
+def test_updates_to_other_clients_events_keep_their_other_properties(server: CalDavStandIn):
+    server.resources[f"{COLLECTION}meeting&notes.ics"] = ('"0"', MEETING)
+    client = CalDavClient(url=server.url)
+    [meeting] = client.get_events(START, START + datetime.timedelta(days=1))
+    assert (meeting.title, meeting.start) == ("Standup", START)
+
+    client.update_event(meeting.model_copy(update={"end": START + datetime.timedelta(hours=1)}))
+
+    _, data = server.resources[f"{COLLECTION}meeting&notes.ics"]
+    assert "LOCATION:Room 1" in data
+    assert "BEGIN:VALARM\r\nACTION:DISPLAY\r\nSUMMARY:Reminder\r\n" in data
+    assert parse_ical(data) == meeting.model_copy(
+        update={"end": START + datetime.timedelta(hours=1)}
+    )
+
+
+def test_multigets_expand_to_the_window(server: CalDavStandIn):
+    CalDavClient(url=server.url).add_event(_event("a", 0))
+    client = CalDavClient(url=server.url)
+
+    client.get_events(START, START + datetime.timedelta(days=1))
+
+    assert server.expanded == [("20230101T000000Z", "20230102T000000Z")]
+
+
+def test_unknown_time_zones_are_read_as_utc(caplog: pytest.LogCaptureFixture):
+    ical = MEETING.replace("Europe/Copenhagen", "W. Europe Standard Time")
+
+    with caplog.at_level(logging.WARNING):
+        event = parse_ical(ical)
+
+    assert event is not None
+    assert event.start == START + datetime.timedelta(hours=1)
+    assert "W. Europe Standard Time" in caplog.text
@@ -1,25 +1,32 @@
 import logging
+import threading
 from dataclasses import dataclass
 from datetime import datetime
-from typing import TYPE_CHECKING, Protocol, Sequence
+from typing import TYPE_CHECKING, Any, Mapping, Protocol, Sequence
 
 import devtools
+import httplib2
 import pytz
 from gcsa.event import Event as GCSAEvent
 from gcsa.google_calendar import GoogleCalendar
 from google.oauth2.credentials import Credentials
-from iterpy.arr import Arr
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.errors import HttpError
 
-from chronofile.event import DestinationEvent
+from chronofile.event import DestinationEvent, deterministic_id
 
 from ._consts import required_scopes
+from .fetch import fetch_window, partial_fields
 
 if TYPE_CHECKING:
     from chronofile.event import ChronofileEvent
+    from chronofile.scheduler import QuotaTracker
 
 
-def _parsed_to_gcsa_event(event: "ChronofileEvent") -> GCSAEvent:
-    return GCSAEvent(summary=event.title, start=event.start, end=event.end, timezone=event.timezone)
+def _parsed_to_gcsa_event(event: "ChronofileEvent", **kwargs: Any) -> GCSAEvent:
+    return GCSAEvent(
+        summary=event.title, start=event.start, end=event.end, timezone=event.timezone, **kwargs
+    )
 
 
 def _destination_to_gcsa_event(event: "DestinationEvent") -> GCSAEvent:
@@ -41,11 +48,7 @@ def _to_destination_event(event: GCSAEvent) -> DestinationEvent:
     start: datetime = event.start  # type: ignore
     end: datetime = event.end  # type: ignore
     return DestinationEvent(
-        title=_empty_if_none(event.summary),
-        start=start,
-        end=end,
-        id=_empty_if_none(event.event_id),
-        source_event=None,
+        title=_empty_if_none(event.summary), start=start, end=end, id=_empty_if_none(event.event_id)
     )
 
 
@@ -65,10 +68,6 @@ def _timezone_to_utc(event: GCSAEvent) -> GCSAEvent:
     return event
 
 
-def _event_is_all_day(event: GCSAEvent) -> bool:
-    return not isinstance(event.start, datetime) or not isinstance(event.end, datetime)
-
-
 class DestinationClient(Protocol):
     """Interface for a client that can add, get, update, and delete events. All responsese must be in UTC."""
 
@@ -91,48 +90,87 @@ class GcalClient(DestinationClient):
     client_id: str
     client_secret: str
     refresh_token: str
+    max_fetch_workers: int = 8
+    quota: "QuotaTracker | None" = None
+    # Counts every API request, including each page of a fetch and retries after conflicts
 
     def __post_init__(self):
+        self._credentials = Credentials(
+            token=None,
+            refresh_token=self.refresh_token,
+            token_uri="https://oauth2.googleapis.com/token",
+            scopes=required_scopes,
+            client_id=self.client_id,
+            client_secret=self.client_secret,
+        )
         self._client = GoogleCalendar(
-            default_calendar=self.calendar_id,
-            credentials=Credentials(
-                token=None,
-                refresh_token=self.refresh_token,
-                token_uri="https://oauth2.googleapis.com/token",
-                scopes=required_scopes,
-                client_id=self.client_id,
-                client_secret=self.client_secret,
-            ),
+            default_calendar=self.calendar_id, credentials=self._credentials
+        )
+        self._thread_local = threading.local()
+
+    def _http(self) -> AuthorizedHttp:
+        # httplib2 is not thread-safe, so each fetch thread gets its own connection
+        if not hasattr(self._thread_local, "http"):
+            self._thread_local.http = AuthorizedHttp(self._credentials, http=httplib2.Http())
+        return self._thread_local.http
+
+    def _record_request(self):
+        if self.quota is not None:
+            self.quota.record()
+
+    def _list_page(
+        self, start: datetime, end: datetime, page_token: str | None
+    ) -> Mapping[str, Any]:
+        self._record_request()
+        return (
+            self._client.service.events()  # type: ignore
+            .list(
+                calendarId=self.calendar_id,
+                timeMin=start.isoformat(),
+                timeMax=end.isoformat(),
+                singleEvents=True,
+                fields=partial_fields,
+                pageToken=page_token,
+            )
+            .execute(http=self._http())
         )
 
     def add_event(self, event: "ChronofileEvent") -> DestinationEvent:
-        val = self._client.add_event(  # type: ignore
-            _parsed_to_gcsa_event(event)
-        )
+        event_id = deterministic_id(event)
+        self._record_request()
+        try:
+            val = self._client.add_event(  # type: ignore
+                _parsed_to_gcsa_event(event, event_id=event_id)
+            )
+        except HttpError as e:
+            if e.resp.status != 409:
+                raise
+            # The id is taken, so an earlier attempt inserted the event. It may since have been
+            # deleted, which keeps the id reserved, so restore it while updating.
+            logging.info(f"{event} already exists, updating it instead")
+            self._record_request()
+            val = self._client.update_event(  # type: ignore
+                _parsed_to_gcsa_event(event, event_id=event_id, other={"status": "confirmed"})
+            )
         return _to_destination_event(_timezone_to_utc(val))
 
     def get_events(self, start: datetime, end: datetime) -> Sequence[DestinationEvent]:
-        events = (
-            Arr(
-                self._client.get_events(  # type: ignore
-                    start, end, order_by="updated", single_events=True
-                )
-            )
-            .filter(lambda e: not _event_is_all_day(e))
-            .map(_timezone_to_utc)
-            .map(_to_destination_event)
-            .to_list()
+        events = fetch_window(
+            self._list_page, start=start, end=end, max_workers=self.max_fetch_workers
         )
-        logging.debug(f"Destination events: {devtools.debug.format(events)}")
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(f"Destination events: {devtools.debug.format(events)}")
         return events
 
     def update_event(self, event: DestinationEvent) -> DestinationEvent:
+        self._record_request()
         response = self._client.update_event(  # type: ignore
             _destination_to_gcsa_event(event)
         )
         return _to_destination_event(_timezone_to_utc(response))
 
     def delete_event(self, event: DestinationEvent) -> None:
+        self._record_request()
         self._client.delete_event(  # type: ignore
             _destination_to_gcsa_event(event)
         )
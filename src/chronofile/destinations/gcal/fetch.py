@@ -0,0 +1,79 @@
+import datetime
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Mapping, Sequence
+
+from chronofile.event import DestinationEvent
+
+log = logging.getLogger(__name__)
+
+partial_fields = "nextPageToken,items(id,summary,start,end)"
+# Only request the fields chronofile uses. Shrinks the payload and the parsing work.
+
+ListPage = Callable[["datetime.datetime", "datetime.datetime", str | None], Mapping[str, Any]]
+# Fetches a single page of events between start and end, continuing from a page token
+
+
+def day_ranges(
+    start: "datetime.datetime", end: "datetime.datetime"
+) -> Sequence[tuple["datetime.datetime", "datetime.datetime"]]:
+    """Split a window into consecutive ranges of at most one day."""
+    ranges: list[tuple[datetime.datetime, datetime.datetime]] = []
+    range_start = start
+    while range_start < end:
+        range_end = min(range_start + datetime.timedelta(days=1), end)
+        ranges.append((range_start, range_end))
+        range_start = range_end
+    return ranges
+
+
+def _parse_timestamp(value: Mapping[str, str]) -> "datetime.datetime | None":
+    if "dateTime" not in value:
+        # All-day events only have a date
+        return None
+    return datetime.datetime.fromisoformat(value["dateTime"]).astimezone(datetime.timezone.utc)
+
+
+def parse_partial_event(item: Mapping[str, Any]) -> DestinationEvent | None:
+    """Parse a partial event resource. Returns None for all-day events."""
+    start = _parse_timestamp(item["start"])
+    end = _parse_timestamp(item["end"])
+    if start is None or end is None:
+        return None
+    return DestinationEvent(title=item.get("summary", ""), start=start, end=end, id=item["id"])
+
+
+def _fetch_range(
+    list_page: ListPage, start: "datetime.datetime", end: "datetime.datetime"
+) -> Sequence[Mapping[str, Any]]:
+    items: list[Mapping[str, Any]] = []
+    page_token = None
+    while True:
+        response = list_page(start, end, page_token)
+        items.extend(response.get("items", []))
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return items
+
+
+def fetch_window(
+    list_page: ListPage, start: "datetime.datetime", end: "datetime.datetime", max_workers: int = 8
+) -> Sequence[DestinationEvent]:
+    """Fetch all timed events in a window, fetching each day concurrently.
+
+    Events spanning a day boundary are returned by both days, so are deduplicated by id.
+    """
+    ranges = day_ranges(start, end)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(ranges)))) as executor:
+        pages = list(executor.map(lambda r: _fetch_range(list_page, *r), ranges))
+
+    events: dict[str, DestinationEvent] = {}
+    for item in (item for page in pages for item in page):
+        if item["id"] in events:
+            continue
+        event = parse_partial_event(item)
+        if event is not None:
+            events[event.id] = event
+
+    log.debug(f"Fetched {len(events)} destination events in {len(ranges)} day ranges")
+    return list(events.values())
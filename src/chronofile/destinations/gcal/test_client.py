@@ -0,0 +1,68 @@
+import datetime
+from dataclasses import dataclass, field
+from typing import Any, Mapping, Sequence
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from chronofile.scheduler import QuotaTracker
+from chronofile.test_event import FakeParsedEvent
+
+from .client import GcalClient
+
+START = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+@dataclass
+class _ListRequest:
+    page: Mapping[str, Any]
+
+    def execute(self, http: Any) -> Mapping[str, Any]:  # noqa: ARG002
+        return self.page
+
+
+@dataclass
+class _Calendar:
+    """Stands in for gcsa's GoogleCalendar, serving pages and rejecting inserts as conflicts."""
+
+    pages: Sequence[Mapping[str, Any]]
+    listed: list[str | None] = field(default_factory=list)
+
+    @property
+    def service(self) -> "_Calendar":
+        return self
+
+    def events(self) -> "_Calendar":
+        return self
+
+    def list(self, pageToken: str | None, **kwargs: Any) -> _ListRequest:  # noqa: ARG002
+        self.listed.append(pageToken)
+        return _ListRequest(self.pages[len(self.listed) - 1])
+
+    def add_event(self, event: Any):  # noqa: ARG002
+        raise HttpError(resp=httplib2.Response({"status": 409}), content=b"")
+
+    def update_event(self, event: Any) -> Any:
+        return event
+
+
+def test_every_request_counts_against_the_quota():
+    quota = QuotaTracker(daily_budget=100, clock=lambda: START)
+    client = GcalClient(
+        calendar_id="primary",
+        client_id="id",
+        client_secret="secret",
+        refresh_token="token",
+        quota=quota,
+    )
+    client._client = _Calendar(  # type: ignore
+        pages=[{"items": [], "nextPageToken": "next"}, {"items": []}]
+    )
+
+    client.get_events(start=START, end=START + datetime.timedelta(hours=1))
+    # The first page points to a second
+    assert quota.used == 2
+
+    client.add_event(FakeParsedEvent(start=START, end=START + datetime.timedelta(minutes=5)))
+    # The insert conflicts, so the event is updated instead
+    assert quota.used == 4
@@ -0,0 +1,76 @@
+import datetime
+from typing import Any, Mapping
+
+from chronofile.destinations.gcal.fetch import day_ranges, fetch_window, parse_partial_event
+
+UTC = datetime.timezone.utc
+
+
+def test_day_ranges_split_window_into_days():
+    start = datetime.datetime(2023, 1, 1, 12, tzinfo=UTC)
+    end = datetime.datetime(2023, 1, 3, 6, tzinfo=UTC)
+    assert day_ranges(start, end) == [
+        (start, datetime.datetime(2023, 1, 2, 12, tzinfo=UTC)),
+        (datetime.datetime(2023, 1, 2, 12, tzinfo=UTC), end),
+    ]
+
+
+def test_parse_partial_event():
+    event = parse_partial_event(
+        {
+            "id": "abc",
+            "summary": "🔥 Test",
+            "start": {"dateTime": "2023-01-01T01:00:00+01:00"},
+            "end": {"dateTime": "2023-01-01T00:30:00Z"},
+        }
+    )
+    assert event is not None
+    assert event.id == "abc"
+    assert event.start == datetime.datetime(2023, 1, 1, 0, 0, tzinfo=UTC)
+    assert event.end == datetime.datetime(2023, 1, 1, 0, 30, tzinfo=UTC)
+
+
+def test_parse_partial_event_skips_all_day_events():
+    assert (
+        parse_partial_event(
+            {
+                "id": "abc",
+                "summary": "Holiday",
+                "start": {"date": "2023-01-01"},
+                "end": {"date": "2023-01-02"},
+            }
+        )
+        is None
+    )
+
+
+def test_fetch_window_paginates_and_deduplicates_across_days():
+    spanning = {
+        "id": "spanning",
+        "summary": "Late night",
+        "start": {"dateTime": "2023-01-01T23:00:00Z"},
+        "end": {"dateTime": "2023-01-02T01:00:00Z"},
+    }
+    morning = {
+        "id": "morning",
+        "summary": "Morning",
+        "start": {"dateTime": "2023-01-02T08:00:00Z"},
+        "end": {"dateTime": "2023-01-02T09:00:00Z"},
+    }
+    pages: Mapping[tuple[int, str | None], Mapping[str, Any]] = {
+        (1, None): {"items": [spanning]},
+        (2, None): {"items": [spanning], "nextPageToken": "next"},
+        (2, "next"): {"items": [morning]},
+    }
+
+    def list_page(
+        start: datetime.datetime, _end: datetime.datetime, page_token: str | None
+    ) -> Mapping[str, Any]:
+        return pages[(start.day, page_token)]
+
+    events = fetch_window(
+        list_page,
+        start=datetime.datetime(2023, 1, 1, tzinfo=UTC),
+        end=datetime.datetime(2023, 1, 3, tzinfo=UTC),
+    )
+    assert sorted(e.id for e in events) == ["morning", "spanning"]
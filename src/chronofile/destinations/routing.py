@@ -0,0 +1,164 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Mapping, Sequence
+
+from chronofile import diff
+
+if TYPE_CHECKING:
+    import datetime
+
+    from chronofile.config import RecordCategory
+    from chronofile.destinations.gcal.client import DestinationClient
+    from chronofile.event import ChronofileEvent, DestinationEvent
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class RateLimiter:
+    """Spaces out calls to at most per_second, across all threads sharing the limiter."""
+
+    per_second: float
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False)
+    _next: float = field(default=0.0, init=False)
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + 1 / self.per_second
+        if delay > 0:
+            time.sleep(delay)
+
+
+@dataclass
+class RoutingDestination:
+    """Routes events to a calendar per category, each with its own client and rate limiter.
+
+    Events without a routed category go to the default calendar. Each client holds its own
+    connections, so calendars can be fetched and written to concurrently.
+
+    The calendars of at most max_cached_homes events are kept, least recently used first out,
+    so a long-running watch does not grow memory with the history. Forgotten events are
+    assumed to live where their category routes them, until they are fetched again.
+    """
+
+    default: "DestinationClient"
+    routes: Mapping["RecordCategory", "DestinationClient"] = field(default_factory=dict)
+    requests_per_second: float = 5.0
+    max_cached_homes: int = 10_000
+
+    def __post_init__(self):
+        self._calendars: list[DestinationClient] = [self.default]
+        for client in self.routes.values():
+            if all(client is not c for c in self._calendars):
+                self._calendars.append(client)
+        self._limiters = [RateLimiter(self.requests_per_second) for _ in self._calendars]
+        self._route_index = {
+            category: next(i for i, c in enumerate(self._calendars) if c is client)
+            for category, client in self.routes.items()
+        }
+        self._lock = threading.Lock()
+        self._home: OrderedDict[str, int] = OrderedDict()
+        # Which calendar each fetched or inserted event lives in, by id, least recently used first
+
+    def _route(self, category: "RecordCategory | None") -> int:
+        if category is None:
+            return 0
+        return self._route_index.get(category, 0)
+
+    def _target(self, event: "ChronofileEvent") -> int:
+        return self._route(event.category)
+
+    def _home_of(self, event: "DestinationEvent") -> int:
+        with self._lock:
+            return self._home.get(event.id, self._target(event))
+
+    def _remember(self, event_id: str, calendar: int):
+        # Callers hold the lock
+        self._home[event_id] = calendar
+        self._home.move_to_end(event_id)
+        while len(self._home) > self.max_cached_homes:
+            self._home.popitem(last=False)
+
+    def misrouted(self, event: "DestinationEvent", category: "RecordCategory | None") -> bool:
+        """Whether the calendar holding the event differs from the one category routes to.
+
+        Lets the diff and planner move events whose category changed, even if nothing else did.
+        """
+        return self._home_of(event) != self._route(category)
+
+    def _fetch(
+        self, calendar: int, start: "datetime.datetime", end: "datetime.datetime"
+    ) -> Sequence["DestinationEvent"]:
+        self._limiters[calendar].wait()
+        return self._calendars[calendar].get_events(start=start, end=end)
+
+    def get_events(
+        self, start: "datetime.datetime", end: "datetime.datetime"
+    ) -> Sequence["DestinationEvent"]:
+        with ThreadPoolExecutor(max_workers=len(self._calendars)) as pool:
+            pages = list(
+                pool.map(lambda i: self._fetch(i, start, end), range(len(self._calendars)))
+            )
+
+        events: list[DestinationEvent] = []
+        for calendar, page in enumerate(pages):
+            with self._lock:
+                for e in page:
+                    self._remember(e.id, calendar)
+            events.extend(page)
+        return events
+
+    def add_event(self, event: "ChronofileEvent") -> "DestinationEvent":
+        calendar = self._target(event)
+        self._limiters[calendar].wait()
+        added = self._calendars[calendar].add_event(event)
+        with self._lock:
+            self._remember(added.id, calendar)
+        return added
+
+    def update_event(self, event: "DestinationEvent") -> "DestinationEvent":
+        home, target = self._home_of(event), self._target(event)
+        if home == target:
+            self._limiters[home].wait()
+            return self._calendars[home].update_event(event)
+
+        # The event's category now routes it elsewhere, so move it. Planned changesets split
+        # moves into an insert and a delete, so this only runs for unplanned updates.
+        log.debug(f"Moving {event} to calendar {target}")
+        self.delete_event(event)
+        return self.add_event(event)
+
+    def delete_event(self, event: "DestinationEvent") -> None:
+        home = self._home_of(event)
+        self._limiters[home].wait()
+        self._calendars[home].delete_event(event)
+        with self._lock:
+            self._home.pop(event.id, None)
+
+    def partition(
+        self, changes: Sequence[diff.EventChange]
+    ) -> tuple[Sequence[Sequence[int]], Sequence[int]]:
+        """Indices of the changes for each calendar, which can be applied concurrently, and of
+        the moves between calendars, which touch two calendars so are applied afterwards.
+        """
+        per_calendar: list[list[int]] = [[] for _ in self._calendars]
+        moves: list[int] = []
+        for i, change in enumerate(changes):
+            match change:
+                case diff.NewEvent():
+                    per_calendar[self._target(change.event)].append(i)
+                case diff.UpdateEvent():
+                    home = self._home_of(change.event)
+                    if home == self._target(change.event):
+                        per_calendar[home].append(i)
+                    else:
+                        moves.append(i)
+                case diff.DeleteEvent():
+                    per_calendar[self._home_of(change.event)].append(i)
+        return [p for p in per_calendar if len(p) > 0], moves
@@ -0,0 +1,149 @@
+import datetime
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+import pytest
+
+from chronofile import diff, planner
+from chronofile.commands.apply import apply_changes, resume
+from chronofile.commands.test_apply import Crash, InMemoryDestination
+from chronofile.config import RecordCategory
+from chronofile.destinations.routing import RateLimiter, RoutingDestination
+from chronofile.event import ChronofileEvent, DestinationEvent
+from chronofile.journal import Journal
+
+if TYPE_CHECKING:
+    import pathlib
+
+START = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _event(title: str, minute: int, category: RecordCategory | None = None) -> ChronofileEvent:
+    return ChronofileEvent(
+        title=title,
+        start=START + datetime.timedelta(minutes=minute),
+        end=START + datetime.timedelta(minutes=minute + 1),
+        category=category,
+    )
+
+
+def _stored(event: ChronofileEvent, id: str) -> DestinationEvent:  # noqa: A002
+    return DestinationEvent(**event.model_dump(exclude={"category"}), id=id)
+
+
+def test_changes_are_routed_to_the_calendar_of_their_category():
+    default = InMemoryDestination(events={"moved": _stored(_event("code", 0), "moved")})
+    programming = InMemoryDestination(events={"stale": _stored(_event("stale", 1), "stale")})
+    routing = RoutingDestination(
+        default=default,  # type: ignore
+        routes={RecordCategory.PROGRAMMING: programming},  # type: ignore
+        requests_per_second=1000,
+    )
+    routing.get_events(start=START, end=START + datetime.timedelta(days=1))
+
+    apply_changes(
+        [
+            diff.NewEvent(event=_event("editor", 2, RecordCategory.PROGRAMMING)),
+            diff.NewEvent(event=_event("chat", 3)),
+            # Now categorised, so it moves out of the default calendar
+            diff.UpdateEvent(
+                event=_stored(_event("code", 0), "moved").model_copy(
+                    update={"category": RecordCategory.PROGRAMMING}
+                )
+            ),
+            diff.DeleteEvent(event=_stored(_event("stale", 1), "stale")),
+        ],
+        routing,  # type: ignore
+    )
+
+    assert sorted(e.title for e in default.events.values()) == ["chat"]
+    assert sorted(e.title for e in programming.events.values()) == ["code", "editor"]
+
+
+def test_category_changes_move_events_in_two_journalled_steps(tmp_path: "pathlib.Path"):
+    default = InMemoryDestination(events={"code": _stored(_event("code", 0), "code")})
+    # Dies right after the insert reaches the new calendar
+    programming = InMemoryDestination(crash_after_calls=1)
+    routing = RoutingDestination(
+        default=default,  # type: ignore
+        routes={RecordCategory.PROGRAMMING: programming},  # type: ignore
+        requests_per_second=1000,
+    )
+    stored = routing.get_events(start=START, end=START + datetime.timedelta(days=1))
+
+    # Only the category changed
+    changes = diff.diff(
+        [_event("code", 0, RecordCategory.PROGRAMMING)], stored, misrouted=routing.misrouted
+    )
+    plan = planner.optimize(changes, stored, misrouted=routing.misrouted)
+    assert [type(c) for c in plan.changes] == [diff.NewEvent, diff.DeleteEvent]
+
+    journal = Journal(path=str(tmp_path / "journal.jsonl"))
+    with pytest.raises(Crash):
+        apply_changes(plan.changes, routing, journal)  # type: ignore
+    resume(routing, journal)  # type: ignore
+
+    assert list(default.events) == []
+    assert [e.title for e in programming.events.values()] == ["code"]
+
+
+@dataclass
+class BlockingDestination(InMemoryDestination):
+    barrier: threading.Barrier = field(default_factory=lambda: threading.Barrier(2, timeout=5))
+
+    def add_event(self, event: ChronofileEvent) -> DestinationEvent:
+        # Only passes once another calendar is inserting at the same time
+        self.barrier.wait()
+        return super().add_event(event)
+
+
+def test_calendars_are_applied_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+    default = BlockingDestination(barrier=barrier)
+    programming = BlockingDestination(barrier=barrier)
+    routing = RoutingDestination(
+        default=default,  # type: ignore
+        routes={RecordCategory.PROGRAMMING: programming},  # type: ignore
+        requests_per_second=1000,
+    )
+
+    apply_changes(
+        [
+            diff.NewEvent(event=_event("chat", 0)),
+            diff.NewEvent(event=_event("editor", 0, RecordCategory.PROGRAMMING)),
+        ],
+        routing,  # type: ignore
+    )
+
+    assert len(default.events) == len(programming.events) == 1
+
+
+def test_remembered_calendars_are_bounded():
+    stored = [_stored(_event("editor", i), f"{i}") for i in range(3)]
+    routing = RoutingDestination(
+        default=InMemoryDestination(),  # type: ignore
+        routes={
+            RecordCategory.PROGRAMMING: InMemoryDestination(events={e.id: e for e in stored})  # type: ignore
+        },
+        requests_per_second=1000,
+        max_cached_homes=2,
+    )
+
+    routing.get_events(start=START, end=START + datetime.timedelta(days=1))
+    routing.add_event(_event("chat", 3))
+
+    assert len(routing._home) == 2
+    # The earliest fetched events were forgotten, so are assumed to be in the default calendar
+    assert [routing.misrouted(e, RecordCategory.PROGRAMMING) for e in stored] == [True, True, False]
+
+
+def test_rate_limiter_spaces_out_calls():
+    limiter = RateLimiter(per_second=100)
+
+    started = time.monotonic()
+    for _ in range(6):
+        limiter.wait()
+
+    assert time.monotonic() - started >= 0.05
@@ -1,13 +1,15 @@
-import copy
+import bisect
+import datetime
 import logging
 from dataclasses import dataclass
-from typing import TYPE_CHECKING, Sequence
+from typing import TYPE_CHECKING, Callable, Iterable, Mapping, Sequence
 
 import devtools
 
-from chronofile.event import event_identity
+from chronofile.event import ancestry_identity, deterministic_id, event_identity
 
 if TYPE_CHECKING:
+    from chronofile.config import RecordCategory
     from chronofile.event import ChronofileEvent, DestinationEvent
 
 log = logging.getLogger(__name__)
@@ -30,57 +32,166 @@ class DeleteEvent:
 
 EventChange = NewEvent | UpdateEvent | DeleteEvent
 
+Misrouted = Callable[["DestinationEvent", "RecordCategory | None"], bool]
+# Whether a stored event belongs in another calendar once it has the given category
 
-def _deduper(
-    parsed_events: Sequence["ChronofileEvent"], destination_events: Sequence["ChronofileEvent"]
-) -> Sequence["ChronofileEvent"]:
-    origin_hashes = {event_identity(e) for e in destination_events}
-    return [e for e in parsed_events if event_identity(e) not in origin_hashes]
+
+@dataclass(frozen=True)
+class _TitleIndex:
+    """Destination events sharing a title, sorted by start, for O(log n) overlap lookups."""
+
+    events: Sequence["DestinationEvent"]
+    starts: Sequence["datetime.datetime"]
+    max_duration: "datetime.timedelta"
+
+    @staticmethod
+    def build(events: Sequence["DestinationEvent"]) -> "_TitleIndex":
+        sorted_events = sorted(events, key=lambda e: e.start)
+        return _TitleIndex(
+            events=sorted_events,
+            starts=[e.start for e in sorted_events],
+            max_duration=max(datetime.timedelta(0), *(e.duration for e in sorted_events)),
+        )
+
+    def claimable(
+        self, event: "ChronofileEvent", start_tolerance: datetime.timedelta
+    ) -> Sequence["DestinationEvent"]:
+        """Events which overlap the event, or start within start_tolerance of it. Events which
+        only touch it, ending as it starts or starting as it ends, are left alone.
+        """
+        # No event can start earlier than this and still overlap
+        lo = bisect.bisect_left(self.starts, event.start - max(self.max_duration, start_tolerance))
+        hi = bisect.bisect_right(self.starts, max(event.end, event.start + start_tolerance))
+        return [
+            e
+            for e in self.events[lo:hi]
+            if abs(e.start - event.start) <= start_tolerance
+            or (e.end > event.start and e.start < event.end)
+        ]
 
 
-def _ancestry_identity(event: "ChronofileEvent | ChronofileEvent") -> str:
-    string_format = "%d/%m/%Y, %H:%M:%S"
-    return f"{event.title} {event.start.strftime(string_format)}"
+def _near(
+    a: "DestinationEvent | ChronofileEvent",
+    b: "DestinationEvent | ChronofileEvent",
+    start_tolerance: datetime.timedelta,
+    end_tolerance: datetime.timedelta,
+) -> bool:
+    """Whether the events only differ by drift in their start and end."""
+    return (
+        a.title == b.title
+        and abs(a.start - b.start) <= start_tolerance
+        and abs(a.end - b.end) <= end_tolerance
+    )
+
+
+def _choose_keeper(
+    new_event: "ChronofileEvent",
+    candidates: Sequence["DestinationEvent"],
+    by_id: Mapping[str, "DestinationEvent"],
+    start_tolerance: datetime.timedelta,
+    end_tolerance: datetime.timedelta,
+) -> "DestinationEvent":
+    """Prefer the event inserted for this one, then an exact match, then the nearest match within
+    the tolerances, then the last event with the same start, then the earliest event.
+    """
+    own = by_id.get(deterministic_id(new_event))
+    if own is not None and any(e.id == own.id for e in candidates):
+        return own
+
+    identity = event_identity(new_event)
+    exact = next((e for e in candidates if event_identity(e) == identity), None)
+    if exact is not None:
+        return exact
+
+    near = [e for e in candidates if _near(e, new_event, start_tolerance, end_tolerance)]
+    if len(near) != 0:
+        return min(near, key=lambda e: abs(e.start - new_event.start) + abs(e.end - new_event.end))
+
+    ancestry = ancestry_identity(new_event)
+    ancestors = [e for e in candidates if ancestry_identity(e) == ancestry]
+    if len(ancestors) != 0:
+        return ancestors[-1]
+
+    return candidates[0]
 
 
 def diff(
-    parsed_events: Sequence["ChronofileEvent"], destination_events: Sequence["DestinationEvent"]
+    parsed_events: Iterable["ChronofileEvent"],
+    destination_events: Sequence["DestinationEvent"],
+    start_tolerance: datetime.timedelta = datetime.timedelta(0),
+    end_tolerance: datetime.timedelta = datetime.timedelta(0),
+    misrouted: Misrouted | None = None,
 ) -> Sequence[EventChange]:
-    """Identify which changes are needed on the mirror for it to match truth."""
+    """Identify which changes are needed on the mirror for it to match truth.
+
+    Each parsed event claims every destination event with the same title which overlaps it.
+    One of them is updated to span the parsed event and everything it claimed, and the rest are
+    deleted, so fragments left behind by earlier, differently merged cycles are cleaned up.
+    Stored events only ever grow, since their start may lie before the sync window, where the
+    parsed events no longer reach. Parsed events are only iterated once, so they can be streamed.
+
+    Sources shift starts and ends by a second or two between cycles. A destination event whose
+    start and end are within the tolerances of a parsed event is left as it is, unless
+    misrouted says its category now belongs in another calendar.
+    """
     if len(destination_events) == 0:
         return [NewEvent(event=e) for e in parsed_events]
 
-    timezones = {e.timezone for e in [*parsed_events, *destination_events]}
+    timezones = {e.timezone for e in destination_events}
     if len(timezones) != 1:
         raise ValueError(f"All events must be in the same timezone. Found {timezones}")
+    (timezone,) = timezones
 
-    deduped_events = _deduper(destination_events=destination_events, parsed_events=parsed_events)
+    title_groups: dict[str, list[DestinationEvent]] = {}
+    for e in destination_events:
+        title_groups.setdefault(e.title, []).append(e)
+    indices = {title: _TitleIndex.build(events) for title, events in title_groups.items()}
+    by_id = {e.id: e for e in destination_events}
 
+    claimed: set[str] = set()
     changeset: list[EventChange] = []
-    for new_event in deduped_events:
-        ancestor = [
-            event
-            for event in destination_events
-            if _ancestry_identity(event) == _ancestry_identity(new_event)
-        ]
-
-        if len(ancestor) > 1:
-            log.warning(
-                f"Found multiple events with the same title and start time: {ancestor}. Updating both events."
+    for new_event in parsed_events:
+        if new_event.timezone != timezone:
+            raise ValueError(
+                f"All events must be in the same timezone. Found {timezone} and {new_event.timezone}"
             )
-
-        sorted_ancestors = sorted(ancestor, key=lambda e: e.start)
-
-        event_is_update = len(ancestor) != 0
-        if event_is_update:
-            existing_event = sorted_ancestors[-1]
-            updated_existing_event = copy.deepcopy(existing_event)
-            updated_existing_event.end = new_event.end
-            changeset.append(UpdateEvent(event=updated_existing_event))
-        else:
+        index = indices.get(new_event.title)
+        candidates = (
+            [e for e in index.claimable(new_event, start_tolerance) if e.id not in claimed]
+            if index is not None
+            else []
+        )
+
+        if len(candidates) == 0:
             changeset.append(NewEvent(event=new_event))
+            continue
+
+        keeper = _choose_keeper(new_event, candidates, by_id, start_tolerance, end_tolerance)
+        claimed.update(e.id for e in candidates)
+
+        start = min(new_event.start, *(e.start for e in candidates))
+        end = max(new_event.end, *(e.end for e in candidates))
+        changed = (
+            abs(keeper.start - start) > start_tolerance or abs(keeper.end - end) > end_tolerance
+        )
+        if changed or (misrouted is not None and misrouted(keeper, new_event.category)):
+            changeset.append(
+                UpdateEvent(
+                    event=keeper.model_copy(
+                        update={"start": start, "end": end, "category": new_event.category}
+                    )
+                )
+            )
+
+        fragments = [e for e in candidates if e is not keeper]
+        if len(fragments) != 0:
+            log.debug(f"{new_event} claimed {len(fragments)} stale fragments, deleting them")
+        changeset.extend(DeleteEvent(event=e) for e in fragments)
 
-    sorted_changeset = sorted(changeset, key=lambda c: c.event.start)
-    logging.info(f"Changeset: {devtools.debug.format(sorted_changeset)}")
+    log.info(f"Changeset has {len(changeset)} changes")
+    if log.isEnabledFor(logging.DEBUG):
+        # Formatting is as costly as the diff itself, so skip it unless it is shown
+        sorted_changeset = sorted(changeset, key=lambda c: c.event.start)
+        log.debug(f"Changeset: {devtools.debug.format(sorted_changeset)}")
 
     return changeset
@@ -1,8 +1,10 @@
+import base64
 import datetime
+import hashlib
 import re
 from abc import ABC
 from dataclasses import dataclass
-from typing import TYPE_CHECKING, Mapping, Optional, Sequence
+from typing import TYPE_CHECKING, Optional
 
 import pydantic
 import pytz
@@ -10,7 +12,7 @@ import pytz
 from chronofile.config import RecordCategory
 
 if TYPE_CHECKING:
-    from chronofile.config import RecordCategory, RecordMetadata
+    from chronofile.config import CompiledMatcher, CompiledRules, RecordCategory
 
 
 def to_utc(dt: "datetime.datetime") -> "datetime.datetime":
@@ -23,6 +25,43 @@ def event_identity(event: "DestinationEvent | ChronofileEvent") -> str:
     return f"{event.title} {event.start.strftime(string_format)} to {event.end.strftime(string_format)}"
 
 
+def ancestry_identity(event: "DestinationEvent | ChronofileEvent") -> str:
+    """Like event_identity, but stable while the event grows, since merging only moves the end."""
+    string_format = "%d/%m/%Y, %H:%M:%S"
+    return f"{event.title} {event.start.strftime(string_format)}"
+
+
+_ID_PREFIX = "cf"
+
+
+def deterministic_id(event: "DestinationEvent | ChronofileEvent") -> str:
+    """A Calendar-valid event id (base32hex), derived from the event's ancestry identity.
+
+    Inserting the same event twice reuses the id, so the second insert conflicts instead of
+    creating a duplicate.
+    """
+    digest = hashlib.sha256(ancestry_identity(event).encode()).digest()
+    return _ID_PREFIX + base64.b32hexencode(digest).decode().rstrip("=").lower()
+
+
+def has_deterministic_id(event: "DestinationEvent") -> bool:
+    """Whether the event was inserted with a deterministic id, rather than one assigned by Google."""
+    return event.id.startswith(_ID_PREFIX) and len(event.id) == len(_ID_PREFIX) + 52
+
+
+@dataclass(frozen=True, slots=True)
+class Provenance:
+    """Reference to the range of source events an event was built from, by index in the pipeline's input."""
+
+    first: int
+    last: int
+
+    def covering(self, other: "Provenance | None") -> "Provenance":
+        if other is None:
+            return self
+        return Provenance(first=min(self.first, other.first), last=max(self.last, other.last))
+
+
 class ChronofileEvent(pydantic.BaseModel):
     """Represents an event across the stack, when the information has been parsed for presentation."""
 
@@ -30,7 +69,7 @@ class ChronofileEvent(pydantic.BaseModel):
     start: "datetime.datetime"
     end: "datetime.datetime"
     category: Optional["RecordCategory"] = None
-    source_event: "SourceEvent | None"
+    provenance: Provenance | None = None
 
     @pydantic.field_validator("title")
     def validate_title(cls, value: str) -> str:
@@ -122,21 +161,24 @@ class WindowTitleEvent(BaseSourceEvent):
         return super().repr_str(f"Window, {self.app}: {self.window_title}")
 
 
-def _parse_event(event: "SourceEvent") -> ChronofileEvent:
+def _parse_event(event: "SourceEvent", provenance: Provenance | None = None) -> ChronofileEvent:
     match event:
         case URLEvent():
-            return _parse_url_event(event)
+            return _parse_url_event(event, provenance)
         case WindowTitleEvent():
             title = event.window_title if len(event.window_title) != 0 else event.app
             return ChronofileEvent(
-                title=title, start=event.start, end=event.start + event.duration, source_event=event
+                title=title,
+                start=event.start,
+                end=event.start + event.duration,
+                provenance=provenance,
             )
         case BareEvent():
             return ChronofileEvent(
                 title=event.title,
                 start=event.start,
                 end=event.start + event.duration,
-                source_event=event,
+                provenance=provenance,
             )
         case BaseSourceEvent():
             raise ValueError(f"Event type {type(event)} not supported")
@@ -153,7 +195,7 @@ class URLParseRule:
     format_result: str
 
 
-def _parse_url_event(event: "URLEvent") -> ChronofileEvent:
+def _parse_url_event(event: "URLEvent", provenance: Provenance | None) -> ChronofileEvent:
     parsers = [
         URLParseRule(
             apply_to=".*github.com.*",
@@ -175,7 +217,10 @@ def _parse_url_event(event: "URLEvent") -> ChronofileEvent:
                 continue
 
             return ChronofileEvent(
-                title=title, start=event.start, end=event.start + event.duration, source_event=event
+                title=title,
+                start=event.start,
+                end=event.start + event.duration,
+                provenance=provenance,
             )
 
     title = event.url_title if len(event.url_title) != 0 else event.url
@@ -184,45 +229,40 @@ def _parse_url_event(event: "URLEvent") -> ChronofileEvent:
         title = "No title"
 
     return ChronofileEvent(
-        title=title, start=event.start, end=event.start + event.duration, source_event=event
+        title=title, start=event.start, end=event.start + event.duration, provenance=provenance
     )
 
 
-def _event_matches_metadata(generic_event: ChronofileEvent, meta: "RecordMetadata") -> bool:
-    return any(title.lower() in generic_event.title.lower() for title in meta.title_matcher)
+def _event_matches(generic_event: ChronofileEvent, matcher: "CompiledMatcher") -> bool:
+    title = generic_event.title.lower()
+    return any(pattern in title for pattern in matcher.patterns)
 
 
-def _add_category(generic_event: ChronofileEvent, meta: "RecordMetadata"):
-    generic_event.category = meta.category
+def _add_category(generic_event: ChronofileEvent, matcher: "CompiledMatcher"):
+    generic_event.category = matcher.category
 
 
-def _prettified_title(generic_event: ChronofileEvent, meta: "RecordMetadata"):
-    if meta.override_title is not None:
-        generic_event.title = meta.override_title
+def _prettified_title(generic_event: ChronofileEvent, matcher: "CompiledMatcher"):
+    if matcher.override_title is not None:
+        generic_event.title = matcher.override_title
 
 
-def _add_emoji(
-    category2emoji: Mapping["RecordCategory", str],
-    generic_event: ChronofileEvent,
-    meta: "RecordMetadata",
-):
-    if category2emoji[meta.category] not in generic_event.title:
-        generic_event.title = f"{category2emoji[meta.category]} {generic_event.title}"
+def _add_emoji(generic_event: ChronofileEvent, matcher: "CompiledMatcher"):
+    if matcher.emoji is not None and matcher.emoji not in generic_event.title:
+        generic_event.title = f"{matcher.emoji} {generic_event.title}"
 
 
 def hydrate_event(
-    event: "SourceEvent",
-    metadata: Sequence["RecordMetadata"],
-    category2emoji: Mapping["RecordCategory", str],
+    event: "SourceEvent", rules: "CompiledRules", provenance: Provenance | None = None
 ) -> ChronofileEvent:
-    generic_event = _parse_event(event)
+    generic_event = _parse_event(event, provenance)
 
     # Apply category and emoji
-    for meta in metadata:
-        if _event_matches_metadata(generic_event, meta):
-            _add_category(generic_event, meta)
-            _prettified_title(generic_event, meta)
-            _add_emoji(category2emoji, generic_event, meta)
+    for matcher in rules.matchers:
+        if _event_matches(generic_event, matcher):
+            _add_category(generic_event, matcher)
+            _prettified_title(generic_event, matcher)
+            _add_emoji(generic_event, matcher)
 
     return generic_event
 
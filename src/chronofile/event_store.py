@@ -0,0 +1,175 @@
+import datetime
+import logging
+import pathlib
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from typing import Sequence
+
+from chronofile.aggregate import CategoryTotal
+from chronofile.config import RecordCategory
+from chronofile.event import ChronofileEvent
+
+log = logging.getLogger(__name__)
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    title TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    "end" INTEGER NOT NULL,
+    category TEXT,
+    UNIQUE (title, start)
+);
+CREATE INDEX IF NOT EXISTS events_start ON events (start);
+CREATE INDEX IF NOT EXISTS events_category_start ON events (category, start);
+CREATE INDEX IF NOT EXISTS events_title ON events (title);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+
+def _to_micros(value: datetime.datetime) -> int:
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def _from_micros(value: int) -> datetime.datetime:
+    return _EPOCH + value * _MICROSECOND
+
+
+@dataclass
+class EventStore:
+    """Local history of merged timelines in SQLite, for queries without the destination.
+
+    Usable as a pipeline output. Each cycle's timeline replaces what the store held from the
+    timeline's first start onwards, in one transaction.
+
+    Times are stored as microseconds since the epoch, so ranges are integer comparisons on the
+    start index. The longest stored event bounds how far before a range an overlapping event
+    can start.
+    """
+
+    path: str
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False)
+
+    def __post_init__(self):
+        if self.path != ":memory:":
+            pathlib.Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        # Shared by watch cycles and queries, which may run on different threads
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.executescript(_SCHEMA)
+
+    def _max_duration(self) -> int:
+        row = self._connection.execute(
+            "SELECT value FROM meta WHERE key = 'max_duration'"
+        ).fetchone()
+        return row[0] if row is not None else 0
+
+    def __call__(self, timeline: Sequence["ChronofileEvent"]):
+        if len(timeline) == 0:
+            return
+        rows = [
+            (e.title, _to_micros(e.start), _to_micros(e.end), e.category and e.category.value)
+            for e in timeline
+        ]
+        first = min(start for _, start, _, _ in rows)
+        last = max(end for _, _, end, _ in rows)
+
+        with self._lock, self._connection:
+            # The timeline is the truth from its first start, so events stored from an earlier
+            # merge of the same period are replaced, and events running into it are cut off
+            self._connection.execute(
+                "DELETE FROM events WHERE start >= ? AND start < ?", (first, last)
+            )
+            self._connection.execute(
+                'UPDATE events SET "end" = ? WHERE start < ? AND "end" > ?', (first, first, first)
+            )
+            self._connection.executemany(
+                'INSERT INTO events (title, start, "end", category) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (title, start) DO UPDATE SET "end" = excluded."end", '
+                "category = excluded.category",
+                rows,
+            )
+            self._connection.execute(
+                "INSERT INTO meta (key, value) VALUES ('max_duration', ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = max(value, excluded.value)",
+                (max(end - start for _, start, end, _ in rows),),
+            )
+        log.info(f"Stored {len(rows)} events in {self.path}")
+
+    def _where(
+        self,
+        start: datetime.datetime,
+        end: datetime.datetime,
+        category: RecordCategory | None,
+        title: str | None,
+    ) -> tuple[str, list[object]]:
+        lo, hi = _to_micros(start), _to_micros(end)
+        # Bounding start on both sides keeps the lookup on the start index
+        clauses = ['start >= ? AND start < ? AND "end" > ?']
+        params: list[object] = [lo - self._max_duration(), hi, lo]
+        if category is not None:
+            clauses.append("category = ?")
+            params.append(category.value)
+        if title is not None:
+            clauses.append("title = ?")
+            params.append(title)
+        return " AND ".join(clauses), params
+
+    def query(
+        self,
+        start: datetime.datetime,
+        end: datetime.datetime,
+        category: RecordCategory | None = None,
+        title: str | None = None,
+    ) -> Sequence[ChronofileEvent]:
+        """Events overlapping start to end, optionally with the given category or title."""
+        with self._lock:
+            where, params = self._where(start, end, category, title)
+            rows = self._connection.execute(
+                f'SELECT title, start, "end", category FROM events WHERE {where} ORDER BY start',
+                params,
+            ).fetchall()
+        return [
+            ChronofileEvent(
+                title=t,
+                start=_from_micros(s),
+                end=_from_micros(e),
+                category=RecordCategory(c) if c is not None else None,
+            )
+            for t, s, e, c in rows
+        ]
+
+    def totals(
+        self,
+        start: datetime.datetime,
+        end: datetime.datetime,
+        category: RecordCategory | None = None,
+        title: str | None = None,
+    ) -> Sequence[CategoryTotal]:
+        """Time per category from start to end, clipping events to the range."""
+        with self._lock:
+            where, params = self._where(start, end, category, title)
+            rows = self._connection.execute(
+                f'SELECT category, SUM(MIN("end", ?) - MAX(start, ?)) FROM events '
+                f"WHERE {where} GROUP BY category ORDER BY category",
+                [_to_micros(end), _to_micros(start), *params],
+            ).fetchall()
+        return [
+            CategoryTotal(
+                bucket_start=start,
+                category=RecordCategory(c) if c is not None else None,
+                duration=total * _MICROSECOND,
+            )
+            for c, total in rows
+        ]
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self) -> "EventStore":
+        return self
+
+    def __exit__(self, *_: object):
+        self.close()
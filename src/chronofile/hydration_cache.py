@@ -0,0 +1,111 @@
+import json
+import logging
+import pathlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from chronofile.config import RecordCategory
+from chronofile.event import BareEvent, ChronofileEvent, URLEvent, WindowTitleEvent, hydrate_event
+
+if TYPE_CHECKING:
+    from chronofile.config import CompiledRules
+    from chronofile.event import Provenance, SourceEvent
+
+log = logging.getLogger(__name__)
+
+CacheKey = tuple[str, ...]
+CacheValue = tuple[str, str | None]
+# Hydrated title and category
+
+
+def _cache_key(event: "SourceEvent", rules: "CompiledRules") -> CacheKey | None:
+    """The fields that determine the hydrated title and category, or None if not cacheable."""
+    match event:
+        case URLEvent():
+            return (rules.content_hash, "url", event.url, event.url_title)
+        case WindowTitleEvent():
+            return (rules.content_hash, "window", event.app, event.window_title)
+        case BareEvent():
+            return (rules.content_hash, "bare", event.title)
+        case _:
+            return None
+
+
+@dataclass
+class HydrationCache:
+    """Bounded LRU of hydrated titles and categories, optionally persisted to disk.
+
+    Keys include the compiled rules' content hash, so entries stay valid across watch cycles
+    and restarts until the config changes.
+    """
+
+    maxsize: int = 4096
+    path: str | None = None
+    hits: int = field(default=0, init=False)
+    misses: int = field(default=0, init=False)
+    _entries: "OrderedDict[CacheKey, CacheValue]" = field(default_factory=OrderedDict, init=False)
+
+    def __post_init__(self):
+        if self.maxsize < 0:
+            raise ValueError(f"Cache size must be non-negative, got {self.maxsize}")
+        if self.path is not None and pathlib.Path(self.path).exists():
+            self._load(self.path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _put(self, key: CacheKey, value: CacheValue):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def hydrate(
+        self, event: "SourceEvent", rules: "CompiledRules", provenance: "Provenance | None" = None
+    ) -> ChronofileEvent:
+        key = _cache_key(event, rules)
+        cached = self._entries.get(key) if key is not None else None
+
+        if cached is None:
+            self.misses += 1
+            hydrated = hydrate_event(event=event, rules=rules, provenance=provenance)
+            if key is not None:
+                category = hydrated.category.value if hydrated.category is not None else None
+                self._put(key, (hydrated.title, category))
+            return hydrated
+
+        self.hits += 1
+        self._entries.move_to_end(key)  # type: ignore
+        title, category = cached
+        # The cached fields were validated when first hydrated, so skip validation
+        return ChronofileEvent.model_construct(
+            title=title,
+            start=event.start,
+            end=event.start + event.duration,
+            category=RecordCategory(category) if category is not None else None,
+            provenance=provenance,
+        )
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        hit_rate = self.hits / total if total else 0.0
+        return f"{len(self)}/{self.maxsize} entries, {self.hits} hits, {self.misses} misses ({hit_rate:.0%} hit rate)"
+
+    def _load(self, path: str):
+        try:
+            entries = json.loads(pathlib.Path(path).read_text())
+        except (OSError, ValueError) as e:
+            log.warning(f"Could not load hydration cache from {path}, starting empty: {e}")
+            return
+        for key, (title, category) in entries[-self.maxsize :]:
+            self._put(tuple(key), (title, category))
+
+    def save(self):
+        if self.path is None:
+            return
+        path = pathlib.Path(self.path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps([[list(k), list(v)] for k, v in self._entries.items()]))
+        tmp.replace(path)
@@ -0,0 +1,115 @@
+import json
+import logging
+import os
+import pathlib
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Literal, Mapping, Sequence
+
+from chronofile import diff
+from chronofile.event import ChronofileEvent, DestinationEvent
+
+log = logging.getLogger(__name__)
+
+OpStatus = Literal["pending", "started", "done", "deferred", "failed"]
+# Deferred operations ran out of time, and failed ones were given up on after repeated errors.
+# Both count as finished, since the cycle after them is never skipped and plans them again.
+
+
+@dataclass(frozen=True)
+class JournalEntry:
+    op: int
+    change: diff.EventChange
+    status: OpStatus
+    attempts: int = 0
+    # Times the operation was started
+
+
+def _change_to_json(change: diff.EventChange) -> Mapping[str, Any]:
+    # Provenance only describes how the event was derived, so it is not needed to apply it
+    event = change.event.model_dump(mode="json", exclude={"provenance"})
+    match change:
+        case diff.NewEvent():
+            return {"kind": "new", "event": event}
+        case diff.UpdateEvent():
+            return {"kind": "update", "event": event}
+        case diff.DeleteEvent():
+            return {"kind": "delete", "event": event}
+
+
+def _change_from_json(values: Mapping[str, Any]) -> diff.EventChange:
+    match values["kind"]:
+        case "new":
+            return diff.NewEvent(event=ChronofileEvent.model_validate(values["event"]))
+        case "update":
+            return diff.UpdateEvent(event=DestinationEvent.model_validate(values["event"]))
+        case "delete":
+            return diff.DeleteEvent(event=DestinationEvent.model_validate(values["event"]))
+        case kind:
+            raise ValueError(f"Unknown change kind {kind}")
+
+
+@dataclass(frozen=True)
+class Journal:
+    """Write-ahead log of a planned changeset, with the status of each operation.
+
+    Every line is flushed to disk before the operation it describes is sent, so after a crash
+    the journal tells which operations are done, which were in flight, and which never started.
+    """
+
+    path: str
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, compare=False)
+    # Calendars may be applied from several threads
+
+    def _append(self, records: Sequence[Mapping[str, Any]]):
+        with self._lock, pathlib.Path(self.path).open("a") as f:
+            f.writelines(json.dumps(r) + "\n" for r in records)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def begin(self, changes: Sequence[diff.EventChange]) -> Sequence[JournalEntry]:
+        if len(self.load()) > 0:
+            raise RuntimeError(f"Journal at {self.path} has unapplied changes, resume it first")
+
+        pathlib.Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._append(
+            [{"op": i, "status": "pending", **_change_to_json(c)} for i, c in enumerate(changes)]
+        )
+        return [JournalEntry(op=i, change=c, status="pending") for i, c in enumerate(changes)]
+
+    def mark(self, op: int, status: OpStatus):
+        self._append([{"op": op, "status": status}])
+
+    def load(self) -> Sequence[JournalEntry]:
+        """The journalled operations which are not done yet, in order."""
+        path = pathlib.Path(self.path)
+        if not path.exists():
+            return []
+
+        changes: dict[int, diff.EventChange] = {}
+        statuses: dict[int, OpStatus] = {}
+        attempts: dict[int, int] = {}
+        for line in path.read_text().splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A crash mid-write leaves at most one torn line, at the end
+                log.warning(f"Ignoring torn journal line: {line}")
+                continue
+            if "kind" in record:
+                changes[record["op"]] = _change_from_json(record)
+            statuses[record["op"]] = record["status"]
+            if record["status"] == "started":
+                attempts[record["op"]] = attempts.get(record["op"], 0) + 1
+
+        return [
+            JournalEntry(op=op, change=change, status=statuses[op], attempts=attempts.get(op, 0))
+            for op, change in sorted(changes.items())
+            if statuses[op] not in ("done", "deferred", "failed")
+        ]
+
+    def compact(self):
+        """Drop the journal once every operation in it is finished."""
+        if len(self.load()) > 0:
+            raise RuntimeError(f"Journal at {self.path} has unapplied changes")
+        pathlib.Path(self.path).unlink(missing_ok=True)
@@ -1,43 +1,268 @@
+import bisect
+import contextlib
+import cProfile
+import datetime
+import heapq
 import importlib.metadata
 import logging
+import pathlib
+import threading
 import time
-from typing import TYPE_CHECKING, Annotated, Optional, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import TYPE_CHECKING, Annotated, Callable, Optional, Sequence
 
 import devtools
+import requests
 import rich.pretty
 import typer
-from iterpy.arr import Arr
 
-import chronofile.diff as diff
-from chronofile.commands.sync_logic import log, pipeline, try_activitywatch
-from chronofile.config import Config
-from chronofile.destinations import gcal
+from chronofile import compaction
+from chronofile.aggregate import CategoryReport, TimelineColumns, aggregate, format_report
+from chronofile.benchmark import (
+    benchmark_rules,
+    destination_throughput,
+    measure_cycle,
+    soak,
+    synthetic_records,
+)
+from chronofile.commands.apply import Deadline, apply_changes, resume
+from chronofile.commands.hydration import ChunkedExecutor
+from chronofile.commands.sync_logic import build_timeline, log, pipeline, try_activitywatch
+from chronofile.config import CompiledRules, Config, RecordCategory, ReloadingConfig
+from chronofile.destinations import caldav, gcal
 from chronofile.destinations.gcal.auth import print_refresh_token
+from chronofile.destinations.routing import RoutingDestination
+from chronofile.event_store import EventStore
+from chronofile.hydration_cache import HydrationCache
+from chronofile.journal import Journal
+from chronofile.recording import Bundle, replay_bundle
+from chronofile.scheduler import AdaptiveScheduler, QuotaTracker, write_metrics
+from chronofile.sources.activitywatch import BucketWatcher
+from chronofile.sources.source import PollingEventSource
+from chronofile.tenants import Tenant, load_tenants, run_tenants
 
 if TYPE_CHECKING:
+    from chronofile.destinations.gcal.client import DestinationClient
+    from chronofile.event import SourceEvent
     from chronofile.sources.source import EventSource
+    from chronofile.timeline import TimelineOutput
 
 app = typer.Typer()
 
 
+def _gcal_clients(
+    client_id: str, client_secret: str, refresh_token: str, quota: QuotaTracker
+) -> Callable[[str], "DestinationClient"]:
+    def client(calendar_id: str) -> "DestinationClient":
+        # Counted per request rather than per call, since fetches take a request per page
+        return gcal.GcalClient(
+            calendar_id=calendar_id,
+            client_id=client_id,
+            client_secret=client_secret,
+            refresh_token=refresh_token,
+            quota=quota,
+        )
+
+    return client
+
+
+def _destination(
+    cfg: Config, default_calendar_id: str, client: Callable[[str], "DestinationClient"]
+) -> "DestinationClient":
+    """The default calendar, or a router over it and the calendar of each routed category.
+
+    Calendar ids are Google Calendar ids, or collection URLs for CalDAV.
+    """
+    if len(cfg.calendar_routes) == 0:
+        return client(default_calendar_id)
+
+    # One client per calendar, so each has its own connections
+    clients = {
+        calendar_id: client(calendar_id)
+        for calendar_id in {default_calendar_id, *cfg.calendar_routes.values()}
+    }
+    return RoutingDestination(
+        default=clients[default_calendar_id],
+        routes={category: clients[c] for category, c in cfg.calendar_routes.items()},
+        requests_per_second=cfg.calendar_requests_per_second,
+        max_cached_homes=cfg.calendar_max_cached_homes,
+    )
+
+
+def _apply_watch_settings(scheduler: AdaptiveScheduler, cfg: Config):
+    """Apply the watch settings of a possibly reloaded config."""
+    scheduler.reconfigure(
+        base_interval=cfg.watch_interval,
+        min_interval=cfg.watch_min_interval,
+        max_interval=cfg.watch_max_interval,
+        busy_events_per_minute=cfg.busy_events_per_minute,
+    )
+
+
+@dataclass
+class _CycleState:
+    """What a sync loop carries from one cycle to the next."""
+
+    synced: bool = False
+    # Whether the last cycle applied all of its changes, none deferred. Cycles are only skipped
+    # after one has.
+    latest_start: datetime.datetime | None = None
+    # Of the latest source event loaded so far, so the next cycle can tell which events are new
+
+
+def _started_after(events: Sequence["SourceEvent"], start: datetime.datetime | None) -> int:
+    """How many of the events, sorted by start, started after start. All of them if it is None."""
+    if start is None:
+        return len(events)
+    # Only materialises the events the search visits, so columnar sources stay cheap
+    return len(events) - bisect.bisect_right(events, start, key=lambda e: e.start)
+
+
+def _sync_once(
+    config: ReloadingConfig,
+    event_sources: Sequence["EventSource"],
+    destination_client: "DestinationClient",
+    dry_run: bool,
+    outputs: Sequence["TimelineOutput"],
+    cache: HydrationCache,
+    state: _CycleState,
+    record: str | None = None,
+    journal_path: str | None = None,
+    workers: int | None = None,
+) -> int | None:
+    """Run one sync cycle. Returns the number of source events which started since the last
+    cycle, or None if skipped. The sync window slides, so the number loaded would not do.
+
+    journal_path overrides the config's, so tenants sharing a config keep separate journals.
+    workers overrides the config's hydration workers.
+    """
+    config_changed = config.refresh()
+    if config_changed:
+        logging.info(rich.pretty.pprint(config.config))
+    cfg = config.config
+
+    # Started before planning, so a cycle as a whole stays within the budget
+    deadline = Deadline.after(cfg.apply_budget)
+    journal = Journal(path=journal_path or cfg.journal_path)
+    if not dry_run and resume(destination_client, journal, deadline):
+        # Resumed operations may have been given up on, so the timeline is planned again
+        state.synced = False
+        if journal.load():
+            # Operations which failed again are retried next cycle, before anything new
+            return None
+
+    # Poll every source, not just until the first change, so each is checked every cycle
+    changed = [s.poll() if isinstance(s, PollingEventSource) else True for s in event_sources]
+    if not any(changed) and not config_changed and state.synced:
+        log.info("Neither the sources nor the config changed since the last sync, skipping it")
+        return None
+    # Cleared once this cycle's changes are applied, so a failed cycle is not followed by skips
+    state.synced = False
+
+    logging.info("Starting sync")
+    window_end = datetime.datetime.now(datetime.timezone.utc)
+    window_start = window_end - cfg.sync_window
+    # The window does not depend on the source events, so both sides are fetched concurrently
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        destination_fetch = pool.submit(
+            destination_client.get_events, start=window_start, end=window_end
+        )
+        # A single source is passed through as-is, so columnar sources stay columnar. Sources
+        # are each sorted by start, so several are merged rather than re-sorted.
+        input_events = (
+            event_sources[0](start=window_start, end=window_end)
+            if len(event_sources) == 1
+            else list(
+                heapq.merge(
+                    *(f(start=window_start, end=window_end) for f in event_sources),
+                    key=lambda e: e.start,
+                )
+            )
+        )
+        destination_events = destination_fetch.result()
+    new_events = _started_after(input_events, state.latest_start)
+    if len(input_events) > 0:
+        state.latest_start = input_events[-1].start
+    if record is not None:
+        Bundle.capture(
+            config.path,
+            buckets=[
+                bucket
+                for s in event_sources
+                if isinstance(s, BucketWatcher)
+                for bucket in s.last_records()
+            ],
+            destination_events=destination_events,
+            window=(window_start, window_end),
+        ).save_in(record)
+
+    changes = pipeline(
+        source_events=input_events,
+        destination_events=destination_events,
+        rules=config.rules,
+        executor=ChunkedExecutor(
+            workers=workers if workers is not None else cfg.workers, chunk_size=cfg.chunk_size
+        ),
+        outputs=outputs,
+        cache=cache,
+        misrouted=(
+            destination_client.misrouted
+            if isinstance(destination_client, RoutingDestination)
+            else None
+        ),
+    )
+    cache.save()
+    log.info(f"Hydration cache: {cache.stats()}")
+
+    log.info(f"{len(changes)} changes to be made")
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug(f"Changes to be made {devtools.debug.format(changes)}")
+
+    if not dry_run:
+        log.info("Dry-run is false, syncing changes")
+        # Deferred changes are only planned again if the next cycle is not skipped
+        state.synced = apply_changes(changes, destination_client, journal, deadline) == 0
+    else:
+        log.info("Dry-run enabled, skipping sync")
+        state.synced = True
+    return new_events
+
+
 @app.command()
 def sync(
     activitywatch_base_url: Annotated[
         Optional[str], typer.Argument(envvar="ACTIVITYWATCH_BASE_URL")
     ],
-    gcal_email: Annotated[str, typer.Argument(envvar="GCAL_EMAIL")],
-    gcal_client_id: Annotated[str, typer.Argument(envvar="GCAL_CLIENT_ID")],
-    gcal_client_secret: Annotated[str, typer.Argument(envvar="GCAL_CLIENT_SECRET")],
-    gcal_refresh_token: Annotated[str, typer.Argument(envvar="GCAL_REFRESH_TOKEN")],
+    # Not needed when syncing to CalDAV
+    gcal_email: Annotated[Optional[str], typer.Argument(envvar="GCAL_EMAIL")] = None,
+    gcal_client_id: Annotated[Optional[str], typer.Argument(envvar="GCAL_CLIENT_ID")] = None,
+    gcal_client_secret: Annotated[
+        Optional[str], typer.Argument(envvar="GCAL_CLIENT_SECRET")
+    ] = None,
+    gcal_refresh_token: Annotated[
+        Optional[str], typer.Argument(envvar="GCAL_REFRESH_TOKEN")
+    ] = None,
     config_path: Annotated[str, typer.Argument(envvar="CONFIG_PATH")] = "config.toml",
     dry_run: bool = False,
     watch: Annotated[bool, typer.Option(envvar="WATCH")] = False,
+    report: Annotated[bool, typer.Option(help="Log hourly time per category each cycle")] = False,
+    record: Annotated[
+        Optional[str],
+        typer.Option(help="Save each cycle's inputs to a new bundle in this directory, for replay"),
+    ] = None,
+    caldav_url: Annotated[
+        Optional[str],
+        typer.Option(envvar="CALDAV_URL", help="Sync to this CalDAV collection instead"),
+    ] = None,
+    caldav_username: Annotated[Optional[str], typer.Option(envvar="CALDAV_USERNAME")] = None,
+    caldav_password: Annotated[Optional[str], typer.Option(envvar="CALDAV_PASSWORD")] = None,
 ):
-    cfg = Config.from_toml(config_path)
-
     logging.info(f"Running chronofile version {importlib.metadata.version('chronofile')}")
-    logging.info(rich.pretty.pprint(cfg))
-    logging.info("Starting sync")
+
+    # Only re-read and recompiled when the file changes, so rules stay stable across watch cycles
+    config = ReloadingConfig(config_path)
 
     event_sources: Sequence[EventSource] = [
         s for s in [try_activitywatch(activitywatch_base_url)] if s is not None
@@ -46,58 +271,380 @@ def sync(
     if len(event_sources) == 0:
         raise ValueError("No event sources provided.")
 
-    input_events = Arr(event_sources).map(lambda f: f()).flatten().to_list()
+    # Counts the calls of every calendar client against the daily quota
+    quota = QuotaTracker(daily_budget=config.config.calendar_daily_quota)
+    if caldav_url is not None:
+        destination_client = _destination(
+            config.config,
+            default_calendar_id=caldav_url,
+            client=lambda url: caldav.CalDavClient(
+                url=url, username=caldav_username, password=caldav_password
+            ),
+        )
+    else:
+        if not (gcal_email and gcal_client_id and gcal_client_secret and gcal_refresh_token):
+            raise ValueError("Provide Google Calendar credentials, or a CalDAV URL")
+        destination_client = _destination(
+            config.config,
+            default_calendar_id=gcal_email,
+            client=_gcal_clients(gcal_client_id, gcal_client_secret, gcal_refresh_token, quota),
+        )
+    scheduler = AdaptiveScheduler(
+        quota=quota,
+        base_interval=config.config.watch_interval,
+        min_interval=config.config.watch_min_interval,
+        max_interval=config.config.watch_max_interval,
+        busy_events_per_minute=config.config.busy_events_per_minute,
+    )
 
-    destination_client = gcal.GcalClient(
-        calendar_id=gcal_email,
-        client_id=gcal_client_id,
-        client_secret=gcal_client_secret,
-        refresh_token=gcal_refresh_token,
+    logging.info(rich.pretty.pprint(config.config))
+    # Kept across watch cycles, so repeated titles are only hydrated once
+    cache = HydrationCache(
+        maxsize=config.config.hydration_cache_size, path=config.config.hydration_cache_path
     )
 
-    changes = pipeline(
-        source_events=input_events,
-        destination_events=destination_client.get_events(
-            start=min([event.start for event in input_events]),
-            end=max([event.start for event in input_events])
-            + max([event.duration for event in input_events]),
-        ),
-        min_duration=cfg.min_duration,
-        category2emoji=cfg.category2emoji,
-        exclude_titles=cfg.exclude_titles,
-        merge_gap=cfg.merge_gap,
-        metadata_enrichment=cfg.metadata_enrichment,
-        exclude_apps=cfg.exclude_apps,
+    # Closes the event store however the loop ends
+    with contextlib.ExitStack() as stack:
+        outputs: list[TimelineOutput] = []
+        if report:
+            outputs.append(CategoryReport(bucket=datetime.timedelta(hours=1)))
+        if config.config.event_store_path is not None:
+            outputs.append(stack.enter_context(EventStore(path=config.config.event_store_path)))
+
+        state = _CycleState()
+        while True:
+            new_events = _sync_once(
+                config=config,
+                event_sources=event_sources,
+                destination_client=destination_client,
+                dry_run=dry_run,
+                outputs=outputs,
+                cache=cache,
+                state=state,
+                record=record,
+            )
+
+            if not watch:
+                break
+
+            _apply_watch_settings(scheduler, config.config)
+            interval = scheduler.next_interval(new_events, backlog=not state.synced)
+            metrics = scheduler.metrics()
+            if config.config.metrics_path is not None:
+                write_metrics(metrics, config.config.metrics_path)
+            log.info(
+                f"Watch is {watch}, sleeping for {interval}. "
+                f"{metrics.events_per_minute:.1f} events/min, "
+                f"{metrics.quota_remaining} calendar calls left today"
+            )
+            time.sleep(interval.total_seconds())
+
+
+@dataclass
+class _TenantState:
+    """What a tenant keeps across watch cycles."""
+
+    config: ReloadingConfig
+    source: BucketWatcher
+    destination: "DestinationClient"
+    cache: HydrationCache
+    scheduler: AdaptiveScheduler
+    outputs: Sequence["TimelineOutput"]
+    cycle: _CycleState = field(default_factory=_CycleState)
+
+
+@app.command()
+def sync_tenants(
+    tenants_path: Annotated[str, typer.Argument(envvar="TENANTS_PATH")] = "tenants.toml",
+    workers: Annotated[int, typer.Option(help="Tenant cycles run at the same time")] = 4,
+    dry_run: bool = False,
+    watch: Annotated[bool, typer.Option(envvar="WATCH")] = False,
+):
+    """Sync several people from one process, each with their own config and credentials.
+
+    Tenants hydrate serially, whatever the workers in their config, and run concurrently instead.
+    """
+    tenants = load_tenants(tenants_path)
+    logging.info(f"Syncing {len(tenants)} tenants on {workers} workers")
+
+    # Shared by every tenant, so ActivityWatch connections are pooled across tenants
+    session = requests.Session()
+    quotas: dict[str, QuotaTracker] = {}
+    # Tenants authenticating with the same OAuth client share its Calendar API quota
+    states: dict[str, _TenantState] = {}
+    lock = threading.Lock()
+    stores = contextlib.ExitStack()
+    # Closes the tenants' event stores when the run ends
+
+    def state_of(tenant: Tenant) -> _TenantState:
+        # Built on the tenant's first cycle, so a broken tenant only fails its own cycles
+        with lock:
+            if tenant.name in states:
+                return states[tenant.name]
+        config = ReloadingConfig(tenant.config_path)
+        source = try_activitywatch(tenant.activitywatch_base_url, session=session)
+        if source is None:
+            raise ValueError(f"Tenant {tenant.name} has no ActivityWatch URL")
+        if config.config.workers > 1:
+            log.info(f"Tenant {tenant.name} hydrates serially, ignoring workers in its config")
+        with lock:
+            quota = quotas.setdefault(
+                tenant.gcal_client_id, QuotaTracker(daily_budget=config.config.calendar_daily_quota)
+            )
+            outputs: list[TimelineOutput] = []
+            if config.config.event_store_path is not None:
+                store = EventStore(path=str(tenant.state_path / "events.sqlite3"))
+                outputs.append(stores.enter_context(store))
+        state = _TenantState(
+            config=config,
+            source=source,
+            destination=_destination(
+                config.config,
+                default_calendar_id=tenant.gcal_email,
+                client=_gcal_clients(
+                    tenant.gcal_client_id,
+                    tenant.gcal_client_secret,
+                    tenant.gcal_refresh_token,
+                    quota,
+                ),
+            ),
+            cache=HydrationCache(
+                maxsize=config.config.hydration_cache_size,
+                path=str(tenant.state_path / "hydration-cache.json"),
+            ),
+            scheduler=AdaptiveScheduler(
+                quota=quota,
+                base_interval=config.config.watch_interval,
+                min_interval=config.config.watch_min_interval,
+                max_interval=config.config.watch_max_interval,
+                busy_events_per_minute=config.config.busy_events_per_minute,
+            ),
+            outputs=outputs,
+        )
+        with lock:
+            states[tenant.name] = state
+        return state
+
+    def cycle(tenant: Tenant) -> datetime.timedelta:
+        state = state_of(tenant)
+        new_events = _sync_once(
+            config=state.config,
+            event_sources=[state.source],
+            destination_client=state.destination,
+            dry_run=dry_run,
+            outputs=state.outputs,
+            cache=state.cache,
+            state=state.cycle,
+            journal_path=str(tenant.state_path / "journal.jsonl"),
+            # Tenants already run concurrently on threads, and forking a process pool from one
+            # thread while others hold locks can deadlock the children
+            workers=1,
+        )
+        _apply_watch_settings(state.scheduler, state.config.config)
+        interval = state.scheduler.next_interval(new_events, backlog=not state.cycle.synced)
+        log.info(f"Tenant {tenant.name} synced, next cycle in {interval}")
+        return interval
+
+    with stores:
+        run_tenants(tenants, cycle, workers=workers, watch=watch)
+
+
+class ReportBucket(str, Enum):
+    hour = "hour"
+    day = "day"
+
+
+@app.command()
+def report(
+    activitywatch_base_url: Annotated[str, typer.Argument(envvar="ACTIVITYWATCH_BASE_URL")],
+    config_path: Annotated[str, typer.Argument(envvar="CONFIG_PATH")] = "config.toml",
+    bucket: ReportBucket = ReportBucket.hour,
+):
+    """Print time per category for today, without syncing."""
+    source = try_activitywatch(activitywatch_base_url)
+    if source is None:
+        raise ValueError("No event sources provided.")
+
+    rules = CompiledRules.from_config(Config.from_toml(config_path))
+    now = datetime.datetime.now().astimezone()
+    start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    timeline = build_timeline(source(start=start_of_day, end=now), rules)
+
+    width = (
+        datetime.timedelta(hours=1) if bucket == ReportBucket.hour else datetime.timedelta(days=1)
     )
+    print(format_report(aggregate(TimelineColumns.from_events(timeline), bucket=width)))
+
+
+@app.command()
+def query(
+    start: Annotated[datetime.datetime, typer.Argument(help="Start of the range, local time")],
+    end: Annotated[datetime.datetime, typer.Argument(help="End of the range, local time")],
+    config_path: Annotated[str, typer.Option(envvar="CONFIG_PATH")] = "config.toml",
+    category: Annotated[Optional[RecordCategory], typer.Option()] = None,
+    title: Annotated[Optional[str], typer.Option()] = None,
+    totals: Annotated[bool, typer.Option(help="Print time per category instead")] = False,
+):
+    """Look up synced history in the local event store, without calling the destination."""
+    store_path = Config.from_toml(config_path).event_store_path
+    if store_path is None:
+        raise ValueError("Set event_store_path in the config to keep a local history")
+
+    start, end = start.astimezone(), end.astimezone()
+    with EventStore(path=store_path) as store:
+        if totals:
+            print(format_report(store.totals(start, end, category=category, title=title)))
+            return
+        for event in store.query(start, end, category=category, title=title):
+            category_name = event.category.value if event.category is not None else ""
+            print(
+                f"{event.start.isoformat(timespec='minutes')}  "
+                f"{event.end.isoformat(timespec='minutes')}  {category_name:<14} {event.title}"
+            )
+
+
+@app.command()
+def compact(
+    since: Annotated[
+        datetime.datetime, typer.Argument(help="Compact events from here, local time")
+    ],
+    config_path: Annotated[str, typer.Option(envvar="CONFIG_PATH")] = "config.toml",
+    dry_run: bool = False,
+    batch_size: Annotated[int, typer.Option(help="Changes applied per batch")] = 100,
+    caldav_url: Annotated[Optional[str], typer.Option(envvar="CALDAV_URL")] = None,
+    caldav_username: Annotated[Optional[str], typer.Option(envvar="CALDAV_USERNAME")] = None,
+    caldav_password: Annotated[Optional[str], typer.Option(envvar="CALDAV_PASSWORD")] = None,
+    gcal_email: Annotated[Optional[str], typer.Option(envvar="GCAL_EMAIL")] = None,
+    gcal_client_id: Annotated[Optional[str], typer.Option(envvar="GCAL_CLIENT_ID")] = None,
+    gcal_client_secret: Annotated[Optional[str], typer.Option(envvar="GCAL_CLIENT_SECRET")] = None,
+    gcal_refresh_token: Annotated[Optional[str], typer.Option(envvar="GCAL_REFRESH_TOKEN")] = None,
+):
+    """Merge duplicates and same-title fragments across the whole calendar history.
 
-    logging.info(f"Changes to be made {devtools.debug.format(changes)}")
+    The calendar is read a page at a time in time order, and changes are applied in batches
+    as they are found, so memory does not grow with the length of the history. Only events
+    chronofile inserted are touched.
+    """
+    cfg = Config.from_toml(config_path)
+    if caldav_url is not None:
+        destination_client = _destination(
+            cfg,
+            default_calendar_id=caldav_url,
+            client=lambda url: caldav.CalDavClient(
+                url=url, username=caldav_username, password=caldav_password
+            ),
+        )
+    else:
+        if not (gcal_email and gcal_client_id and gcal_client_secret and gcal_refresh_token):
+            raise ValueError("Provide Google Calendar credentials, or a CalDAV URL")
+        quota = QuotaTracker(daily_budget=cfg.calendar_daily_quota)
+        destination_client = _destination(
+            cfg,
+            default_calendar_id=gcal_email,
+            client=_gcal_clients(gcal_client_id, gcal_client_secret, gcal_refresh_token, quota),
+        )
 
+    # Kept apart from the sync journal, so an interrupted compaction never blocks syncing
+    journal = Journal(path=str(pathlib.Path(cfg.journal_path).with_name("compact-journal.jsonl")))
     if not dry_run:
-        log.info("Dry-run is false, syncing changes")
-        for change in changes:
-            match change:
-                case diff.NewEvent():
-                    destination_client.add_event(change.event)
-                case diff.UpdateEvent():
-                    destination_client.update_event(change.event)
-                case diff.DeleteEvent():
-                    destination_client.delete_event(change.event)
+        resume(destination_client, journal)
+
+    stats = compaction.CompactionStats()
+    events = compaction.stream_destination(
+        destination_client, start=since.astimezone(), end=datetime.datetime.now().astimezone()
+    )
+    changes = compaction.compact(events, cfg.merge_gap, stats)
+    if dry_run:
+        skipped = sum(1 for _ in changes)
+        log.info(f"Dry-run enabled, skipping {skipped} changes")
+        failed = 0
     else:
-        log.info("Dry-run enabled, skipping sync")
+        failed = compaction.apply_batches(changes, destination_client, journal, batch_size)
+    print(
+        f"Merged {stats.merged} events into {stats.extended} extended events"
+        + ("" if not dry_run else " (dry run, nothing changed)")
+        + (f", {failed} changes failed" if failed > 0 else "")
+    )
+    for title, merged in sorted(stats.by_title.items(), key=lambda t: -t[1])[:10]:
+        print(f"{merged:>8}  {title}")
 
-    if watch:
-        sleep_minutes = 5
-        log.info(f"Watch is {watch}, sleeping for {sleep_minutes} minutes")
-        time.sleep(sleep_minutes * 60)
-        sync(
-            activitywatch_base_url=activitywatch_base_url,
-            gcal_email=gcal_email,
-            gcal_client_id=gcal_client_id,
-            gcal_client_secret=gcal_client_secret,
-            gcal_refresh_token=gcal_refresh_token,
-            dry_run=dry_run,
-            watch=watch,
+
+@app.command()
+def benchmark_memory(
+    events: int = 20_000, distinct_titles: int = 1_000, cycles: int = 5, cache_size: int = 4096
+):
+    """Measure memory per pipeline stage on synthetic data, and check for growth across cycles."""
+    cache = HydrationCache(maxsize=cache_size)
+    records = synthetic_records(n_events=events, distinct_titles=distinct_titles)
+    for stage in measure_cycle(records, benchmark_rules(), cache):
+        print(stage)
+
+    retained = soak(cycles=cycles, n_events=events, distinct_titles=distinct_titles, cache=cache)
+    print("Retained after each cycle: " + ", ".join(f"{r / 2**20:.2f} MiB" for r in retained))
+    print(f"Hydration cache: {cache.stats()}")
+
+
+@app.command()
+def benchmark_destination(
+    events: int = 200,
+    caldav_url: Annotated[Optional[str], typer.Option(envvar="CALDAV_URL")] = None,
+    caldav_username: Annotated[Optional[str], typer.Option(envvar="CALDAV_USERNAME")] = None,
+    caldav_password: Annotated[Optional[str], typer.Option(envvar="CALDAV_PASSWORD")] = None,
+    gcal_email: Annotated[Optional[str], typer.Option(envvar="GCAL_EMAIL")] = None,
+    gcal_client_id: Annotated[Optional[str], typer.Option(envvar="GCAL_CLIENT_ID")] = None,
+    gcal_client_secret: Annotated[Optional[str], typer.Option(envvar="GCAL_CLIENT_SECRET")] = None,
+    gcal_refresh_token: Annotated[Optional[str], typer.Option(envvar="GCAL_REFRESH_TOKEN")] = None,
+):
+    """Compare write and fetch throughput of the configured destinations, on scratch calendars."""
+    destinations: list[DestinationClient] = []
+    if caldav_url is not None:
+        destinations.append(
+            caldav.CalDavClient(url=caldav_url, username=caldav_username, password=caldav_password)
+        )
+    if gcal_email and gcal_client_id and gcal_client_secret and gcal_refresh_token:
+        destinations.append(
+            gcal.GcalClient(
+                calendar_id=gcal_email,
+                client_id=gcal_client_id,
+                client_secret=gcal_client_secret,
+                refresh_token=gcal_refresh_token,
+            )
         )
+    if len(destinations) == 0:
+        raise ValueError("Configure a CalDAV URL or Google Calendar credentials to benchmark")
+
+    for destination in destinations:
+        print(destination_throughput(destination, n_events=events))
+
+
+@app.command()
+def replay(
+    bundle_path: str,
+    config_path: Annotated[
+        Optional[str], typer.Option(help="Replay with this config instead of the recorded one")
+    ] = None,
+    profile: Annotated[
+        Optional[str],
+        typer.Option(help="Write cProfile stats here, e.g. for flameprof or snakeviz"),
+    ] = None,
+):
+    """Run a bundle recorded with sync --record through the pipeline, offline."""
+    bundle = Bundle.load(bundle_path)
+    cfg = Config.from_toml(config_path) if config_path else Config.from_toml_str(bundle.config)
+    rules = CompiledRules.from_config(cfg)
+
+    if profile is None:
+        destination = replay_bundle(bundle, rules)
+    else:
+        profiler = cProfile.Profile()
+        destination = profiler.runcall(replay_bundle, bundle, rules)
+        profiler.dump_stats(profile)
+        log.info(f"Wrote profile to {profile}")
+
+    print(
+        f"Replayed bundle recorded at {bundle.recorded_at}: {destination.added} inserts, "
+        f"{destination.updated} updates, {destination.deleted} deletes"
+    )
 
 
 @app.command()
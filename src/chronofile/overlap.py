@@ -0,0 +1,121 @@
+import bisect
+import heapq
+from typing import TYPE_CHECKING, Iterable, Sequence
+
+from chronofile.event import URLEvent, WindowTitleEvent
+
+if TYPE_CHECKING:
+    import datetime
+
+    from chronofile.commands.hydration import IndexedEvent
+    from chronofile.config import CompiledRules
+    from chronofile.event import SourceEvent
+
+Interval = tuple["datetime.datetime", "datetime.datetime"]
+
+
+def _end(event: "SourceEvent") -> "datetime.datetime":
+    return event.start + event.duration
+
+
+def _union(events: Sequence["SourceEvent"]) -> Sequence[Interval]:
+    """Sweep events sorted by start into disjoint, sorted intervals."""
+    intervals: list[Interval] = []
+    for event in events:
+        start, end = event.start, _end(event)
+        if intervals and start <= intervals[-1][1]:
+            intervals[-1] = (intervals[-1][0], max(intervals[-1][1], end))
+        else:
+            intervals.append((start, end))
+    return intervals
+
+
+def _overlapping(
+    intervals: Sequence[Interval], ends: Sequence["datetime.datetime"], event: "SourceEvent"
+) -> Sequence[Interval]:
+    # Intervals are disjoint and sorted, so ends are sorted too
+    first = bisect.bisect_right(ends, event.start)
+    overlapping: list[Interval] = []
+    for start, end in intervals[first:]:
+        if start >= _end(event):
+            break
+        overlapping.append((start, end))
+    return overlapping
+
+
+def _with_span(
+    event: "SourceEvent", start: "datetime.datetime", end: "datetime.datetime"
+) -> "SourceEvent":
+    return event.model_copy(update={"start": start, "duration": end - start})
+
+
+def _intersect(
+    event: "SourceEvent", intervals: Sequence[Interval], ends: Sequence["datetime.datetime"]
+) -> Sequence["SourceEvent"]:
+    return [
+        _with_span(event, max(event.start, start), min(_end(event), end))
+        for start, end in _overlapping(intervals, ends, event)
+    ]
+
+
+def _subtract(
+    event: "SourceEvent", intervals: Sequence[Interval], ends: Sequence["datetime.datetime"]
+) -> Sequence["SourceEvent"]:
+    remainders: list[SourceEvent] = []
+    cursor = event.start
+    for start, end in _overlapping(intervals, ends, event):
+        if start > cursor:
+            remainders.append(_with_span(event, cursor, start))
+        cursor = max(cursor, end)
+    if cursor < _end(event):
+        remainders.append(_with_span(event, cursor, _end(event)))
+    return remainders
+
+
+def resolve_browser_overlap(
+    events: Iterable["IndexedEvent"], rules: "CompiledRules"
+) -> Iterable["IndexedEvent"]:
+    """Replace time in browser windows with the URL events active at the same time.
+
+    URL events are clipped to the periods a browser window was focused. Browser window time
+    without a concurrent URL event is kept, so no time is lost. Events are paired with their
+    index in the pipeline's input, and fragments keep the index of the event they were cut
+    from. Expects events sorted by start, and keeps them sorted. Passes events through lazily
+    when no browser apps are configured.
+    """
+    if len(rules.browser_apps) == 0:
+        return events
+
+    browser_windows: list[IndexedEvent] = []
+    url_events: list[IndexedEvent] = []
+    resolved: list[IndexedEvent] = []
+    for indexed in events:
+        event = indexed[1]
+        if isinstance(event, WindowTitleEvent) and rules.is_browser(event.app):
+            browser_windows.append(indexed)
+        elif isinstance(event, URLEvent):
+            url_events.append(indexed)
+        else:
+            resolved.append(indexed)
+
+    # Events arrive sorted by start, so each partition is sorted too
+    browsing = _union([e for _, e in browser_windows])
+    browsing_ends = [end for _, end in browsing]
+    url_coverage = _union([e for _, e in url_events])
+    url_coverage_ends = [end for _, end in url_coverage]
+
+    fragments = [
+        *(
+            (i, fragment)
+            for i, e in url_events
+            for fragment in _intersect(e, browsing, browsing_ends)
+        ),
+        *(
+            (i, fragment)
+            for i, e in browser_windows
+            for fragment in _subtract(e, url_coverage, url_coverage_ends)
+        ),
+    ]
+    # Only the fragments need sorting, the remaining events are still in order
+    fragments.sort(key=lambda indexed: indexed[1].start)
+    return list(heapq.merge(resolved, fragments, key=lambda indexed: indexed[1].start))
@@ -0,0 +1,189 @@
+import logging
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Mapping, Sequence
+
+from chronofile.diff import DeleteEvent, EventChange, NewEvent, UpdateEvent
+from chronofile.event import ChronofileEvent, has_deterministic_id
+
+if TYPE_CHECKING:
+    from chronofile.diff import Misrouted
+    from chronofile.event import DestinationEvent
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PlanSavings:
+    """Remote operations saved by planning, compared to applying the naive changeset."""
+
+    dropped_noops: int = 0
+    merged_delete_inserts: int = 0
+    coalesced: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.dropped_noops + self.merged_delete_inserts + self.coalesced
+
+    def __str__(self) -> str:
+        return f"saved {self.total} operations ({self.dropped_noops} no-op updates, {self.merged_delete_inserts} delete+insert pairs, {self.coalesced} coalesced)"
+
+
+@dataclass(frozen=True)
+class Plan:
+    changes: Sequence[EventChange]
+    savings: PlanSavings
+
+
+def _is_noop(
+    update: UpdateEvent, stored: Mapping[str, "DestinationEvent"], misrouted: "Misrouted | None"
+) -> bool:
+    existing = stored.get(update.event.id)
+    if existing is None:
+        return False
+    if misrouted is not None and misrouted(existing, update.event.category):
+        return False
+    return (existing.title, existing.start, existing.end) == (
+        update.event.title,
+        update.event.start,
+        update.event.end,
+    )
+
+
+def _coalesce(changeset: Sequence[EventChange]) -> tuple[list[EventChange], int]:
+    """Keep only the last operation per destination id. New events have no id yet, so are kept."""
+    last_index: dict[str, int] = {}
+    for i, change in enumerate(changeset):
+        if not isinstance(change, NewEvent):
+            last_index[change.event.id] = i
+
+    kept = [
+        change
+        for i, change in enumerate(changeset)
+        if isinstance(change, NewEvent) or last_index[change.event.id] == i
+    ]
+    return kept, len(changeset) - len(kept)
+
+
+def _reuse(delete: DeleteEvent, new: ChronofileEvent) -> UpdateEvent:
+    return UpdateEvent(
+        event=delete.event.model_copy(
+            update={
+                "title": new.title,
+                "start": new.start,
+                "end": new.end,
+                "category": new.category,
+                "provenance": new.provenance,
+            }
+        )
+    )
+
+
+def _pair_deletes_with_inserts(
+    changeset: Sequence[EventChange], misrouted: "Misrouted | None"
+) -> tuple[list[EventChange], int]:
+    """Turn a delete and an insert into a single update of the deleted event.
+
+    Pairs events with the same title first, so the reused event changes as little as possible.
+    Events are only reused within a calendar, since moving one costs a delete and an insert.
+    Events with deterministic ids are only reused for the same title and start, since their id
+    is derived from both, and a later insert of the original event must still conflict with it.
+    """
+    deletes = sorted(
+        ((i, c) for i, c in enumerate(changeset) if isinstance(c, DeleteEvent)),
+        key=lambda p: p[1].event.start,
+    )
+    inserts = sorted(
+        ((i, c) for i, c in enumerate(changeset) if isinstance(c, NewEvent)),
+        key=lambda p: p[1].event.start,
+    )
+
+    replacements: dict[int, UpdateEvent] = {}  # insert index -> update reusing a deleted event
+    paired_deletes: set[int] = set()
+
+    def pairable(delete: DeleteEvent, insert: NewEvent) -> bool:
+        if has_deterministic_id(delete.event) and (delete.event.title, delete.event.start) != (
+            insert.event.title,
+            insert.event.start,
+        ):
+            return False
+        return misrouted is None or not misrouted(delete.event, insert.event.category)
+
+    deletes_by_title: dict[str, list[tuple[int, DeleteEvent]]] = {}
+    for i, d in reversed(deletes):
+        deletes_by_title.setdefault(d.event.title, []).append((i, d))
+
+    for insert_index, insert in inserts:
+        same_title = deletes_by_title.get(insert.event.title)
+        if same_title and pairable(same_title[-1][1], insert):
+            delete_index, delete = same_title.pop()
+            replacements[insert_index] = _reuse(delete, insert.event)
+            paired_deletes.add(delete_index)
+
+    remaining_deletes = [(i, d) for i, d in reversed(deletes) if i not in paired_deletes]
+    for insert_index, insert in inserts:
+        if insert_index in replacements or not remaining_deletes:
+            continue
+        if not pairable(remaining_deletes[-1][1], insert):
+            continue
+        delete_index, delete = remaining_deletes.pop()
+        replacements[insert_index] = _reuse(delete, insert.event)
+        paired_deletes.add(delete_index)
+
+    planned = [
+        replacements.get(i, change) for i, change in enumerate(changeset) if i not in paired_deletes
+    ]
+    return planned, len(replacements)
+
+
+def _split_moves(changeset: Sequence[EventChange], misrouted: "Misrouted") -> list[EventChange]:
+    """Turn updates which move an event to another calendar into an insert there and a delete
+    here, so each step is journalled, and resumed, on its own.
+    """
+    split: list[EventChange] = []
+    for change in changeset:
+        if isinstance(change, UpdateEvent) and misrouted(change.event, change.event.category):
+            moved = change.event
+            split.append(
+                NewEvent(
+                    event=ChronofileEvent(
+                        title=moved.title,
+                        start=moved.start,
+                        end=moved.end,
+                        category=moved.category,
+                        provenance=moved.provenance,
+                    )
+                )
+            )
+            split.append(DeleteEvent(event=moved))
+        else:
+            split.append(change)
+    return split
+
+
+def optimize(
+    changeset: Sequence[EventChange],
+    destination_events: Sequence["DestinationEvent"],
+    misrouted: "Misrouted | None" = None,
+) -> Plan:
+    """Rewrite a changeset into the fewest remote operations that reach the same end state.
+
+    With misrouted, updates which move events between calendars are split into an insert and a
+    delete.
+    """
+    coalesced, n_coalesced = _coalesce(changeset)
+
+    stored = {e.id: e for e in destination_events}
+    without_noops = [
+        c for c in coalesced if not (isinstance(c, UpdateEvent) and _is_noop(c, stored, misrouted))
+    ]
+    n_noops = len(coalesced) - len(without_noops)
+
+    planned, n_pairs = _pair_deletes_with_inserts(without_noops, misrouted)
+    if misrouted is not None:
+        planned = _split_moves(planned, misrouted)
+
+    savings = PlanSavings(
+        dropped_noops=n_noops, merged_delete_inserts=n_pairs, coalesced=n_coalesced
+    )
+    log.info(f"Planned {len(planned)} operations from {len(changeset)} changes, {savings}")
+    return Plan(changes=planned, savings=savings)
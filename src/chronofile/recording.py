@@ -0,0 +1,152 @@
+import datetime
+import gzip
+import json
+import logging
+import pathlib
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Mapping, Sequence
+
+from chronofile.commands.apply import apply_changes
+from chronofile.commands.sync_logic import pipeline, source_window
+from chronofile.destinations.gcal.client import DestinationClient
+from chronofile.event import DestinationEvent
+from chronofile.sources.columns import EventColumns, EventKind
+
+if TYPE_CHECKING:
+    from chronofile.config import CompiledRules
+    from chronofile.event import ChronofileEvent
+
+log = logging.getLogger(__name__)
+
+_BUNDLE_VERSION = 1
+
+
+@dataclass(frozen=True)
+class Bundle:
+    """Everything a sync cycle read from the outside world, so it can be replayed offline."""
+
+    config: str
+    # The TOML the cycle ran with
+    buckets: Sequence[tuple[EventKind, Sequence[Mapping[str, Any]]]]
+    # Raw ActivityWatch records per bucket
+    destination_events: Sequence[Mapping[str, Any]]
+    # What get_events returned
+    recorded_at: str = field(
+        default_factory=lambda: datetime.datetime.now(datetime.timezone.utc).isoformat()
+    )
+    window: tuple[str, str] | None = None
+    # The cycle's sync window, as ISO timestamps. None in bundles recorded before it was kept.
+
+    @staticmethod
+    def capture(
+        config_path: str,
+        buckets: Sequence[tuple[EventKind, Sequence[Mapping[str, Any]]]],
+        destination_events: Sequence["DestinationEvent"],
+        window: tuple[datetime.datetime, datetime.datetime] | None = None,
+    ) -> "Bundle":
+        return Bundle(
+            config=pathlib.Path(config_path).read_text(),
+            buckets=buckets,
+            destination_events=[
+                e.model_dump(mode="json", exclude={"provenance"}) for e in destination_events
+            ],
+            window=(window[0].isoformat(), window[1].isoformat()) if window is not None else None,
+        )
+
+    def save(self, path: str):
+        payload = {
+            "version": _BUNDLE_VERSION,
+            "recorded_at": self.recorded_at,
+            "config": self.config,
+            "buckets": [{"kind": int(kind), "records": records} for kind, records in self.buckets],
+            "destination_events": self.destination_events,
+            "window": self.window,
+        }
+        pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(path, "wt") as f:
+            json.dump(payload, f)
+        log.info(f"Recorded sync inputs to {path}")
+
+    def save_in(self, directory: str) -> str:
+        """Save under a name derived from recorded_at, so every cycle keeps its own bundle.
+
+        Returns the path written to.
+        """
+        recorded_at = datetime.datetime.fromisoformat(self.recorded_at)
+        path = str(pathlib.Path(directory) / f"cycle-{recorded_at:%Y%m%dT%H%M%S%fZ}.json.gz")
+        self.save(path)
+        return path
+
+    @staticmethod
+    def load(path: str) -> "Bundle":
+        with gzip.open(path, "rt") as f:
+            payload = json.load(f)
+        if payload["version"] != _BUNDLE_VERSION:
+            raise ValueError(f"Unsupported bundle version {payload['version']}")
+        return Bundle(
+            config=payload["config"],
+            buckets=[(EventKind(b["kind"]), b["records"]) for b in payload["buckets"]],
+            destination_events=payload["destination_events"],
+            recorded_at=payload["recorded_at"],
+            window=tuple(payload["window"]) if payload.get("window") is not None else None,  # type: ignore
+        )
+
+    def source(self) -> EventColumns:
+        return EventColumns.from_records(self.buckets)
+
+    def sync_window(self) -> tuple[datetime.datetime, datetime.datetime] | None:
+        """The window the cycle synced, or None for bundles recorded before it was kept."""
+        if self.window is None:
+            return None
+        start, end = self.window
+        return datetime.datetime.fromisoformat(start), datetime.datetime.fromisoformat(end)
+
+    def destination(self) -> "StubDestination":
+        return StubDestination(
+            events=[DestinationEvent.model_validate(e) for e in self.destination_events]
+        )
+
+
+@dataclass
+class StubDestination(DestinationClient):
+    """Serves recorded destination events, and counts the writes instead of sending them."""
+
+    events: Sequence["DestinationEvent"]
+    added: int = 0
+    updated: int = 0
+    deleted: int = 0
+
+    def get_events(
+        self, start: "datetime.datetime", end: "datetime.datetime"
+    ) -> Sequence["DestinationEvent"]:
+        return [e for e in self.events if e.start < end and e.end > start]
+
+    def add_event(self, event: "ChronofileEvent") -> "DestinationEvent":
+        self.added += 1
+        return DestinationEvent(
+            title=event.title, start=event.start, end=event.end, id=f"stub{self.added}"
+        )
+
+    def update_event(self, event: "DestinationEvent") -> "DestinationEvent":
+        self.updated += 1
+        return event
+
+    def delete_event(self, event: "DestinationEvent") -> None:  # noqa: ARG002
+        self.deleted += 1
+
+
+def replay_bundle(bundle: Bundle, rules: "CompiledRules") -> StubDestination:
+    """Run a recorded cycle through the pipeline and apply it to a stub destination."""
+    source_events = bundle.source()
+    destination = bundle.destination()
+    # Bundles without a recorded window fall back to the span of their source events
+    window = bundle.sync_window() or source_window(source_events)
+    changes = pipeline(
+        source_events=source_events,
+        destination_events=(
+            destination.get_events(start=window[0], end=window[1]) if window is not None else []
+        ),
+        rules=rules,
+    )
+    apply_changes(changes, destination)
+    return destination
@@ -0,0 +1,215 @@
+import datetime
+import pathlib
+import threading
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Sequence
+
+if TYPE_CHECKING:
+    from chronofile.destinations.gcal.client import DestinationClient
+    from chronofile.event import ChronofileEvent, DestinationEvent
+
+Clock = Callable[[], datetime.datetime]
+
+
+def _utc_now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+@dataclass
+class QuotaTracker:
+    """Counts Calendar API calls against a daily budget, which resets at midnight UTC."""
+
+    daily_budget: int
+    clock: Clock = _utc_now
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False)
+    _day: datetime.date | None = field(default=None, init=False)
+    _used: int = field(default=0, init=False)
+
+    def _roll_over(self):
+        today = self.clock().date()
+        if today != self._day:
+            self._day, self._used = today, 0
+
+    def record(self, calls: int = 1):
+        with self._lock:
+            self._roll_over()
+            self._used += calls
+
+    @property
+    def used(self) -> int:
+        with self._lock:
+            self._roll_over()
+            return self._used
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.daily_budget - self.used)
+
+    def until_reset(self) -> datetime.timedelta:
+        now = self.clock()
+        midnight = datetime.datetime.combine(
+            now.date() + datetime.timedelta(days=1), datetime.time(), tzinfo=now.tzinfo
+        )
+        return midnight - now
+
+
+@dataclass(frozen=True)
+class QuotaCountingDestination:
+    """Records every call made to the wrapped destination in a quota tracker.
+
+    Only accurate for destinations which make one request per call. Clients which page, or
+    retry, should record their own requests instead, like GcalClient.
+    """
+
+    inner: "DestinationClient"
+    quota: QuotaTracker
+
+    def add_event(self, event: "ChronofileEvent") -> "DestinationEvent":
+        self.quota.record()
+        return self.inner.add_event(event)
+
+    def get_events(
+        self, start: datetime.datetime, end: datetime.datetime
+    ) -> Sequence["DestinationEvent"]:
+        self.quota.record()
+        return self.inner.get_events(start=start, end=end)
+
+    def update_event(self, event: "DestinationEvent") -> "DestinationEvent":
+        self.quota.record()
+        return self.inner.update_event(event)
+
+    def delete_event(self, event: "DestinationEvent") -> None:
+        self.quota.record()
+        self.inner.delete_event(event)
+
+
+@dataclass(frozen=True)
+class SchedulerMetrics:
+    interval: datetime.timedelta
+    events_per_minute: float
+    quota_used: int
+    quota_remaining: int
+
+    def to_prometheus(self) -> str:
+        """In the Prometheus text format, e.g. for node_exporter's textfile collector."""
+        return "".join(
+            f"chronofile_{name} {value}\n"
+            for name, value in [
+                ("watch_interval_seconds", self.interval.total_seconds()),
+                ("source_events_per_minute", self.events_per_minute),
+                ("calendar_quota_used", self.quota_used),
+                ("calendar_quota_remaining", self.quota_remaining),
+            ]
+        )
+
+
+def _check_intervals(
+    min_interval: datetime.timedelta,
+    base_interval: datetime.timedelta,
+    max_interval: datetime.timedelta,
+):
+    if not min_interval <= base_interval <= max_interval:
+        raise ValueError("Expected min_interval <= base_interval <= max_interval")
+
+
+@dataclass
+class AdaptiveScheduler:
+    """Picks how long to sleep between watch cycles.
+
+    Halves the interval while the source event rate is at least busy_events_per_minute, doubles
+    it while no new events arrive, and returns to base_interval otherwise. While changes are
+    left over from the last cycle, it is capped at base_interval. The interval is then
+    stretched, beyond max_interval if need be, so the calls a cycle costs fit in the quota
+    remaining until it resets.
+    """
+
+    quota: QuotaTracker
+    base_interval: datetime.timedelta = datetime.timedelta(minutes=5)
+    min_interval: datetime.timedelta = datetime.timedelta(minutes=1)
+    max_interval: datetime.timedelta = datetime.timedelta(hours=1)
+    busy_events_per_minute: float = 1.0
+
+    def __post_init__(self):
+        _check_intervals(self.min_interval, self.base_interval, self.max_interval)
+        self._interval = self.base_interval
+        self._events_per_minute = 0.0
+        self._first_cycle = True
+        self._calls_per_cycle = 0.0
+        self._quota_at_last_cycle: int | None = None
+
+    def reconfigure(
+        self,
+        base_interval: datetime.timedelta,
+        min_interval: datetime.timedelta,
+        max_interval: datetime.timedelta,
+        busy_events_per_minute: float,
+    ):
+        """Switch to new settings, e.g. from a reloaded config, keeping the observed rates."""
+        _check_intervals(min_interval, base_interval, max_interval)
+        self.base_interval, self.min_interval, self.max_interval = (
+            base_interval,
+            min_interval,
+            max_interval,
+        )
+        self.busy_events_per_minute = busy_events_per_minute
+        self._interval = min(max(self._interval, min_interval), max_interval)
+
+    def _observe_calls(self):
+        used = self.quota.used
+        previous, self._quota_at_last_cycle = self._quota_at_last_cycle, used
+        if previous is not None and used >= previous:
+            # Smoothed, so one large changeset does not dominate
+            self._calls_per_cycle = 0.7 * self._calls_per_cycle + 0.3 * (used - previous)
+
+    def _quota_floor(self) -> datetime.timedelta:
+        """The shortest interval at which the remaining quota lasts until it resets."""
+        remaining = self.quota.remaining
+        if self._calls_per_cycle == 0:
+            return datetime.timedelta(0)
+        if remaining < self._calls_per_cycle:
+            return self.quota.until_reset()
+        return self.quota.until_reset() / (remaining / self._calls_per_cycle)
+
+    def next_interval(self, new_events: int | None, backlog: bool = False) -> datetime.timedelta:
+        """Call after each cycle with the number of source events which started since the last
+        one, or None if it was skipped, and whether it left changes to apply.
+
+        Every event is new to the first cycle, so it only sets the baseline.
+        """
+        first_cycle, self._first_cycle = self._first_cycle, False
+        self._events_per_minute = (
+            (new_events or 0) / (self._interval.total_seconds() / 60) if not first_cycle else 0.0
+        )
+        self._observe_calls()
+
+        if first_cycle:
+            interval = self.base_interval
+        elif self._events_per_minute >= self.busy_events_per_minute:
+            interval = max(self.min_interval, self._interval / 2)
+        elif self._events_per_minute == 0:
+            interval = min(self.max_interval, self._interval * 2)
+        else:
+            interval = self.base_interval
+        if backlog:
+            # Deferred or failed changes are waiting, so the next cycle is not put off
+            interval = min(interval, self.base_interval)
+
+        self._interval = max(interval, self._quota_floor())
+        return self._interval
+
+    def metrics(self) -> SchedulerMetrics:
+        return SchedulerMetrics(
+            interval=self._interval,
+            events_per_minute=self._events_per_minute,
+            quota_used=self.quota.used,
+            quota_remaining=self.quota.remaining,
+        )
+
+
+def write_metrics(metrics: SchedulerMetrics, path: str):
+    """Atomically replace the metrics file, so scrapers never read a partial file."""
+    target = pathlib.Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix(".tmp")
+    tmp.write_text(metrics.to_prometheus())
+    tmp.replace(target)
@@ -1,5 +1,6 @@
-import datetime  # noqa: TCH003
+import datetime
 import logging
+from dataclasses import dataclass, field
 from functools import partial
 from typing import Any, Callable, Literal, Mapping, Sequence
 
@@ -7,6 +8,7 @@ import pydantic
 import requests
 
 from chronofile.event import SourceEvent, URLEvent, WindowTitleEvent
+from chronofile.sources.columns import EventColumns, EventKind
 
 log = logging.getLogger(__name__)
 
@@ -20,19 +22,41 @@ class AwBucket(pydantic.BaseModel):
     last_updated: "datetime.datetime"
 
 
+def _get_json(
+    session: "requests.Session | None", url: str, params: Mapping[str, str] | None = None
+) -> Any:
+    # Without a session, every request opens its own connection
+    get = session.get if session is not None else requests.get
+    return get(url=url, params=params).json()
+
+
 def _load_bucket_contents(
-    bucket_id: str, date: "datetime.datetime", base_url: str
+    bucket_id: str,
+    base_url: str,
+    start: "datetime.datetime",
+    end: "datetime.datetime | None" = None,
+    session: "requests.Session | None" = None,
 ) -> Sequence[Mapping[str, Any]]:
-    params = {"bucket_id": bucket_id, "start": date.strftime("%Y-%m-%d")}
-    url = f"{base_url}0/buckets/{bucket_id}/events"
-    response = requests.get(url=url, params=params).json()
-    return response
+    params = {"bucket_id": bucket_id, "start": start.isoformat()}
+    if end is not None:
+        params["end"] = end.isoformat()
+    return _get_json(session, f"{base_url}0/buckets/{bucket_id}/events", params)
+
+
+def _start_of_day(date: "datetime.datetime") -> "datetime.datetime":
+    return datetime.datetime.combine(date.date(), datetime.time(), tzinfo=date.tzinfo)
+
+
+def _record_end(record: Mapping[str, Any]) -> "datetime.datetime":
+    return datetime.datetime.fromisoformat(record["timestamp"]) + datetime.timedelta(
+        seconds=record["duration"]
+    )
 
 
 def load_window_titles(
     bucket_id: str, date: "datetime.datetime", base_url: str = "http://localhost:5600/api/"
 ) -> Sequence[WindowTitleEvent]:
-    response = _load_bucket_contents(bucket_id, date, base_url)
+    response = _load_bucket_contents(bucket_id, base_url, start=_start_of_day(date))
     events = [
         WindowTitleEvent(
             app=e["data"]["app"],
@@ -48,7 +72,7 @@ def load_window_titles(
 def load_url_events(
     bucket_id: str, date: "datetime.datetime", base_url: str = "http://localhost:5600/api/"
 ) -> Sequence[URLEvent]:
-    response = _load_bucket_contents(bucket_id, date, base_url)
+    response = _load_bucket_contents(bucket_id, base_url, start=_start_of_day(date))
     events = [
         URLEvent(
             url=e["data"]["url"],
@@ -71,8 +95,10 @@ def _initialise_bucket_loader(
             return partial(load_url_events, bucket.id, date)
 
 
-def load_all_events(date: "datetime.datetime", base_url: str) -> Sequence[SourceEvent]:
-    bucket_data = requests.get(f"{base_url}0/buckets").json()
+def _load_supported_buckets(
+    base_url: str, session: "requests.Session | None" = None
+) -> Sequence[AwBucket]:
+    bucket_data = _get_json(session, f"{base_url}0/buckets")
 
     supported_buckets: Sequence[Mapping[str, Any]] = []
     for b in bucket_data.values():
@@ -81,8 +107,90 @@ def load_all_events(date: "datetime.datetime", base_url: str) -> Sequence[Source
             continue
         supported_buckets.append(b)
 
-    buckets = [AwBucket(**b) for b in supported_buckets]
+    return [AwBucket(**b) for b in supported_buckets]
+
+
+def load_all_events(date: "datetime.datetime", base_url: str) -> Sequence[SourceEvent]:
+    buckets = _load_supported_buckets(base_url)
     loaders = [_initialise_bucket_loader(bucket=b, date=date) for b in buckets]
     events = [event for loader in loaders for event in loader()]
 
     return sorted(events, key=lambda e: e.start)
+
+
+_bucket_kinds = {"currentwindow": EventKind.WINDOW, "web.tab.current": EventKind.URL}
+
+
+@dataclass(frozen=True)
+class _LoadedBucket:
+    last_updated: "datetime.datetime"
+    start: "datetime.datetime"
+    # Start of the window the records were fetched for
+    records: Sequence[Mapping[str, Any]]
+
+    def trimmed(self, start: "datetime.datetime") -> "_LoadedBucket":
+        """Drop the records which ended before a later window start."""
+        return _LoadedBucket(
+            self.last_updated,
+            start=start,
+            records=[r for r in self.records if _record_end(r) > start],
+        )
+
+
+@dataclass
+class BucketWatcher:
+    """Event source which only refetches the buckets updated since it last loaded them.
+
+    Polling costs a single request for the bucket list, so idle watch cycles stay cheap. As the
+    window slides forward, unchanged buckets are trimmed instead of refetched.
+
+    Watchers may share a requests session, so they share its connection pool.
+    """
+
+    base_url: str
+    session: "requests.Session | None" = None
+    _buckets: Sequence[AwBucket] | None = field(default=None, init=False)
+    # From the latest poll, reused by the next load
+    _loaded: dict[str, _LoadedBucket] = field(default_factory=dict, init=False)
+    _kinds: dict[str, EventKind] = field(default_factory=dict, init=False)
+
+    def _is_updated(self, bucket: AwBucket) -> bool:
+        loaded = self._loaded.get(bucket.id)
+        return loaded is None or loaded.last_updated != bucket.last_updated
+
+    def poll(self) -> bool:
+        """Whether any bucket changed, appeared or disappeared since the last load."""
+        self._buckets = _load_supported_buckets(self.base_url, self.session)
+        return any(self._is_updated(b) for b in self._buckets) or {
+            b.id for b in self._buckets
+        } != set(self._loaded)
+
+    def __call__(self, start: "datetime.datetime", end: "datetime.datetime") -> EventColumns:
+        buckets = (
+            self._buckets
+            if self._buckets is not None
+            else _load_supported_buckets(self.base_url, self.session)
+        )
+        self._buckets = None
+
+        loaded: dict[str, _LoadedBucket] = {}
+        n_fetched = 0
+        for b in buckets:
+            previous = self._loaded.get(b.id)
+            if self._is_updated(b) or previous is None or previous.start > start:
+                records = _load_bucket_contents(
+                    b.id, self.base_url, start=start, end=end, session=self.session
+                )
+                loaded[b.id] = _LoadedBucket(b.last_updated, start=start, records=records)
+                n_fetched += 1
+            else:
+                loaded[b.id] = previous.trimmed(start)
+        log.info(f"Fetched {n_fetched} of {len(buckets)} buckets, the rest were unchanged")
+        # Buckets which disappeared are dropped, so their records are not kept alive
+        self._loaded = loaded
+        self._kinds = {b.id: _bucket_kinds[b.type] for b in buckets}
+        return EventColumns.from_records(self.last_records())
+
+    def last_records(self) -> Sequence[tuple[EventKind, Sequence[Mapping[str, Any]]]]:
+        """The raw records of every bucket, as of the last load."""
+        return [(self._kinds[i], loaded.records) for i, loaded in self._loaded.items()]
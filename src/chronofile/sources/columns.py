@@ -0,0 +1,149 @@
+import datetime
+from array import array
+from collections.abc import Sequence
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, Mapping, overload
+
+from chronofile.event import URLEvent, WindowTitleEvent
+
+if TYPE_CHECKING:
+    from chronofile.commands.hydration import IndexedEvent
+    from chronofile.config import CompiledRules
+    from chronofile.event import SourceEvent
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+class EventKind(IntEnum):
+    WINDOW = 0
+    URL = 1
+
+
+def _to_microseconds(timestamp: str) -> int:
+    return (datetime.datetime.fromisoformat(timestamp) - _EPOCH) // _MICROSECOND
+
+
+@dataclass(frozen=True)
+class EventColumns(Sequence["SourceEvent"]):
+    """Source events as parallel arrays, so filters can run before any event objects exist.
+
+    Strings are interned, so e.g. all events from one app share a single code. Indexing
+    materialises a single event, so the columns can be used wherever source events are.
+    """
+
+    kinds: "array[int]"
+    starts: "array[int]"
+    # Microseconds since the epoch
+    durations: "array[float]"
+    # Seconds
+    labels: "array[int]"
+    # App for window events, URL for URL events
+    titles: "array[int]"
+    strings: Sequence[str]
+
+    @staticmethod
+    def from_records(
+        batches: Iterable[tuple[EventKind, Sequence[Mapping[str, Any]]]],
+    ) -> "EventColumns":
+        """Parse ActivityWatch records from several buckets into columns sorted by start."""
+        codes: dict[str, int] = {}
+        kinds: list[int] = []
+        starts: list[int] = []
+        durations: list[float] = []
+        labels: list[int] = []
+        titles: list[int] = []
+
+        for kind, records in batches:
+            label_key = "app" if kind == EventKind.WINDOW else "url"
+            for record in records:
+                data = record["data"]
+                kinds.append(kind)
+                starts.append(_to_microseconds(record["timestamp"]))
+                durations.append(record["duration"])
+                labels.append(codes.setdefault(data[label_key], len(codes)))
+                titles.append(codes.setdefault(data["title"], len(codes)))
+
+        # Stable, so events with equal starts keep their bucket order
+        order = sorted(range(len(starts)), key=starts.__getitem__)
+        return EventColumns(
+            kinds=array("B", (kinds[i] for i in order)),
+            starts=array("q", (starts[i] for i in order)),
+            durations=array("d", (durations[i] for i in order)),
+            labels=array("L", (labels[i] for i in order)),
+            titles=array("L", (titles[i] for i in order)),
+            strings=list(codes),
+        )
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @overload
+    def __getitem__(self, index: int) -> "SourceEvent":
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> Sequence["SourceEvent"]:
+        ...
+
+    def __getitem__(self, index: int | slice) -> "SourceEvent | Sequence[SourceEvent]":
+        if isinstance(index, slice):
+            return self.materialize(range(len(self))[index])
+        return self._event(index)
+
+    def _event(self, i: int) -> "SourceEvent":
+        start = _EPOCH + self.starts[i] * _MICROSECOND
+        duration = datetime.timedelta(seconds=self.durations[i])
+        label, title = self.strings[self.labels[i]], self.strings[self.titles[i]]
+        # Values were parsed from the records already, so skip validation
+        if self.kinds[i] == EventKind.WINDOW:
+            return WindowTitleEvent.model_construct(
+                app=label, window_title=title, start=start, duration=duration
+            )
+        return URLEvent.model_construct(url=label, url_title=title, start=start, duration=duration)
+
+    def materialize(self, indices: Iterable[int]) -> Sequence["SourceEvent"]:
+        return [self._event(i) for i in indices]
+
+    def iter_indexed(self, indices: Iterable[int]) -> Iterator["IndexedEvent"]:
+        """Build events one at a time, each paired with its row, in start order if the indices
+        are ascending.
+        """
+        return ((i, self._event(i)) for i in indices)
+
+    def span(self) -> tuple["datetime.datetime", "datetime.datetime"] | None:
+        """From the earliest start to the latest end, without materialising any events.
+
+        None if there are no events.
+        """
+        if len(self) == 0:
+            return None
+        end = max(s + d * 1e6 for s, d in zip(self.starts, self.durations))
+        return _EPOCH + self.starts[0] * _MICROSECOND, _EPOCH + round(end) * _MICROSECOND
+
+    def prefilter(self, rules: "CompiledRules") -> Sequence[int]:
+        """Indices of events which survive the min_duration and exclude_apps filters.
+
+        Events which take part in browser overlap resolution are always kept, since they
+        clip each other before filtering.
+        """
+        min_seconds = rules.min_duration.total_seconds()
+        window_apps = {
+            self.labels[i] for i in range(len(self)) if self.kinds[i] == EventKind.WINDOW
+        }
+        excluded = {code for code in window_apps if rules.excludes_app(self.strings[code])}
+        browsers = (
+            {code for code in window_apps if rules.is_browser(self.strings[code])}
+            if len(rules.browser_apps) > 0
+            else set()
+        )
+
+        kept: list[int] = []
+        for i, (kind, duration, label) in enumerate(zip(self.kinds, self.durations, self.labels)):
+            if kind == EventKind.WINDOW:
+                if label in browsers or (duration > min_seconds and label not in excluded):
+                    kept.append(i)
+            elif len(rules.browser_apps) > 0 or duration > min_seconds:
+                kept.append(i)
+        return kept
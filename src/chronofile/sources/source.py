@@ -1,9 +1,23 @@
-from typing import TYPE_CHECKING, Protocol, Sequence
+from typing import TYPE_CHECKING, Protocol, Sequence, runtime_checkable
 
 if TYPE_CHECKING:
+    import datetime
+
     from chronofile.event import SourceEvent
 
 
 class EventSource(Protocol):
-    def __call__(self) -> Sequence["SourceEvent"]:
+    """Loads the source events between start and end, sorted by start."""
+
+    def __call__(
+        self, start: "datetime.datetime", end: "datetime.datetime"
+    ) -> Sequence["SourceEvent"]:
+        ...
+
+
+@runtime_checkable
+class PollingEventSource(EventSource, Protocol):
+    """An event source which can cheaply tell whether it has new events since it last loaded."""
+
+    def poll(self) -> bool:
         ...
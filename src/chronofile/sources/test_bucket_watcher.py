@@ -0,0 +1,121 @@
+import datetime
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Mapping
+
+from chronofile.sources import activitywatch
+
+if TYPE_CHECKING:
+    import pytest
+
+BASE_URL = "http://aw/api/"
+WINDOW_START = datetime.datetime(2023, 1, 1, 9, tzinfo=datetime.timezone.utc)
+WINDOW_END = datetime.datetime(2023, 1, 1, 11, tzinfo=datetime.timezone.utc)
+
+
+@dataclass
+class FakeResponse:
+    body: Any
+
+    def json(self) -> Any:
+        return self.body
+
+
+@dataclass
+class FakeActivityWatch:
+    last_updated: dict[str, str] = field(
+        default_factory=lambda: {
+            "window": "2023-01-01T10:00:00+00:00",
+            "web": "2023-01-01T10:00:00+00:00",
+        }
+    )
+    requests: list[str] = field(default_factory=list)
+    params: list[Mapping[str, str]] = field(default_factory=list)
+
+    def get(self, url: str, params: Mapping[str, str] | None = None) -> FakeResponse:
+        self.requests.append(url)
+        if params is not None:
+            self.params.append(params)
+        if url == f"{BASE_URL}0/buckets":
+            return FakeResponse(
+                {
+                    bucket_id: {
+                        "id": bucket_id,
+                        "created": "2023-01-01T00:00:00+00:00",
+                        "type": "currentwindow" if bucket_id == "window" else "web.tab.current",
+                        "client": "test",
+                        "hostname": "test",
+                        "last_updated": last_updated,
+                    }
+                    for bucket_id, last_updated in self.last_updated.items()
+                }
+            )
+        data = (
+            {"app": "Slack", "title": "general"}
+            if "window" in url
+            else {"url": "https://github.com", "title": "GitHub"}
+        )
+        return FakeResponse(
+            [{"timestamp": self.last_updated["window"], "duration": 60.0, "data": data}]
+        )
+
+
+def test_idle_cycles_only_fetch_the_bucket_list(monkeypatch: "pytest.MonkeyPatch"):
+    aw = FakeActivityWatch()
+    monkeypatch.setattr(activitywatch.requests, "get", aw.get)
+    watcher = activitywatch.BucketWatcher(base_url=BASE_URL)
+
+    assert watcher.poll()
+    assert len(watcher(start=WINDOW_START, end=WINDOW_END)) == 2
+    assert len(aw.requests) == 3
+
+    aw.requests.clear()
+    assert not watcher.poll()
+    assert aw.requests == [f"{BASE_URL}0/buckets"]
+
+
+def test_only_updated_buckets_are_refetched(monkeypatch: "pytest.MonkeyPatch"):
+    aw = FakeActivityWatch()
+    monkeypatch.setattr(activitywatch.requests, "get", aw.get)
+    watcher = activitywatch.BucketWatcher(base_url=BASE_URL)
+    watcher.poll()
+    watcher(start=WINDOW_START, end=WINDOW_END)
+
+    aw.requests.clear()
+    aw.last_updated["window"] = "2023-01-01T10:05:00+00:00"
+    assert watcher.poll()
+    events = watcher(start=WINDOW_START, end=WINDOW_END)
+
+    assert aw.requests == [f"{BASE_URL}0/buckets", f"{BASE_URL}0/buckets/window/events"]
+    # The unchanged URL bucket is served from the previous load
+    assert [e.start.minute for e in events] == [0, 5]
+
+
+def test_buckets_are_fetched_for_the_window(monkeypatch: "pytest.MonkeyPatch"):
+    aw = FakeActivityWatch()
+    monkeypatch.setattr(activitywatch.requests, "get", aw.get)
+    watcher = activitywatch.BucketWatcher(base_url=BASE_URL)
+
+    watcher(start=WINDOW_START, end=WINDOW_END)
+
+    assert {(p["start"], p["end"]) for p in aw.params} == {
+        (WINDOW_START.isoformat(), WINDOW_END.isoformat())
+    }
+
+
+def test_sliding_window_trims_unchanged_buckets(monkeypatch: "pytest.MonkeyPatch"):
+    aw = FakeActivityWatch()
+    monkeypatch.setattr(activitywatch.requests, "get", aw.get)
+    watcher = activitywatch.BucketWatcher(base_url=BASE_URL)
+    watcher(start=WINDOW_START, end=WINDOW_END)
+
+    aw.requests.clear()
+    later = datetime.timedelta(hours=2)
+    events = watcher(start=WINDOW_START + later, end=WINDOW_END + later)
+
+    assert aw.requests == [f"{BASE_URL}0/buckets"]
+    # The records ended before the new window started
+    assert len(events) == 0
+
+    # A wider window needs records which were never fetched
+    watcher(start=WINDOW_START - later, end=WINDOW_END)
+    assert len(aw.requests) == 4
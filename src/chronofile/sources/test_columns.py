@@ -0,0 +1,106 @@
+import datetime
+from typing import TYPE_CHECKING, Sequence
+
+from chronofile.commands.sync_logic import build_timeline, source_window
+from chronofile.config import CompiledRules
+from chronofile.event import URLEvent, WindowTitleEvent
+from chronofile.sources.columns import EventColumns, EventKind
+
+if TYPE_CHECKING:
+    from chronofile.event import ChronofileEvent, Provenance
+
+WINDOW_RECORDS = [
+    {
+        "timestamp": f"2023-01-01T10:{minute:02d}:00.250000+00:00",
+        "duration": duration,
+        "data": {"app": app, "title": title},
+    }
+    for minute, duration, app, title in [
+        (5, 30.5, "Slack", "general"),
+        (1, 0.5, "Slack", "general"),
+        (3, 120.0, "Finder", "Downloads"),
+        (10, 60.0, "Google Chrome", "GitHub"),
+    ]
+]
+URL_RECORDS = [
+    {
+        "timestamp": "2023-01-01T10:10:30+00:00",
+        "duration": 20.0,
+        "data": {"url": "https://github.com", "title": "GitHub"},
+    }
+]
+
+
+def _columns() -> EventColumns:
+    return EventColumns.from_records(
+        [(EventKind.WINDOW, WINDOW_RECORDS), (EventKind.URL, URL_RECORDS)]
+    )
+
+
+def _validated_events() -> list[WindowTitleEvent | URLEvent]:
+    # What the per-event loaders in activitywatch produce
+    events = [
+        WindowTitleEvent(
+            app=e["data"]["app"],
+            window_title=e["data"]["title"],
+            start=e["timestamp"],  # type: ignore
+            duration=e["duration"],  # type: ignore
+        )
+        for e in WINDOW_RECORDS
+    ] + [
+        URLEvent(
+            url=e["data"]["url"],
+            url_title=e["data"]["title"],
+            start=e["timestamp"],  # type: ignore
+            duration=e["duration"],  # type: ignore
+        )
+        for e in URL_RECORDS
+    ]
+    return sorted(events, key=lambda e: e.start)
+
+
+def _rules(browser_apps: list[str]) -> CompiledRules:
+    return CompiledRules.compile(
+        min_duration=datetime.timedelta(seconds=1),
+        merge_gap=datetime.timedelta(0),
+        exclude_titles=[],
+        exclude_apps=["finder"],
+        metadata_enrichment=[],
+        category2emoji={},
+        browser_apps=browser_apps,
+    )
+
+
+def test_columns_materialise_to_validated_events():
+    columns = _columns()
+
+    assert list(columns) == _validated_events()
+    assert columns.strings.count("GitHub") == 1
+    assert source_window(columns) == source_window(_validated_events())
+
+
+def test_prefilter_drops_rows_before_materialising():
+    columns = _columns()
+
+    kept = columns.materialize(columns.prefilter(_rules([])))
+
+    assert [(e.start.minute, e.duration.total_seconds()) for e in kept] == [
+        (5, 30.5),
+        (10, 60.0),
+        (10, 20.0),
+    ]
+
+
+def test_build_timeline_is_identical_for_columns_and_events():
+    def spans(
+        events: Sequence["ChronofileEvent"],
+    ) -> list[tuple[str, datetime.datetime, datetime.datetime, "Provenance | None"]]:
+        # Provenance indexes the pipeline's input, so it matches even though prefiltering
+        # drops rows
+        return [(e.title, e.start, e.end, e.provenance) for e in events]
+
+    for browser_apps in ([], ["chrome"]):
+        rules = _rules(browser_apps)
+        assert spans(build_timeline(_columns(), rules)) == spans(
+            build_timeline(_validated_events(), rules)
+        )
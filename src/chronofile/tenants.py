@@ -0,0 +1,88 @@
+import datetime
+import logging
+import pathlib
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Sequence
+
+import pydantic
+import toml
+
+log = logging.getLogger(__name__)
+
+
+class Tenant(pydantic.BaseModel):
+    """One person synced by a multi-tenant process, with their own config and credentials."""
+
+    name: str
+    config_path: str
+    activitywatch_base_url: str
+    gcal_email: str
+    gcal_client_id: str
+    gcal_client_secret: str
+    gcal_refresh_token: str
+    state_dir: str | None = None
+    # Where the journal and hydration cache are kept. Defaults to .chronofile/<name>.
+
+    @property
+    def state_path(self) -> pathlib.Path:
+        return pathlib.Path(self.state_dir or f".chronofile/{self.name}")
+
+
+def load_tenants(path: str) -> Sequence[Tenant]:
+    """Read the [[tenants]] tables of a TOML file."""
+    tenants = [Tenant(**t) for t in toml.loads(pathlib.Path(path).read_text())["tenants"]]
+    names = [t.name for t in tenants]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Tenant names must be unique, got {names}")
+    return tenants
+
+
+TenantCycle = Callable[[Tenant], datetime.timedelta]
+# Runs one sync cycle for a tenant, and returns how long to wait before its next one
+
+
+def run_tenants(
+    tenants: Sequence[Tenant],
+    cycle: TenantCycle,
+    workers: int,
+    watch: bool,
+    retry_after: datetime.timedelta = datetime.timedelta(minutes=5),
+):
+    """Run tenant cycles on a shared pool of workers, each tenant on its own schedule.
+
+    A failing cycle is logged and retried after retry_after, without affecting other tenants.
+    Without watch, every tenant runs once.
+    """
+    due = {t.name: 0.0 for t in tenants}
+    in_flight: dict[Future[datetime.timedelta], Tenant] = {}
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tenant") as pool:
+        while True:
+            now = time.monotonic()
+            running = {t.name for t in in_flight.values()}
+            for tenant in tenants:
+                if tenant.name in due and due[tenant.name] <= now and tenant.name not in running:
+                    in_flight[pool.submit(cycle, tenant)] = tenant
+
+            if len(in_flight) == 0:
+                if not watch or len(due) == 0:
+                    return
+                time.sleep(max(0.0, min(due.values()) - now))
+                continue
+
+            running = {t.name for t in in_flight.values()}
+            next_due = min((d for n, d in due.items() if n not in running), default=None)
+            timeout = max(0.0, next_due - now) if next_due is not None else None
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                tenant = in_flight.pop(future)
+                try:
+                    interval = future.result()
+                except Exception:
+                    log.exception(f"Sync of tenant {tenant.name} failed")
+                    interval = retry_after
+                if watch:
+                    due[tenant.name] = time.monotonic() + interval.total_seconds()
+                else:
+                    del due[tenant.name]
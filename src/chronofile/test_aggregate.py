@@ -0,0 +1,67 @@
+import datetime
+
+import pytz
+
+from chronofile.aggregate import CategoryReport, CategoryTotal, TimelineColumns, aggregate
+from chronofile.config import RecordCategory
+from chronofile.test_event import FakeParsedEvent
+
+
+def test_aggregate_clips_intervals_to_buckets():
+    timeline = TimelineColumns.from_events(
+        [
+            FakeParsedEvent(
+                start=datetime.datetime(2023, 1, 1, 9, 30, tzinfo=pytz.UTC),
+                end=datetime.datetime(2023, 1, 1, 11, 15, tzinfo=pytz.UTC),
+                category=RecordCategory.PROGRAMMING,
+            ),
+            FakeParsedEvent(
+                start=datetime.datetime(2023, 1, 1, 10, 0, tzinfo=pytz.UTC),
+                end=datetime.datetime(2023, 1, 1, 10, 10, tzinfo=pytz.UTC),
+            ),
+            FakeParsedEvent(
+                start=datetime.datetime(2023, 1, 1, 10, 50, tzinfo=pytz.UTC),
+                end=datetime.datetime(2023, 1, 1, 11, 0, tzinfo=pytz.UTC),
+                category=RecordCategory.PROGRAMMING,
+            ),
+        ]
+    )
+
+    totals = aggregate(timeline, bucket=datetime.timedelta(hours=1))
+
+    assert totals == [
+        CategoryTotal(
+            bucket_start=datetime.datetime(2023, 1, 1, 9, tzinfo=datetime.timezone.utc),
+            category=RecordCategory.PROGRAMMING,
+            duration=datetime.timedelta(minutes=30),
+        ),
+        CategoryTotal(
+            bucket_start=datetime.datetime(2023, 1, 1, 10, tzinfo=datetime.timezone.utc),
+            category=None,
+            duration=datetime.timedelta(minutes=10),
+        ),
+        CategoryTotal(
+            bucket_start=datetime.datetime(2023, 1, 1, 10, tzinfo=datetime.timezone.utc),
+            category=RecordCategory.PROGRAMMING,
+            duration=datetime.timedelta(minutes=70),
+        ),
+        CategoryTotal(
+            bucket_start=datetime.datetime(2023, 1, 1, 11, tzinfo=datetime.timezone.utc),
+            category=RecordCategory.PROGRAMMING,
+            duration=datetime.timedelta(minutes=15),
+        ),
+    ]
+
+
+def test_category_report_as_pipeline_output():
+    report = CategoryReport(bucket=datetime.timedelta(days=1))
+    report(
+        [
+            FakeParsedEvent(
+                start=datetime.datetime(2023, 1, 1, 23, 0, tzinfo=pytz.UTC),
+                end=datetime.datetime(2023, 1, 2, 1, 0, tzinfo=pytz.UTC),
+                category=RecordCategory.READING,
+            )
+        ]
+    )
+    assert [t.duration for t in report.totals] == [datetime.timedelta(hours=1)] * 2
@@ -0,0 +1,19 @@
+from chronofile.benchmark import benchmark_rules, measure_cycle, soak, synthetic_records
+from chronofile.hydration_cache import HydrationCache
+
+
+def test_measure_cycle_reports_every_stage():
+    stages = measure_cycle(synthetic_records(n_events=500, distinct_titles=50), benchmark_rules())
+
+    assert [s.stage for s in stages] == ["ingest", "timeline", "destination", "diff", "plan"]
+    assert all(s.peak >= s.retained for s in stages)
+    assert stages[1].peak > 0
+
+
+def test_soak_memory_plateaus_with_capped_cache():
+    cache = HydrationCache(maxsize=64)
+    retained = soak(cycles=4, n_events=500, distinct_titles=100, cache=cache)
+
+    assert len(cache) == 64
+    # Each cycle sees new titles, so an uncapped cache would grow by about the same each cycle
+    assert retained[-1] - retained[1] < retained[0] / 4
@@ -0,0 +1,144 @@
+import datetime
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterator
+
+import pytest
+
+from chronofile import compaction, diff
+from chronofile.commands.apply import apply_changes
+from chronofile.commands.test_apply import InMemoryDestination, _http_error
+from chronofile.event import DestinationEvent
+from chronofile.journal import Journal
+
+if TYPE_CHECKING:
+    import pathlib
+    from collections.abc import Sequence
+
+START = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+GAP = datetime.timedelta(minutes=10)
+
+
+def _event(id: str, title: str, minute: int, minutes: int) -> DestinationEvent:  # noqa: A002
+    # Padded to the length of the ids chronofile inserts events with
+    return DestinationEvent(
+        id=f"cf{id:0>52}",
+        title=title,
+        start=START + datetime.timedelta(minutes=minute),
+        end=START + datetime.timedelta(minutes=minute + minutes),
+    )
+
+
+def _spans(events: "Sequence[DestinationEvent]") -> list[tuple[str, int, int]]:
+    return sorted(
+        (
+            e.title,
+            (e.start - START) // datetime.timedelta(minutes=1),
+            (e.end - START) // datetime.timedelta(minutes=1),
+        )
+        for e in events
+    )
+
+
+def test_merges_duplicates_and_fragments_across_pages():
+    destination = InMemoryDestination(
+        events={
+            e.id: e
+            for e in [
+                _event("a", "editor", 0, 30),
+                _event("b", "editor", 0, 30),
+                # A duplicate
+                _event("c", "editor", 35, 10),
+                # Within the gap
+                _event("d", "chat", 20, 5),
+                _event("e", "editor", 60, 10),
+                # Beyond the gap
+                _event("f", "sleep", 23 * 60 + 50, 20),
+                _event("g", "sleep", 24 * 60 + 15, 30),
+                # Fragments on either side of a page boundary
+                DestinationEvent(
+                    id="meeting",
+                    title="editor",
+                    start=START + datetime.timedelta(minutes=40),
+                    end=START + datetime.timedelta(minutes=50),
+                ),
+                # The user's own event
+            ]
+        }
+    )
+    stats = compaction.CompactionStats()
+
+    events = compaction.stream_destination(
+        destination, START, START + datetime.timedelta(days=2), page=datetime.timedelta(days=1)
+    )
+    for batch in compaction.batched(compaction.compact(events, GAP, stats), 2):
+        apply_changes(batch, destination)
+
+    assert _spans(list(destination.events.values())) == [
+        ("chat", 20, 25),
+        ("editor", 0, 45),
+        ("editor", 40, 50),
+        ("editor", 60, 70),
+        ("sleep", 23 * 60 + 50, 24 * 60 + 45),
+    ]
+    assert (stats.merged, stats.extended) == (3, 2)
+    assert stats.by_title == {"editor": 2, "sleep": 1}
+
+
+def test_changes_are_emitted_before_the_history_is_read():
+    read = 0
+
+    def history() -> Iterator[DestinationEvent]:
+        nonlocal read
+        for day in range(1_000):
+            for id in ("a", "b"):  # noqa: A001
+                read += 1
+                yield _event(f"{id}{day}", "editor", day * 24 * 60, 30)
+
+    changes = compaction.compact(history(), GAP)
+
+    assert isinstance(next(changes), diff.DeleteEvent)
+    assert read == 2
+
+
+@dataclass
+class FailingUpdatesDestination(InMemoryDestination):
+    failures: int = 0
+
+    def update_event(self, event: DestinationEvent) -> DestinationEvent:
+        if self.failures > 0:
+            self.failures -= 1
+            raise _http_error(500)
+        return super().update_event(event)
+
+
+@pytest.mark.parametrize(
+    ("failures", "given_up", "editor"),
+    [
+        # Retried after its batch
+        (1, 0, ("editor", 0, 45)),
+        # Given up on for this run, without blocking the next batch
+        (2, 1, ("editor", 0, 30)),
+    ],
+)
+def test_failed_changes_do_not_stop_later_batches(
+    tmp_path: "pathlib.Path", failures: int, given_up: int, editor: tuple[str, int, int]
+):
+    destination = FailingUpdatesDestination(
+        failures=failures,
+        events={
+            e.id: e
+            for e in [
+                _event("a", "editor", 0, 30),
+                _event("b", "editor", 35, 10),
+                _event("c", "chat", 200, 10),
+                _event("d", "chat", 215, 10),
+            ]
+        },
+    )
+    journal = Journal(path=str(tmp_path / "journal.jsonl"))
+
+    changes = compaction.compact(list(destination.events.values()), GAP)
+
+    assert compaction.apply_batches(changes, destination, journal, batch_size=2) == given_up
+    assert _spans(list(destination.events.values())) == [("chat", 200, 225), editor]
+    assert journal.load() == []
@@ -0,0 +1,98 @@
+import datetime
+import logging
+import os
+from typing import TYPE_CHECKING
+
+import pytest
+
+from chronofile.config import CompiledRules, Config, RecordCategory, ReloadingConfig
+
+if TYPE_CHECKING:
+    import pathlib
+
+CONFIG = """
+exclude_titles = ["Finder"]
+exclude_apps = ["Chrome"]
+
+[category2emoji]
+Programming = "🤖"
+
+[[metadata_enrichment]]
+title_matcher = ["GitHub"]
+category = "Programming"
+"""
+
+
+def test_compiled_rules_are_lowercased():
+    rules = CompiledRules.compile(
+        min_duration=datetime.timedelta(seconds=5),
+        merge_gap=datetime.timedelta(minutes=15),
+        exclude_titles=["Finder"],
+        exclude_apps=["Chrome"],
+        metadata_enrichment=[],
+        category2emoji={},
+    )
+    assert rules.excludes_title("finder - Downloads")
+    assert rules.excludes_app("Google Chrome")
+    assert not rules.excludes_app("Slack")
+
+
+def test_compiled_rules_hash_is_stable(tmp_path: "pathlib.Path"):
+    path = tmp_path / "config.toml"
+    path.write_text(CONFIG)
+
+    first = CompiledRules.from_config(Config.from_toml(str(path)))
+    second = CompiledRules.from_config(Config.from_toml(str(path)))
+    assert first.content_hash == second.content_hash
+    assert first.matchers[0].patterns == ("github",)
+    assert first.matchers[0].emoji == "🤖"
+    assert first.matchers[0].category == RecordCategory.PROGRAMMING
+
+    path.write_text(CONFIG.replace("GitHub", "GitLab"))
+    changed = CompiledRules.from_config(Config.from_toml(str(path)))
+    assert changed.content_hash != first.content_hash
+
+
+def _touch(path: "pathlib.Path"):
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_reloading_config_only_reloads_on_mtime_change(tmp_path: "pathlib.Path"):
+    path = tmp_path / "config.toml"
+    path.write_text(CONFIG)
+
+    config = ReloadingConfig(str(path))
+    assert config.refresh()
+    rules = config.rules
+    assert not config.refresh()
+    assert config.rules is rules
+
+    path.write_text(CONFIG.replace("GitHub", "GitLab"))
+    _touch(path)
+    assert config.refresh()
+    assert config.rules.content_hash != rules.content_hash
+
+
+@pytest.mark.parametrize(
+    "broken",
+    [CONFIG.replace('["Finder"]', '["Finder"'), CONFIG.replace("Programming", "Unknown category")],
+    ids=["Invalid toml", "Invalid value"],
+)
+def test_broken_config_keeps_the_previous_one(
+    tmp_path: "pathlib.Path", caplog: pytest.LogCaptureFixture, broken: str
+):
+    path = tmp_path / "config.toml"
+    path.write_text(CONFIG)
+    config = ReloadingConfig(str(path))
+    rules = config.rules
+
+    path.write_text(broken)
+    _touch(path)
+    with caplog.at_level(logging.ERROR):
+        assert not config.refresh()
+        assert not config.refresh()
+
+    assert config.rules is rules
+    # Logged once, since the broken file is not re-read until it changes
+    assert len(caplog.records) == 1
@@ -6,7 +6,8 @@ import pytest
 import pytz
 
 from chronofile import diff
-from chronofile.diff import EventChange, NewEvent, UpdateEvent
+from chronofile.diff import DeleteEvent, EventChange, NewEvent, UpdateEvent
+from chronofile.event import deterministic_id
 from chronofile.test_event import FakeDestinationEvent, FakeParsedEvent
 
 if TYPE_CHECKING:
@@ -60,7 +61,7 @@ class ChangesetExample:
             then=[NewEvent(FakeParsedEvent())],
         ),
         ChangesetExample(
-            "Multiple existing events that match, updates final event by end time",
+            "Multiple existing events that match, updates final event and deletes the rest",
             parsed_events=[
                 FakeParsedEvent(end=datetime.datetime(2024, 1, 1, 0, 0, tzinfo=pytz.UTC))
             ],
@@ -75,8 +76,180 @@ class ChangesetExample:
                     FakeDestinationEvent(
                         end=datetime.datetime(2024, 1, 1, 0, 0, tzinfo=pytz.UTC), id="1"
                     )
+                ),
+                DeleteEvent(FakeDestinationEvent(id="0")),
+            ],
+        ),
+        ChangesetExample(
+            "Merged span claims overlapping fragments with the same title",
+            parsed_events=[
+                FakeParsedEvent(
+                    start=datetime.datetime(2023, 1, 1, 0, 0, tzinfo=pytz.UTC),
+                    end=datetime.datetime(2023, 1, 1, 2, 0, tzinfo=pytz.UTC),
                 )
             ],
+            destination_events=[
+                FakeDestinationEvent(
+                    id="0",
+                    start=datetime.datetime(2023, 1, 1, 0, 0, tzinfo=pytz.UTC),
+                    end=datetime.datetime(2023, 1, 1, 0, 30, tzinfo=pytz.UTC),
+                ),
+                FakeDestinationEvent(
+                    id="1",
+                    start=datetime.datetime(2023, 1, 1, 1, 0, tzinfo=pytz.UTC),
+                    end=datetime.datetime(2023, 1, 1, 2, 0, tzinfo=pytz.UTC),
+                ),
+                FakeDestinationEvent(
+                    id="2",
+                    title="other title",
+                    start=datetime.datetime(2023, 1, 1, 1, 0, tzinfo=pytz.UTC),
+                    end=datetime.datetime(2023, 1, 1, 2, 0, tzinfo=pytz.UTC),
+                ),
+            ],
+            then=[
+                UpdateEvent(
+                    FakeDestinationEvent(
+                        id="0",
+                        start=datetime.datetime(2023, 1, 1, 0, 0, tzinfo=pytz.UTC),
+                        end=datetime.datetime(2023, 1, 1, 2, 0, tzinfo=pytz.UTC),
+                    )
+                ),
+                DeleteEvent(
+                    FakeDestinationEvent(
+                        id="1",
+                        start=datetime.datetime(2023, 1, 1, 1, 0, tzinfo=pytz.UTC),
+                        end=datetime.datetime(2023, 1, 1, 2, 0, tzinfo=pytz.UTC),
+                    )
+                ),
+            ],
+        ),
+        ChangesetExample(
+            "Overlapping event with an earlier start grows to cover the span",
+            parsed_events=[
+                FakeParsedEvent(
+                    start=datetime.datetime(2023, 1, 1, 1, 0, tzinfo=pytz.UTC),
+                    end=datetime.datetime(2023, 1, 1, 2, 0, tzinfo=pytz.UTC),
+                )
+            ],
+            destination_events=[
+                FakeDestinationEvent(
+                    start=datetime.datetime(2022, 12, 31, 23, 0, tzinfo=pytz.UTC),
+                    end=datetime.datetime(2023, 1, 1, 1, 10, tzinfo=pytz.UTC),
+                )
+            ],
+            then=[
+                UpdateEvent(
+                    FakeDestinationEvent(
+                        start=datetime.datetime(2022, 12, 31, 23, 0, tzinfo=pytz.UTC),
+                        end=datetime.datetime(2023, 1, 1, 2, 0, tzinfo=pytz.UTC),
+                    )
+                )
+            ],
+        ),
+        ChangesetExample(
+            "Span within a longer stored event leaves it as it is",
+            parsed_events=[
+                FakeParsedEvent(
+                    start=datetime.datetime(2023, 1, 1, 1, 0, tzinfo=pytz.UTC),
+                    end=datetime.datetime(2023, 1, 1, 2, 0, tzinfo=pytz.UTC),
+                )
+            ],
+            destination_events=[
+                FakeDestinationEvent(
+                    start=datetime.datetime(2023, 1, 1, 0, 0, tzinfo=pytz.UTC),
+                    end=datetime.datetime(2023, 1, 1, 3, 0, tzinfo=pytz.UTC),
+                )
+            ],
+            then=[],
+        ),
+        ChangesetExample(
+            "Fragments claimed by one span are not claimed again",
+            parsed_events=[
+                FakeParsedEvent(
+                    start=datetime.datetime(2023, 1, 1, 0, 0, tzinfo=pytz.UTC),
+                    end=datetime.datetime(2023, 1, 1, 1, 0, tzinfo=pytz.UTC),
+                ),
+                FakeParsedEvent(
+                    start=datetime.datetime(2023, 1, 1, 1, 0, tzinfo=pytz.UTC),
+                    end=datetime.datetime(2023, 1, 1, 2, 0, tzinfo=pytz.UTC),
+                ),
+            ],
+            destination_events=[
+                FakeDestinationEvent(
+                    start=datetime.datetime(2023, 1, 1, 0, 0, tzinfo=pytz.UTC),
+                    end=datetime.datetime(2023, 1, 1, 1, 0, tzinfo=pytz.UTC),
+                )
+            ],
+            then=[
+                NewEvent(
+                    FakeParsedEvent(
+                        start=datetime.datetime(2023, 1, 1, 1, 0, tzinfo=pytz.UTC),
+                        end=datetime.datetime(2023, 1, 1, 2, 0, tzinfo=pytz.UTC),
+                    )
+                )
+            ],
+        ),
+        ChangesetExample(
+            "Fragments which only touch the span are not claimed",
+            parsed_events=[
+                FakeParsedEvent(
+                    start=datetime.datetime(2023, 1, 1, 1, 0, tzinfo=pytz.UTC),
+                    end=datetime.datetime(2023, 1, 1, 2, 0, tzinfo=pytz.UTC),
+                )
+            ],
+            destination_events=[
+                FakeDestinationEvent(
+                    id="before",
+                    start=datetime.datetime(2023, 1, 1, 0, 0, tzinfo=pytz.UTC),
+                    end=datetime.datetime(2023, 1, 1, 1, 0, tzinfo=pytz.UTC),
+                ),
+                FakeDestinationEvent(
+                    id="span",
+                    start=datetime.datetime(2023, 1, 1, 1, 0, tzinfo=pytz.UTC),
+                    end=datetime.datetime(2023, 1, 1, 2, 0, tzinfo=pytz.UTC),
+                ),
+                FakeDestinationEvent(
+                    id="after",
+                    start=datetime.datetime(2023, 1, 1, 2, 0, tzinfo=pytz.UTC),
+                    end=datetime.datetime(2023, 1, 1, 3, 0, tzinfo=pytz.UTC),
+                ),
+            ],
+            then=[],
+        ),
+        ChangesetExample(
+            "Event inserted with a deterministic id is kept over other events",
+            parsed_events=[
+                FakeParsedEvent(
+                    start=datetime.datetime(2023, 1, 1, 0, 0, tzinfo=pytz.UTC),
+                    end=datetime.datetime(2023, 1, 1, 1, 0, tzinfo=pytz.UTC),
+                )
+            ],
+            destination_events=[
+                FakeDestinationEvent(
+                    start=datetime.datetime(2023, 1, 1, 0, 0, tzinfo=pytz.UTC),
+                    end=datetime.datetime(2023, 1, 1, 0, 30, tzinfo=pytz.UTC),
+                    id=deterministic_id(FakeParsedEvent()),
+                ),
+                FakeDestinationEvent(
+                    start=datetime.datetime(2023, 1, 1, 0, 0, tzinfo=pytz.UTC),
+                    end=datetime.datetime(2023, 1, 1, 0, 30, tzinfo=pytz.UTC),
+                ),
+            ],
+            then=[
+                UpdateEvent(
+                    FakeDestinationEvent(
+                        start=datetime.datetime(2023, 1, 1, 0, 0, tzinfo=pytz.UTC),
+                        end=datetime.datetime(2023, 1, 1, 1, 0, tzinfo=pytz.UTC),
+                        id=deterministic_id(FakeParsedEvent()),
+                    )
+                ),
+                DeleteEvent(
+                    FakeDestinationEvent(
+                        start=datetime.datetime(2023, 1, 1, 0, 0, tzinfo=pytz.UTC),
+                        end=datetime.datetime(2023, 1, 1, 0, 30, tzinfo=pytz.UTC),
+                    )
+                ),
+            ],
         ),
     ],
     ids=lambda e: e.intention,
@@ -85,5 +258,32 @@ def test_changeset(e: ChangesetExample):
     assert e.then == diff.diff(e.parsed_events, e.destination_events)
 
 
+def _at(second: int) -> datetime.datetime:
+    return datetime.datetime(2023, 1, 1, tzinfo=pytz.UTC) + datetime.timedelta(seconds=second)
+
+
+def test_drift_within_tolerance_is_not_a_change():
+    tolerance = datetime.timedelta(seconds=2)
+    destination = [
+        FakeDestinationEvent(id="short", start=_at(0), end=_at(1)),
+        FakeDestinationEvent(id="long", title="other", start=_at(0), end=_at(600)),
+    ]
+
+    drifted = [
+        # No longer overlaps the destination event
+        FakeParsedEvent(start=_at(2), end=_at(3)),
+        FakeParsedEvent(title="other", start=_at(1), end=_at(602)),
+    ]
+    assert diff.diff(drifted, destination, tolerance, tolerance) == []
+
+    # Without tolerance, the short event is inserted again and its stale copy left behind
+    assert diff.diff(drifted, destination)[0] == NewEvent(drifted[0])
+
+    moved = [FakeParsedEvent(title="other", start=_at(1), end=_at(660))]
+    assert diff.diff(moved, destination, tolerance, tolerance) == [
+        UpdateEvent(FakeDestinationEvent(id="long", title="other", start=_at(0), end=_at(660)))
+    ]
+
+
 if __name__ == "__main__":
     pass
@@ -4,14 +4,21 @@ from dataclasses import dataclass
 import pytest
 import pytz
 
-from chronofile.event import ChronofileEvent, DestinationEvent, SourceEvent, URLEvent, _parse_event
+from chronofile.event import (
+    ChronofileEvent,
+    DestinationEvent,
+    SourceEvent,
+    URLEvent,
+    _parse_event,
+    deterministic_id,
+    has_deterministic_id,
+)
 
 
 class FakeParsedEvent(ChronofileEvent):
     title: str = "fake title"
     start: datetime.datetime = datetime.datetime(2023, 1, 1, 0, 0, tzinfo=datetime.timezone.utc)
     end: datetime.datetime = datetime.datetime(2023, 1, 1, 0, 0, tzinfo=datetime.timezone.utc)
-    source_event: SourceEvent | None = None
 
     def __post_init__(self):
         self.start = self.start.astimezone(pytz.UTC)
@@ -23,7 +30,6 @@ class FakeDestinationEvent(DestinationEvent):
     start: datetime.datetime = datetime.datetime(2023, 1, 1, 0, 0, tzinfo=datetime.timezone.utc)
     end: datetime.datetime = datetime.datetime(2023, 1, 1, 0, 0, tzinfo=datetime.timezone.utc)
     id: str = "0"
-    source_event: "SourceEvent | None" = None
 
 
 @dataclass
@@ -65,3 +71,19 @@ class PEx:
 )
 def test_parse_event_titles(ex: PEx):
     assert ex.then.title == _parse_event(ex.given).title
+
+
+def test_deterministic_id_is_calendar_valid_and_stable_while_growing():
+    event = FakeParsedEvent(title="Slack")
+    grown = event.model_copy(update={"end": event.end + datetime.timedelta(hours=1)})
+    later = event.model_copy(update={"start": event.start + datetime.timedelta(seconds=1)})
+
+    event_id = deterministic_id(event)
+
+    # Calendar ids use the base32hex alphabet, and are 5 to 1024 characters long
+    assert set(event_id) <= set("0123456789abcdefghijklmnopqrstuv")
+    assert 5 <= len(event_id) <= 1024
+    assert deterministic_id(grown) == event_id
+    assert deterministic_id(later) != event_id
+    assert has_deterministic_id(FakeDestinationEvent(id=event_id))
+    assert not has_deterministic_id(FakeDestinationEvent(id="0"))
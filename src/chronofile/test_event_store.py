@@ -0,0 +1,117 @@
+import datetime
+import pathlib
+import sqlite3
+from typing import TYPE_CHECKING
+
+import pytest
+from typer.testing import CliRunner
+
+from chronofile.config import RecordCategory
+from chronofile.event import ChronofileEvent
+from chronofile.event_store import EventStore
+from chronofile.main import app
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+START = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _event(
+    title: str, minute: int, minutes: int, category: RecordCategory | None = None
+) -> ChronofileEvent:
+    return ChronofileEvent(
+        title=title,
+        start=START + datetime.timedelta(minutes=minute),
+        end=START + datetime.timedelta(minutes=minute + minutes),
+        category=category,
+    )
+
+
+def _spans(events: "Sequence[ChronofileEvent]") -> list[tuple[str, int, int]]:
+    return [
+        (
+            e.title,
+            (e.start - START) // datetime.timedelta(minutes=1),
+            (e.end - START) // datetime.timedelta(minutes=1),
+        )
+        for e in events
+    ]
+
+
+def test_range_category_and_title_lookups():
+    store = EventStore(path=":memory:")
+    store(
+        [
+            _event("editor", 0, 60, RecordCategory.PROGRAMMING),
+            _event("chat", 60, 30, RecordCategory.COMMUNICATING),
+            _event("editor", 120, 30, RecordCategory.PROGRAMMING),
+        ]
+    )
+    day = START + datetime.timedelta(days=1)
+
+    # The first event started before the range, but overlaps it
+    assert _spans(store.query(START + datetime.timedelta(minutes=30), day)) == [
+        ("editor", 0, 60),
+        ("chat", 60, 90),
+        ("editor", 120, 150),
+    ]
+    assert _spans(store.query(START, day, category=RecordCategory.COMMUNICATING)) == [
+        ("chat", 60, 90)
+    ]
+    assert len(store.query(START, day, title="editor")) == 2
+
+    totals = store.totals(START + datetime.timedelta(minutes=30), day)
+    assert [(t.category, t.duration) for t in totals] == [
+        (RecordCategory.COMMUNICATING, datetime.timedelta(minutes=30)),
+        (RecordCategory.PROGRAMMING, datetime.timedelta(minutes=60)),
+    ]
+
+
+def test_later_cycles_replace_the_period_they_cover():
+    store = EventStore(path=":memory:")
+    store([_event("editor", 0, 20), _event("editor", 30, 10)])
+
+    # The next cycle starts mid-way through the first event, and merged the rest differently
+    store([_event("editor", 10, 40)])
+
+    assert _spans(store.query(START, START + datetime.timedelta(days=1))) == [
+        ("editor", 0, 10),
+        ("editor", 10, 50),
+    ]
+
+
+def test_store_is_closed_when_leaving_its_block_on_an_error():
+    with pytest.raises(KeyboardInterrupt), EventStore(path=":memory:") as store:
+        raise KeyboardInterrupt
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        store.query(START, START + datetime.timedelta(hours=1))
+
+
+def test_query_command(tmp_path: "pathlib.Path"):
+    store_path = tmp_path / "events.sqlite3"
+    config_path = tmp_path / "config.toml"
+    # The repo's example config, with a store
+    config_path.write_text(
+        f'event_store_path = "{store_path}"\n'
+        + (pathlib.Path(__file__).parents[2] / "config.toml").read_text()
+    )
+    with EventStore(path=str(store_path)) as store:
+        store([_event("editor", 0, 60, RecordCategory.PROGRAMMING)])
+
+    result = CliRunner().invoke(
+        app,
+        [
+            "query",
+            "2022-12-31T00:00:00",
+            "2023-01-02T00:00:00",
+            "--config-path",
+            str(config_path),
+            "--totals",
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "Programming" in result.output
+    assert "1h 00m" in result.output
@@ -0,0 +1,112 @@
+import datetime
+from typing import TYPE_CHECKING
+
+from chronofile.config import CompiledRules, RecordCategory, RecordMetadata
+from chronofile.event import Provenance, URLEvent, WindowTitleEvent, hydrate_event
+from chronofile.hydration_cache import HydrationCache
+
+if TYPE_CHECKING:
+    import pathlib
+
+START = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _rules(emoji: str = "🤖") -> CompiledRules:
+    return CompiledRules.compile(
+        min_duration=datetime.timedelta(0),
+        merge_gap=datetime.timedelta(0),
+        exclude_titles=[],
+        exclude_apps=[],
+        metadata_enrichment=[
+            RecordMetadata(title_matcher=["github"], category=RecordCategory.PROGRAMMING)
+        ],
+        category2emoji={RecordCategory.PROGRAMMING: emoji},
+    )
+
+
+def _events(n: int) -> list[WindowTitleEvent | URLEvent]:
+    return [
+        URLEvent(
+            url=f"https://github.com/owner/repo{i % 3}",
+            url_title="",
+            start=START + datetime.timedelta(minutes=i),
+            duration=datetime.timedelta(minutes=1),
+        )
+        if i % 2
+        else WindowTitleEvent(
+            app="Slack",
+            window_title=f"Window {i % 4}",
+            start=START + datetime.timedelta(minutes=i),
+            duration=datetime.timedelta(minutes=1),
+        )
+        for i in range(n)
+    ]
+
+
+def test_cached_hydration_equals_uncached():
+    rules = _rules()
+    cache = HydrationCache()
+
+    for i, event in enumerate(_events(40)):
+        provenance = Provenance(first=i, last=i)
+        assert cache.hydrate(event, rules, provenance) == hydrate_event(event, rules, provenance)
+
+    assert cache.misses == 5
+    assert cache.hits == 35
+
+
+def test_cache_is_bounded_and_evicts_least_recently_used():
+    rules = _rules()
+    cache = HydrationCache(maxsize=2)
+    a, b, c = (
+        WindowTitleEvent(
+            app="Slack", window_title=title, start=START, duration=datetime.timedelta(1)
+        )
+        for title in ("a", "b", "c")
+    )
+
+    cache.hydrate(a, rules)
+    cache.hydrate(b, rules)
+    cache.hydrate(a, rules)
+    cache.hydrate(c, rules)  # Evicts b
+    cache.hydrate(a, rules)
+    cache.hydrate(b, rules)
+
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_changed_rules_do_not_reuse_entries():
+    cache = HydrationCache()
+    event = _events(2)[1]
+
+    assert cache.hydrate(event, _rules("🤖")).title.startswith("🤖")
+    assert cache.hydrate(event, _rules("💻")).title.startswith("💻")
+    assert cache.misses == 2
+
+
+def test_cache_round_trips_through_disk(tmp_path: "pathlib.Path"):
+    rules = _rules()
+    path = str(tmp_path / "cache" / "hydration.json")
+    events = _events(10)
+
+    cache = HydrationCache(path=path)
+    for event in events:
+        cache.hydrate(event, rules)
+    cache.save()
+
+    reloaded = HydrationCache(path=path)
+    assert [reloaded.hydrate(e, rules) for e in events] == [cache.hydrate(e, rules) for e in events]
+    assert reloaded.misses == 0
+
+
+def test_cap_applies_to_persisted_entries(tmp_path: "pathlib.Path"):
+    rules = _rules()
+    path = str(tmp_path / "hydration.json")
+    cache = HydrationCache(path=path)
+    for event in _events(10):
+        cache.hydrate(event, rules)
+    cache.save()
+
+    assert len(HydrationCache(maxsize=2, path=path)) == 2
+    assert len(HydrationCache(maxsize=0, path=path)) == 0
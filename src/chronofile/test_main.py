@@ -0,0 +1,173 @@
+import datetime
+import itertools
+import os
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Sequence
+
+import pytest
+
+from chronofile.commands import hydration
+from chronofile.commands.apply import Deadline
+from chronofile.commands.test_apply import InMemoryDestination
+from chronofile.config import ReloadingConfig
+from chronofile.event import DestinationEvent, WindowTitleEvent
+from chronofile.hydration_cache import HydrationCache
+from chronofile.main import _CycleState, _sync_once
+
+if TYPE_CHECKING:
+    import pathlib
+
+    from chronofile.event import SourceEvent
+
+
+@dataclass
+class FixedSource:
+    """A polling source with a fixed set of events, which only reports changes when told to."""
+
+    events: Sequence["SourceEvent"] = field(default_factory=list)
+    changed: bool = False
+
+    def poll(self) -> bool:
+        return self.changed
+
+    def __call__(self, start: datetime.datetime, end: datetime.datetime) -> Sequence["SourceEvent"]:
+        return [e for e in self.events if start <= e.start < end]
+
+
+@dataclass
+class FlakyDestination(InMemoryDestination):
+    fail_fetches: int = 0
+
+    def get_events(
+        self, start: datetime.datetime, end: datetime.datetime
+    ) -> Sequence[DestinationEvent]:
+        if self.fail_fetches > 0:
+            self.fail_fetches -= 1
+            raise ConnectionError("Calendar is down")
+        return super().get_events(start, end)
+
+
+def _event(hours_ago: int) -> WindowTitleEvent:
+    return WindowTitleEvent(
+        app="editor",
+        window_title=f"file {hours_ago}",
+        start=datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=hours_ago),
+        duration=datetime.timedelta(minutes=30),
+    )
+
+
+def _source(count: int) -> FixedSource:
+    return FixedSource(events=[_event(count - i) for i in range(count)])
+
+
+def _config(tmp_path: "pathlib.Path") -> ReloadingConfig:
+    path = tmp_path / "config.toml"
+    path.write_text(
+        f'journal_path = "{tmp_path / "journal.jsonl"}"\n'
+        "exclude_titles = []\n"
+        "metadata_enrichment = []\n"
+        "[category2emoji]\n"
+    )
+    return ReloadingConfig(str(path))
+
+
+def _cycle(
+    config: ReloadingConfig,
+    source: FixedSource,
+    destination: InMemoryDestination,
+    state: _CycleState,
+    workers: int | None = None,
+) -> int | None:
+    return _sync_once(
+        config=config,
+        event_sources=[source],
+        destination_client=destination,
+        dry_run=False,
+        outputs=[],
+        cache=HydrationCache(),
+        state=state,
+        workers=workers,
+    )
+
+
+def test_idle_cycles_are_skipped_until_the_config_changes(tmp_path: "pathlib.Path"):
+    config = _config(tmp_path)
+    source, destination, state = _source(3), InMemoryDestination(), _CycleState()
+
+    assert _cycle(config, source, destination, state) == 3
+    assert len(destination.events) == 3
+    assert _cycle(config, source, destination, state) is None
+
+    path = tmp_path / "config.toml"
+    path.write_text(path.read_text().replace("exclude_titles = []", 'exclude_titles = ["file 0"]'))
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert _cycle(config, source, destination, state) == 0
+
+
+def test_a_failed_cycle_is_not_followed_by_skips(tmp_path: "pathlib.Path"):
+    config = _config(tmp_path)
+    source, destination, state = _source(3), FlakyDestination(fail_fetches=1), _CycleState()
+
+    with pytest.raises(ConnectionError):
+        _cycle(config, source, destination, state)
+
+    assert _cycle(config, source, destination, state) == 3
+    assert len(destination.events) == 3
+
+
+def test_deferred_changes_are_applied_by_the_next_cycle(
+    tmp_path: "pathlib.Path", monkeypatch: pytest.MonkeyPatch
+):
+    # Each check advances the clock by one, so each cycle applies two changes
+    monkeypatch.setattr(
+        Deadline, "after", staticmethod(lambda _: Deadline(at=2, clock=itertools.count().__next__))
+    )
+    config = _config(tmp_path)
+    source, destination, state = _source(3), InMemoryDestination(), _CycleState()
+
+    assert _cycle(config, source, destination, state) == 3
+    assert len(destination.events) == 2
+    # The source is idle, but the deferred change is still waiting
+    assert _cycle(config, source, destination, state) == 0
+    assert len(destination.events) == 3
+    assert _cycle(config, source, destination, state) is None
+
+
+def test_new_events_are_counted_as_the_window_slides(tmp_path: "pathlib.Path"):
+    config = _config(tmp_path)
+    source, destination, state = _source(3), InMemoryDestination(), _CycleState()
+    _cycle(config, source, destination, state)
+
+    # The oldest event left the window as a new one arrived, so as many events are loaded
+    source.events, source.changed = [*source.events[1:], _event(0)], True
+
+    assert _cycle(config, source, destination, state) == 1
+
+
+def test_events_starting_before_the_window_keep_their_start(tmp_path: "pathlib.Path"):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    # Starts before the default five hour sync window, and covers the source event
+    stored = DestinationEvent(
+        id="stored",
+        title="file 1",
+        start=now - datetime.timedelta(hours=7),
+        end=now - datetime.timedelta(minutes=20),
+    )
+    destination = InMemoryDestination(events={stored.id: stored})
+
+    _cycle(_config(tmp_path), _source(1), destination, _CycleState())
+
+    assert destination.events == {stored.id: stored}
+
+
+def test_workers_override_the_config(tmp_path: "pathlib.Path", monkeypatch: pytest.MonkeyPatch):
+    def no_pool(**_: object):
+        raise AssertionError("Hydrated on a process pool")
+
+    monkeypatch.setattr(hydration, "ProcessPoolExecutor", no_pool)
+    config = _config(tmp_path)
+    path = tmp_path / "config.toml"
+    path.write_text("workers = 4\nchunk_size = 1\n" + path.read_text())
+
+    assert _cycle(config, _source(3), InMemoryDestination(), _CycleState(), workers=1) == 3
@@ -0,0 +1,77 @@
+import datetime
+
+from chronofile.config import CompiledRules
+from chronofile.event import BareEvent, URLEvent, WindowTitleEvent
+from chronofile.overlap import resolve_browser_overlap
+
+START = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _minutes(n: int) -> datetime.timedelta:
+    return datetime.timedelta(minutes=n)
+
+
+def _rules(browser_apps: list[str]) -> CompiledRules:
+    return CompiledRules.compile(
+        min_duration=datetime.timedelta(0),
+        merge_gap=datetime.timedelta(0),
+        exclude_titles=[],
+        exclude_apps=[],
+        metadata_enrichment=[],
+        category2emoji={},
+        browser_apps=browser_apps,
+    )
+
+
+def _spans(events: list[WindowTitleEvent | URLEvent | BareEvent]) -> list[tuple[str, int, int]]:
+    def label(e: WindowTitleEvent | URLEvent | BareEvent) -> str:
+        match e:
+            case URLEvent():
+                return e.url
+            case WindowTitleEvent():
+                return e.app
+            case BareEvent():
+                return e.title
+
+    return [
+        (
+            label(e),
+            int((e.start - START).total_seconds() // 60),
+            int((e.start + e.duration - START).total_seconds() // 60),
+        )
+        for e in events
+    ]
+
+
+def test_browser_window_time_is_replaced_by_urls():
+    # Sorted by start, as ingestion produces them
+    events = [
+        # Active tab while the browser was not focused is dropped
+        URLEvent(url="a.com", url_title="A", start=START - _minutes(10), duration=_minutes(20)),
+        WindowTitleEvent(app="Google Chrome", window_title="", start=START, duration=_minutes(30)),
+        BareEvent(title="bare", start=START + _minutes(5), duration=_minutes(1)),
+        URLEvent(url="b.com", url_title="B", start=START + _minutes(20), duration=_minutes(20)),
+        WindowTitleEvent(
+            app="Slack", window_title="general", start=START + _minutes(30), duration=_minutes(10)
+        ),
+    ]
+
+    resolved = list(resolve_browser_overlap(enumerate(events), _rules(["chrome"])))
+
+    assert _spans([e for _, e in resolved]) == [  # type: ignore
+        ("a.com", 0, 10),
+        ("bare", 5, 6),
+        ("Google Chrome", 10, 20),
+        ("b.com", 20, 30),
+        ("Slack", 30, 40),
+    ]
+    # Fragments point at the source event they were cut from
+    assert [i for i, _ in resolved] == [0, 2, 1, 3, 4]
+
+
+def test_no_browsers_configured_leaves_events_untouched():
+    events = [
+        WindowTitleEvent(app="Google Chrome", window_title="", start=START, duration=_minutes(30)),
+        URLEvent(url="a.com", url_title="A", start=START, duration=_minutes(20)),
+    ]
+    assert list(resolve_browser_overlap(enumerate(events), _rules([]))) == list(enumerate(events))
@@ -0,0 +1,148 @@
+import datetime
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Sequence
+
+import pytest
+import pytz
+
+from chronofile import planner
+from chronofile.diff import DeleteEvent, EventChange, NewEvent, UpdateEvent
+from chronofile.planner import PlanSavings
+from chronofile.test_event import FakeDestinationEvent, FakeParsedEvent
+
+if TYPE_CHECKING:
+    from chronofile.event import DestinationEvent
+
+DETERMINISTIC_ID = "cf" + "0" * 52
+
+
+@dataclass(frozen=True)
+class PlanExample:
+    intention: str
+    changeset: Sequence[EventChange]
+    destination_events: Sequence["DestinationEvent"]
+    then: Sequence[EventChange]
+    savings: PlanSavings
+
+
+@pytest.mark.parametrize(
+    ("e"),
+    [
+        PlanExample(
+            "Update that does not change the stored event is dropped",
+            changeset=[UpdateEvent(FakeDestinationEvent(id="0"))],
+            destination_events=[FakeDestinationEvent(id="0")],
+            then=[],
+            savings=PlanSavings(dropped_noops=1),
+        ),
+        PlanExample(
+            "Delete and insert become an update of the deleted event",
+            changeset=[
+                NewEvent(FakeParsedEvent(end=datetime.datetime(2023, 1, 1, 0, 1, tzinfo=pytz.UTC))),
+                DeleteEvent(FakeDestinationEvent(id="1")),
+            ],
+            destination_events=[FakeDestinationEvent(id="0"), FakeDestinationEvent(id="1")],
+            then=[
+                UpdateEvent(
+                    FakeDestinationEvent(
+                        id="1", end=datetime.datetime(2023, 1, 1, 0, 1, tzinfo=pytz.UTC)
+                    )
+                )
+            ],
+            savings=PlanSavings(merged_delete_inserts=1),
+        ),
+        PlanExample(
+            "Delete is reused for the insert with the same title",
+            changeset=[
+                NewEvent(FakeParsedEvent(title="other")),
+                NewEvent(FakeParsedEvent(title="fake title")),
+                DeleteEvent(FakeDestinationEvent(id="1", title="fake title")),
+            ],
+            destination_events=[],
+            then=[
+                NewEvent(FakeParsedEvent(title="other")),
+                UpdateEvent(FakeDestinationEvent(id="1", title="fake title")),
+            ],
+            savings=PlanSavings(merged_delete_inserts=1),
+        ),
+        PlanExample(
+            "Deleted events with deterministic ids are not reused for other events",
+            changeset=[
+                NewEvent(FakeParsedEvent(title="other")),
+                NewEvent(
+                    FakeParsedEvent(
+                        start=datetime.datetime(2023, 1, 1, 0, 1, tzinfo=pytz.UTC),
+                        end=datetime.datetime(2023, 1, 1, 0, 2, tzinfo=pytz.UTC),
+                    )
+                ),
+                DeleteEvent(FakeDestinationEvent(id=DETERMINISTIC_ID)),
+            ],
+            destination_events=[FakeDestinationEvent(id=DETERMINISTIC_ID)],
+            then=[
+                NewEvent(FakeParsedEvent(title="other")),
+                NewEvent(
+                    FakeParsedEvent(
+                        start=datetime.datetime(2023, 1, 1, 0, 1, tzinfo=pytz.UTC),
+                        end=datetime.datetime(2023, 1, 1, 0, 2, tzinfo=pytz.UTC),
+                    )
+                ),
+                DeleteEvent(FakeDestinationEvent(id=DETERMINISTIC_ID)),
+            ],
+            savings=PlanSavings(),
+        ),
+        PlanExample(
+            "Deleted event with a deterministic id is reused for the same title and start",
+            changeset=[
+                NewEvent(FakeParsedEvent(end=datetime.datetime(2023, 1, 1, 0, 1, tzinfo=pytz.UTC))),
+                DeleteEvent(FakeDestinationEvent(id=DETERMINISTIC_ID)),
+            ],
+            destination_events=[FakeDestinationEvent(id=DETERMINISTIC_ID)],
+            then=[
+                UpdateEvent(
+                    FakeDestinationEvent(
+                        id=DETERMINISTIC_ID,
+                        end=datetime.datetime(2023, 1, 1, 0, 1, tzinfo=pytz.UTC),
+                    )
+                )
+            ],
+            savings=PlanSavings(merged_delete_inserts=1),
+        ),
+        PlanExample(
+            "Repeated operations on the same id are coalesced into the last one",
+            changeset=[
+                UpdateEvent(
+                    FakeDestinationEvent(
+                        id="0", end=datetime.datetime(2023, 1, 1, 0, 1, tzinfo=pytz.UTC)
+                    )
+                ),
+                UpdateEvent(
+                    FakeDestinationEvent(
+                        id="0", end=datetime.datetime(2023, 1, 1, 0, 2, tzinfo=pytz.UTC)
+                    )
+                ),
+                DeleteEvent(FakeDestinationEvent(id="1")),
+                UpdateEvent(
+                    FakeDestinationEvent(
+                        id="1", end=datetime.datetime(2023, 1, 1, 0, 3, tzinfo=pytz.UTC)
+                    )
+                ),
+                DeleteEvent(FakeDestinationEvent(id="1")),
+            ],
+            destination_events=[FakeDestinationEvent(id="0"), FakeDestinationEvent(id="1")],
+            then=[
+                UpdateEvent(
+                    FakeDestinationEvent(
+                        id="0", end=datetime.datetime(2023, 1, 1, 0, 2, tzinfo=pytz.UTC)
+                    )
+                ),
+                DeleteEvent(FakeDestinationEvent(id="1")),
+            ],
+            savings=PlanSavings(coalesced=3),
+        ),
+    ],
+    ids=lambda e: e.intention,
+)
+def test_optimize(e: PlanExample):
+    plan = planner.optimize(e.changeset, e.destination_events)
+    assert plan.changes == e.then
+    assert plan.savings == e.savings
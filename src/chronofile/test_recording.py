@@ -0,0 +1,88 @@
+import datetime
+import pathlib
+
+from typer.testing import CliRunner
+
+from chronofile.benchmark import synthetic_records
+from chronofile.config import CompiledRules, Config
+from chronofile.main import app
+from chronofile.recording import Bundle, replay_bundle
+from chronofile.test_event import FakeDestinationEvent
+
+CONFIG = pathlib.Path(__file__).parents[2] / "config.toml"
+
+
+WINDOW = (
+    datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc),
+    datetime.datetime(2023, 1, 3, tzinfo=datetime.timezone.utc),
+)
+
+
+def _bundle(window: tuple[datetime.datetime, datetime.datetime] | None = WINDOW) -> Bundle:
+    return Bundle.capture(
+        str(CONFIG),
+        buckets=synthetic_records(n_events=300, distinct_titles=30),
+        destination_events=[
+            FakeDestinationEvent(
+                id=id,
+                start=WINDOW[0] + datetime.timedelta(hours=1),
+                end=WINDOW[0] + datetime.timedelta(hours=2),
+            )
+            for id in ["stale", "duplicate"]  # noqa: A001
+        ],
+        window=window,
+    )
+
+
+def test_bundle_round_trips_through_disk(tmp_path: pathlib.Path):
+    path = str(tmp_path / "bundle.json.gz")
+    bundle = _bundle()
+
+    bundle.save(path)
+
+    assert Bundle.load(path) == bundle
+
+
+def test_each_cycle_is_saved_to_its_own_bundle(tmp_path: pathlib.Path):
+    first, second = _bundle(), _bundle()
+
+    paths = {first.save_in(str(tmp_path)), second.save_in(str(tmp_path))}
+
+    assert len(paths) == 2
+    assert {Bundle.load(p).recorded_at for p in paths} == {first.recorded_at, second.recorded_at}
+
+
+def test_replay_is_deterministic():
+    rules = CompiledRules.from_config(Config.from_toml(str(CONFIG)))
+
+    first = replay_bundle(_bundle(), rules)
+    second = replay_bundle(_bundle(), rules)
+
+    assert first.added > 0
+    assert (first.added, first.updated, first.deleted) == (
+        second.added,
+        second.updated,
+        second.deleted,
+    )
+
+
+def test_replay_uses_the_recorded_window():
+    rules = CompiledRules.from_config(Config.from_toml(str(CONFIG)))
+
+    # The duplicate is in the cycle's window, but before the first source event
+    recorded, fallback = replay_bundle(_bundle(), rules), replay_bundle(_bundle(None), rules)
+
+    assert recorded.updated + recorded.deleted > 0
+    assert (fallback.updated, fallback.deleted) == (0, 0)
+
+
+def test_replay_command_writes_profile(tmp_path: pathlib.Path):
+    bundle_path = str(tmp_path / "bundle.json.gz")
+    profile_path = tmp_path / "replay.prof"
+    _bundle().save(bundle_path)
+
+    result = CliRunner().invoke(app, ["replay", bundle_path, "--profile", str(profile_path)])
+
+    assert result.exit_code == 0, result.output
+    assert "inserts" in result.output
+    assert profile_path.stat().st_size > 0
@@ -0,0 +1,103 @@
+import datetime
+
+import pytest
+
+from chronofile.commands.test_apply import InMemoryDestination
+from chronofile.scheduler import AdaptiveScheduler, QuotaCountingDestination, QuotaTracker
+
+NOON = datetime.datetime(2023, 1, 1, 12, tzinfo=datetime.timezone.utc)
+
+
+def _minutes(n: float) -> datetime.timedelta:
+    return datetime.timedelta(minutes=n)
+
+
+def _scheduler(quota: QuotaTracker | None = None) -> AdaptiveScheduler:
+    return AdaptiveScheduler(
+        quota=quota or QuotaTracker(daily_budget=1_000_000, clock=lambda: NOON),
+        base_interval=_minutes(4),
+        min_interval=_minutes(1),
+        max_interval=_minutes(32),
+        busy_events_per_minute=2,
+    )
+
+
+def test_busy_cycles_shorten_the_interval():
+    scheduler = _scheduler()
+    assert scheduler.next_interval(100) == _minutes(4)
+
+    assert scheduler.next_interval(40) == _minutes(2)
+    assert scheduler.next_interval(40) == _minutes(1)
+    assert scheduler.next_interval(40) == _minutes(1)
+    # A moderate rate returns to the base interval
+    assert scheduler.next_interval(1) == _minutes(4)
+
+
+def test_idle_cycles_back_off_exponentially():
+    scheduler = _scheduler()
+    scheduler.next_interval(100)
+
+    intervals = [scheduler.next_interval(None) for _ in range(5)]
+
+    assert intervals == [_minutes(8), _minutes(16), _minutes(32), _minutes(32), _minutes(32)]
+    assert scheduler.metrics().events_per_minute == 0
+    # Changes left over from the last cycle are not put off
+    assert scheduler.next_interval(0, backlog=True) == _minutes(4)
+
+
+def test_intervals_stretch_before_the_quota_runs_out():
+    quota = QuotaTracker(daily_budget=1000, clock=lambda: NOON)
+    scheduler = _scheduler(quota)
+    destination = QuotaCountingDestination(inner=InMemoryDestination(), quota=quota)  # type: ignore
+
+    scheduler.next_interval(100)
+    for _ in range(10):
+        for _ in range(100):
+            destination.get_events(start=NOON, end=NOON)
+        interval = scheduler.next_interval(100)
+
+    # Busy, but the remaining budget only covers the rest of the day at a longer interval
+    assert quota.remaining == 0
+    assert interval == quota.until_reset() == datetime.timedelta(hours=12)
+
+
+def test_reloaded_settings_apply_to_the_next_interval():
+    scheduler = _scheduler()
+    scheduler.next_interval(100)
+    assert scheduler.next_interval(None) == _minutes(8)
+
+    scheduler.reconfigure(
+        base_interval=_minutes(2),
+        min_interval=_minutes(1),
+        max_interval=_minutes(6),
+        busy_events_per_minute=2,
+    )
+
+    assert scheduler.next_interval(None) == _minutes(6)
+    assert scheduler.next_interval(1) == _minutes(2)
+    with pytest.raises(ValueError, match="min_interval"):
+        scheduler.reconfigure(
+            base_interval=_minutes(2),
+            min_interval=_minutes(3),
+            max_interval=_minutes(6),
+            busy_events_per_minute=2,
+        )
+
+
+def test_quota_resets_at_midnight():
+    now = NOON
+    quota = QuotaTracker(daily_budget=10, clock=lambda: now)
+    quota.record(10)
+    assert quota.remaining == 0
+
+    now = NOON + datetime.timedelta(hours=12)
+    assert quota.remaining == 10
+
+
+def test_min_interval_cannot_exceed_the_base_interval():
+    with pytest.raises(ValueError, match="min_interval"):
+        AdaptiveScheduler(
+            quota=QuotaTracker(daily_budget=10),
+            min_interval=_minutes(10),
+            base_interval=_minutes(5),
+        )
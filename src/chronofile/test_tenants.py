@@ -0,0 +1,79 @@
+import datetime
+import threading
+from typing import TYPE_CHECKING
+
+import pytest
+
+from chronofile.tenants import Tenant, load_tenants, run_tenants
+
+if TYPE_CHECKING:
+    import pathlib
+
+
+def _tenant(name: str) -> Tenant:
+    return Tenant(
+        name=name,
+        config_path="config.toml",
+        activitywatch_base_url=f"http://{name}:5600/api/",
+        gcal_email=f"{name}@example.com",
+        gcal_client_id="client",
+        gcal_client_secret="secret",
+        gcal_refresh_token=f"token-{name}",
+    )
+
+
+def test_load_tenants(tmp_path: "pathlib.Path"):
+    path = tmp_path / "tenants.toml"
+    path.write_text(
+        "".join(
+            f"""
+[[tenants]]
+name = "{name}"
+config_path = "config.toml"
+activitywatch_base_url = "http://{name}:5600/api/"
+gcal_email = "{name}@example.com"
+gcal_client_id = "client"
+gcal_client_secret = "secret"
+gcal_refresh_token = "token"
+"""
+            for name in ["ada", "grace"]
+        )
+    )
+
+    tenants = load_tenants(str(path))
+
+    assert [t.name for t in tenants] == ["ada", "grace"]
+    assert str(tenants[0].state_path) == ".chronofile/ada"
+
+    path.write_text(path.read_text().replace("grace", "ada"))
+    with pytest.raises(ValueError, match="unique"):
+        load_tenants(str(path))
+
+
+def test_a_failing_tenant_does_not_stop_the_others():
+    synced: list[str] = []
+
+    def cycle(tenant: Tenant) -> datetime.timedelta:
+        if tenant.name == "broken":
+            raise ConnectionError("ActivityWatch is down")
+        synced.append(tenant.name)
+        return datetime.timedelta(minutes=5)
+
+    run_tenants([_tenant("ada"), _tenant("broken"), _tenant("grace")], cycle, 2, watch=False)
+
+    assert sorted(synced) == ["ada", "grace"]
+
+
+def test_tenants_share_the_worker_pool():
+    # Only passes once both tenants are syncing at the same time
+    barrier = threading.Barrier(2, timeout=5)
+    threads: set[str] = set()
+
+    def cycle(tenant: Tenant) -> datetime.timedelta:  # noqa: ARG001
+        barrier.wait()
+        threads.add(threading.current_thread().name)
+        return datetime.timedelta(minutes=5)
+
+    run_tenants([_tenant("ada"), _tenant("grace")], cycle, workers=2, watch=False)
+
+    assert len(threads) == 2
@@ -6,8 +6,10 @@ import pytest
 import pytz
 from iterpy.arr import Arr
 
+from chronofile.config import RecordCategory
+from chronofile.event import Provenance
 from chronofile.test_event import FakeParsedEvent, MergeTestCase
-from chronofile.timeline import merge_within_window
+from chronofile.timeline import merge_sorted, merge_within_window
 
 
 @pytest.mark.parametrize(
@@ -89,3 +91,103 @@ def test_merge_events_within_window(testcase: MergeTestCase):
 
         output = sorted(combined, key=lambda e: e.start)
         assert "\n".join(str(e) for e in output) == "\n".join(str(e) for e in testcase.expected)
+
+
+def test_merged_event_provenance_covers_all_fragments():
+    fragments = [
+        FakeParsedEvent(
+            start=datetime.datetime(2023, 1, 1, hour, 0, tzinfo=pytz.UTC),
+            end=datetime.datetime(2023, 1, 1, hour, 30, tzinfo=pytz.UTC),
+            category=RecordCategory.PROGRAMMING,
+            provenance=Provenance(first=index, last=index),
+        )
+        for index, hour in [(3, 0), (5, 1), (9, 2)]
+    ]
+
+    merged = merge_within_window(fragments, merge_gap=datetime.timedelta(hours=1))
+
+    assert len(merged) == 1
+    assert merged[0].provenance == Provenance(first=3, last=9)
+    assert merged[0].category == RecordCategory.PROGRAMMING
+
+
+def _stream_event(title: str, minute: int, minutes: int = 5) -> FakeParsedEvent:
+    start = datetime.datetime(2023, 1, 1, tzinfo=pytz.UTC) + datetime.timedelta(minutes=minute)
+    return FakeParsedEvent(
+        title=title, start=start, end=start + datetime.timedelta(minutes=minutes)
+    )
+
+
+def _reference_merge(
+    events: list[FakeParsedEvent], gap: datetime.timedelta
+) -> list[tuple[str, datetime.datetime, datetime.datetime]]:
+    """Merge each title on its own, the simplest way, to check the streaming merge against."""
+    spans: list[tuple[str, datetime.datetime, datetime.datetime]] = []
+    for title in sorted({e.title for e in events}):
+        current: tuple[str, datetime.datetime, datetime.datetime] | None = None
+        for e in sorted((e for e in events if e.title == title), key=lambda e: e.start):
+            if current is not None and e.start <= current[2] + gap:
+                current = (title, current[1], max(current[2], e.end))
+            else:
+                if current is not None:
+                    spans.append(current)
+                current = (title, e.start, e.end)
+        if current is not None:
+            spans.append(current)
+    return sorted(spans, key=lambda s: (s[1], s[0]))
+
+
+def test_streaming_merge_matches_merge_per_title():
+    random.seed(0)
+    events = sorted(
+        (
+            # Durations vary, so later events can end before the spans they join
+            _stream_event(random.choice("abc"), random.randrange(600), random.randrange(1, 60))
+            for _ in range(300)
+        ),
+        key=lambda e: e.start,
+    )
+    gap = datetime.timedelta(minutes=10)
+
+    merged = sorted(
+        ((e.title, e.start, e.end) for e in merge_sorted(events, gap)), key=lambda s: (s[1], s[0])
+    )
+
+    assert merged == _reference_merge(events, gap)
+    assert len(merged) < len(events)
+
+
+def test_shorter_later_events_do_not_shorten_the_span():
+    merged = merge_sorted(
+        [_stream_event("a", 0, minutes=180), _stream_event("a", 60, minutes=60)],
+        datetime.timedelta(minutes=1),
+    )
+
+    assert [(e.start, e.end) for e in merged] == [
+        (_stream_event("a", 0).start, _stream_event("a", 180).start)
+    ]
+
+
+def test_streaming_merge_emits_spans_before_the_input_ends():
+    consumed = 0
+
+    def events():
+        nonlocal consumed
+        for minute in range(0, 100_000, 60):
+            consumed += 1
+            yield _stream_event(f"title {minute % 7}", minute)
+
+    merged = merge_sorted(events(), merge_gap=datetime.timedelta(minutes=1))
+    next(merged)
+
+    # Only spans within merge_gap of the stream position are held open
+    assert consumed < 10
+
+
+def test_streaming_merge_requires_sorted_input():
+    with pytest.raises(ValueError, match="sorted by start"):
+        list(
+            merge_sorted(
+                [_stream_event("a", 10), _stream_event("a", 0)], datetime.timedelta(minutes=1)
+            )
+        )
@@ -1,15 +1,84 @@
-from typing import TYPE_CHECKING, Sequence
-
-from chronofile.event import ChronofileEvent
+import heapq
+import itertools
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterable, Iterator, Protocol, Sequence
 
 if TYPE_CHECKING:
     import datetime
 
+    from chronofile.event import ChronofileEvent, Provenance
+
+
+class TimelineOutput(Protocol):
+    """Receives the hydrated and merged timeline of each pipeline run, e.g. to write a report."""
+
+    def __call__(self, timeline: Sequence["ChronofileEvent"]) -> None:
+        ...
+
+
+def _update_end_time(
+    event: "ChronofileEvent", end_time: "datetime.datetime", provenance: "Provenance | None"
+) -> "ChronofileEvent":
+    return event.model_copy(update={"end": end_time, "provenance": provenance})
+
+
+def _cover(current: "Provenance | None", candidate: "Provenance | None") -> "Provenance | None":
+    if current is None:
+        return candidate
+    return current.covering(candidate)
+
 
-def _update_end_time(event: ChronofileEvent, end_time: "datetime.datetime") -> ChronofileEvent:
-    return ChronofileEvent(
-        title=event.title, start=event.start, end=end_time, source_event=event.source_event
-    )
+@dataclass
+class _OpenSpan:
+    event: "ChronofileEvent"
+    end: "datetime.datetime"
+    provenance: "Provenance | None"
+
+    def close(self) -> "ChronofileEvent":
+        return _update_end_time(self.event, self.end, self.provenance)
+
+
+def merge_sorted(
+    events: Iterable["ChronofileEvent"], merge_gap: "datetime.timedelta"
+) -> Iterator["ChronofileEvent"]:
+    """Combine events with the same title if their end time is within merge_gap of the next one.
+
+    Runs in a single pass over events sorted by start, keeping one open span per title. A span is
+    emitted once the stream has moved more than merge_gap past its end, since no later event can
+    extend it, so memory scales with the titles active within merge_gap rather than with the
+    number of events. Spans are emitted in the order they close.
+    """
+    open_spans: dict[str, _OpenSpan] = {}
+    closing: list[tuple[datetime.datetime, int, str]] = []
+    # Heap of (end + merge_gap, tiebreak, title). Entries go stale when a span is extended.
+    tiebreak = itertools.count()
+    previous_start: datetime.datetime | None = None
+
+    for event in events:
+        if previous_start is not None and event.start < previous_start:
+            raise ValueError(f"Events must be sorted by start, {event} is out of order")
+        previous_start = event.start
+
+        while closing and closing[0][0] < event.start:
+            _, _, title = heapq.heappop(closing)
+            span = open_spans.get(title)
+            if span is not None and span.end + merge_gap < event.start:
+                del open_spans[title]
+                yield span.close()
+
+        span = open_spans.get(event.title)
+        if span is not None and span.end + merge_gap >= event.start:
+            # A later event can end before the span does, e.g. a short visit within a long one
+            span.end = max(span.end, event.end)
+            span.provenance = _cover(span.provenance, event.provenance)
+        else:
+            if span is not None:
+                yield span.close()
+            span = _OpenSpan(event=event, end=event.end, provenance=event.provenance)
+            open_spans[event.title] = span
+        heapq.heappush(closing, (span.end + merge_gap, next(tiebreak), event.title))
+
+    yield from (span.close() for span in sorted(open_spans.values(), key=lambda s: s.event.start))
 
 
 def merge_within_window(
@@ -18,27 +87,4 @@ def merge_within_window(
     """Combine events in the same timeline if their end time is within merge_gap of the next event."""
     if len(events) < 2:
         return events
-
-    processed_events: list[ChronofileEvent] = []
-    sorted_events = sorted(events, key=lambda e: e.start)
-
-    cur_event = sorted_events[0]
-    cur_end_time = cur_event.end
-    for candidate in sorted_events[1:]:
-        overlapping = cur_end_time + merge_gap >= candidate.start
-        if overlapping:
-            cur_end_time = candidate.end
-
-        # Cases where events should be appended
-        if not overlapping:
-            processed_events.append(_update_end_time(cur_event, cur_end_time))
-            cur_event = candidate
-            cur_end_time = candidate.end
-
-        if candidate == sorted_events[-1]:
-            if overlapping:
-                processed_events.append(_update_end_time(cur_event, cur_end_time))
-            else:
-                processed_events.append(candidate)
-
-    return processed_events
+    return list(merge_sorted(sorted(events, key=lambda e: e.start), merge_gap))